@@ -0,0 +1,59 @@
+import atexit
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; everything else was passed via `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Queue handler that owns a QueueListener feeding the given handlers from a background thread.
+
+    Request threads only put records on an in-memory queue; formatting and stream I/O
+    happen in the listener thread. Use it in LOGGING as factory ('()', not 'class', which
+    Python 3.12+ handles specially for QueueHandler subclasses) with references to handlers
+    that are configured before it (handlers are configured in alphabetical order), e.g.
+    'handlers': ['cfg://handlers.console'].
+    """
+
+    def __init__(self, handlers, respect_handler_level=True, maxsize=-1):
+        super().__init__(queue.Queue(maxsize))
+        # Indexing resolves the cfg:// references of the logging config to handler objects
+        handlers = [handlers[index] for index in range(len(handlers))]
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=respect_handler_level)
+        self.listener.start()
+        atexit.register(self.stop_listener)
+
+    def stop_listener(self):
+        """Process the remaining queued records and stop the listener thread."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        # Flush queued records before the handler goes away, e.g. on reconfiguration
+        self.stop_listener()
+        super().close()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
@@ -0,0 +1,185 @@
+import logging
+import re
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+logger = logging.getLogger('edubooker.profiling')
+
+# Accumulated template render time of the current request, None outside of profiled requests
+_template_duration = ContextVar('template_duration', default=None)
+
+# Bundles written by "manage.py compress", e.g. CACHE/css/output.1a2b3c4d5e6f.css
+COMPRESSED_BUNDLE = re.compile(r'^CACHE/(css|js)/[\w.-]+\.[0-9a-f]{12}\.(css|js)$')
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and their total duration."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def _instrument_template_render():
+    """Wrap the Django template backend once so top-level renders report their duration."""
+    if getattr(Template.render, '_profiled', False):
+        return
+    render = Template.render
+
+    def profiled_render(self, context=None, request=None):
+        durations = _template_duration.get()
+        if durations is None:
+            return render(self, context, request)
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            durations[0] += time.perf_counter() - start
+
+    profiled_render._profiled = True
+    Template.render = profiled_render
+
+
+class RequestProfilingMiddleware:
+    """
+    Record query count, database time, template render time and wall time of every request.
+
+    The numbers are added as Server-Timing header and logged to the `edubooker.profiling`
+    logger; requests above PROFILING_SLOW_REQUEST_MS or PROFILING_MAX_QUERIES are logged
+    as warnings. Enabled with PROFILING_ENABLED, see settings.py.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'PROFILING_SLOW_REQUEST_MS', 500)
+        self.max_queries = getattr(settings, 'PROFILING_MAX_QUERIES', 50)
+        _instrument_template_render()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        template_duration = [0.0]
+        token = _template_duration.set(template_duration)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            _template_duration.reset(token)
+        return self.process_profile(request, response, timer, template_duration[0], time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        template_duration = [0.0]
+        token = _template_duration.set(template_duration)
+        stack = ExitStack()
+
+        def wrap_connections():
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+
+        start = time.perf_counter()
+        try:
+            # Connections are per thread: wrap those of the thread the async ORM
+            # runs this request's queries in
+            await sync_to_async(wrap_connections)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _template_duration.reset(token)
+        return self.process_profile(request, response, timer, template_duration[0], time.perf_counter() - start)
+
+    def process_profile(self, request, response, timer, template_duration, duration):
+        """Add the Server-Timing header to the response and log the request profile."""
+        total_ms = duration * 1000
+        db_ms = timer.duration * 1000
+        template_ms = template_duration * 1000
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.1f};desc="{timer.count} queries"',
+            f'tpl;dur={template_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        match = request.resolver_match
+        profile = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': timer.count,
+            'db_ms': round(db_ms, 1),
+            'template_ms': round(template_ms, 1),
+            'total_ms': round(total_ms, 1),
+        }
+        slow = total_ms > self.slow_request_ms or timer.count > self.max_queries
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            ' '.join(f'{key}={value}' for key, value in profile.items()),
+            extra={'profile': profile, 'slow': slow},
+        )
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise middleware that also runs natively under ASGI.
+
+    WhiteNoise's own middleware is sync only, which makes Django run the whole middleware
+    chain and every async view through a single worker thread. Static files are still
+    served by WhiteNoise; all other requests are passed on without a thread switch.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    def immutable_file_test(self, path, url):
+        # Offline compressor bundles carry a content hash too, but are not in the staticfiles manifest
+        if super().immutable_file_test(path, url):
+            return True
+        if not url.startswith(self.static_prefix):
+            return False
+        return bool(COMPRESSED_BUNDLE.match(url[len(self.static_prefix):]))
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,9 @@
+from compressor.storage import BrotliCompressorFileStorage, GzipCompressorFileStorage
+
+
+class PrecompressedCompressorFileStorage(GzipCompressorFileStorage, BrotliCompressorFileStorage):
+    """
+    Storage of the django-compressor bundles that writes a .gz and a .br variant next to each
+    bundle, like CompressedManifestStaticFilesStorage does for the collected files, so
+    WhiteNoise serves them precompressed.
+    """
@@ -0,0 +1,245 @@
+import copy
+import importlib.util
+import io
+import json
+import logging
+import logging.config
+import logging.handlers
+import os
+import re
+import tempfile
+
+import environ
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.template import engines
+from django.template.loader import get_template
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import TestCase, override_settings
+from django.urls import resolve
+from unittest import mock, skipIf
+from EduBooker.log import JsonFormatter, QueueListenerHandler
+from EduBooker.middleware import StaticFilesMiddleware
+from EduBooker.storage import PrecompressedCompressorFileStorage
+
+# The manifest storage needs collectstatic, which is not run for tests
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+PROFILING_MIDDLEWARE = ["EduBooker.middleware.RequestProfilingMiddleware"]
+
+
+@override_settings(MIDDLEWARE=PROFILING_MIDDLEWARE + [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+])
+class RequestProfilingMiddlewareTest(TestCase):
+
+    def test_server_timing_header(self):
+        """Test that DB, template and total timings are added as Server-Timing header."""
+        response = self.client.get('/inventory/search/', {'q': 'Fuchs'})
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_template_time_measured(self):
+        """Test that the render time of template based views is reported."""
+        cache.clear()  # The home page may be cached by an earlier test
+        response = self.client.get('/')
+        template_ms = float(re.search(r'tpl;dur=([0-9.]+)', response['Server-Timing']).group(1))
+        self.assertGreater(template_ms, 0)
+
+    def test_profile_log_line(self):
+        """Test that each request is logged with its query count and view name."""
+        with self.assertLogs('edubooker.profiling', level='INFO') as logs:
+            self.client.get('/inventory/search/', {'q': 'Fuchs'})
+        record = logs.records[0]
+        self.assertEqual(record.profile['view'], 'inventory-search')
+        self.assertGreaterEqual(record.profile['queries'], 1)
+        self.assertFalse(record.slow)
+
+    @override_settings(PROFILING_MAX_QUERIES=0)
+    def test_slow_request_warning(self):
+        """Test that requests above the query threshold are logged as warnings."""
+        with self.assertLogs('edubooker.profiling', level='WARNING') as logs:
+            self.client.get('/inventory/search/', {'q': 'Fuchs'})
+        self.assertTrue(logs.records[0].slow)
+
+    async def test_async_view_profiled(self):
+        """Test that queries of async views run through the ASGI handler are counted."""
+        response = await self.async_client.get('/inventory/search/', {'q': 'Fuchs'})
+        queries = int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+        self.assertGreaterEqual(queries, 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES, WHITENOISE_USE_FINDERS=True, WHITENOISE_AUTOREFRESH=True)
+class AsgiTest(TestCase):
+
+    def test_async_views_skip_request_transaction(self):
+        """Test that async views are excluded from ATOMIC_REQUESTS, which cannot wrap them."""
+        view = resolve('/inventory/scan/T0001/').func
+        self.assertTrue(iscoroutinefunction(view))
+        self.assertIn('default', view._non_atomic_requests)
+
+    async def test_static_files_served_async(self):
+        """Test that static files are served by the async-capable WhiteNoise middleware."""
+        response = await self.async_client.get('/static/admin/css/base.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/css; charset="utf-8"')
+
+    def test_sync_views_still_atomic(self):
+        """Test that sync views keep running in the request transaction under ASGI."""
+        self.assertFalse(hasattr(resolve('/loan/checkout/').func, '_non_atomic_requests'))
+
+
+class StaticBuildTest(TestCase):
+
+    def test_compressor_bundles_are_immutable(self):
+        """Test that offline bundles get the far-future cache headers, like the hashed collected files."""
+        middleware = StaticFilesMiddleware(lambda request: None)
+        self.assertTrue(middleware.immutable_file_test(None, '/static/CACHE/css/output.f61cc48c48ad.css'))
+        self.assertFalse(middleware.immutable_file_test(None, '/static/CACHE/css/output.css'))
+        self.assertFalse(middleware.immutable_file_test(None, '/static/src/output.css'))
+
+    def test_bundles_are_precompressed(self):
+        """Test that the compressor storage writes gzip and Brotli variants of each bundle."""
+        with tempfile.TemporaryDirectory() as directory:
+            storage = PrecompressedCompressorFileStorage(location=directory, base_url='/static/')
+            name = storage.save('CACHE/css/output.f61cc48c48ad.css', ContentFile(b'body{margin:0}' * 100))
+            for suffix in ('', '.gz', '.br'):
+                self.assertTrue(os.path.exists(storage.path(name + suffix)))
+
+
+class DatabaseConfigurationTest(TestCase):
+
+    def load_settings(self, **environment):
+        """Execute the settings module afresh with `environment` added to the process environment."""
+        spec = importlib.util.spec_from_file_location('edubooker_settings_under_test', settings.BASE_DIR / 'EduBooker' / 'settings.py')
+        module = importlib.util.module_from_spec(spec)
+        with mock.patch.dict(os.environ, environment):
+            spec.loader.exec_module(module)
+        return module
+
+    def test_connection_health_checks(self):
+        """Test that reused connections are checked, so a dropped connection is not a 500."""
+        self.assertTrue(settings.DATABASES['default']['CONN_HEALTH_CHECKS'])
+
+    def test_connection_pool(self):
+        """Test that DB_POOL configures the psycopg pool from the environment and turns off persistent connections."""
+        database = self.load_settings(
+            DATABASE_URL='postgres://edubooker:secret@db:5432/edubooker', DB_POOL='True', CONN_MAX_AGE='60',
+            DB_POOL_MIN_SIZE='4', DB_POOL_MAX_SIZE='16', DB_POOL_TIMEOUT='5',
+        ).DATABASES['default']
+        self.assertEqual(database['OPTIONS']['pool'], {'min_size': 4, 'max_size': 16, 'timeout': 5})
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+
+    def test_no_pool_by_default(self):
+        """Test that without DB_POOL connections are persistent and not pooled."""
+        database = self.load_settings(DATABASE_URL='postgres://edubooker:secret@db:5432/edubooker', DB_POOL='False', CONN_MAX_AGE='60').DATABASES['default']
+        self.assertNotIn('pool', database.get('OPTIONS', {}))
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+
+
+class LoggingTest(TestCase):
+
+    def test_queue_listener_handler_forwards_records(self):
+        """Test that records put on the queue reach the target handler via the listener thread."""
+        target = logging.handlers.BufferingHandler(capacity=10)
+        handler = QueueListenerHandler([target])
+        logger = logging.getLogger('edubooker.tests.queue')
+        logger.addHandler(handler)
+        try:
+            logger.warning("shelf %s moved", "A1")
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+        self.assertEqual([record.getMessage() for record in target.buffer], ["shelf A1 moved"])
+
+    def test_json_formatter(self):
+        """Test that the JSON formatter emits message, level and extra fields."""
+        record = logging.LogRecord('edubooker.tests', logging.INFO, __file__, 1, "took %s ms", (12,), None)
+        record.profile = {'queries': 3}
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry['message'], "took 12 ms")
+        self.assertEqual(entry['level'], "INFO")
+        self.assertEqual(entry['profile'], {'queries': 3})
+
+    def test_logging_settings_configure(self):
+        """Test that the handlers of the LOGGING setting build as dictConfig builds them and route through the queue."""
+        # dictConfig() would replace the process-wide logging and close the running listener,
+        # so configure the formatters and handlers the same way without installing them
+        configurator = logging.config.DictConfigurator(copy.deepcopy(settings.LOGGING))
+        config = configurator.config
+        for name in sorted(config['formatters']):
+            config['formatters'][name] = configurator.configure_formatter(config['formatters'][name])
+        for name in sorted(config['handlers']):
+            config['handlers'][name] = configurator.configure_handler(config['handlers'][name])
+        handler = config['handlers']['queue']
+        self.addCleanup(handler.close)
+        self.assertIsInstance(handler, QueueListenerHandler)
+        self.assertEqual(list(handler.listener.handlers), [config['handlers']['console']])
+        self.assertEqual(config['root']['handlers'], ['queue'])
+
+        stream = io.StringIO()
+        config['handlers']['console'].setStream(stream)
+        handler.handle(logging.makeLogRecord({'name': 'edubooker.tests', 'levelno': logging.WARNING, 'msg': "shelf A1 moved"}))
+        handler.stop_listener()
+        self.assertIn("shelf A1 moved", stream.getvalue())
+
+    def test_sql_logging_off_by_default(self):
+        """Test that SQL statements are not logged unless DB_LOG_LEVEL enables them."""
+        self.assertGreater(logging.getLogger('django.db.backends').getEffectiveLevel(), logging.DEBUG)
+
+
+class CacheConfigurationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @skipIf(os.environ.get('CACHE_URL'), "CACHE_URL selects another backend")
+    def test_default_backend_is_local(self):
+        """Test that the suite runs against the local memory backend unless CACHE_URL says otherwise."""
+        self.assertEqual(settings.CACHES['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        self.assertEqual(settings.CACHES['default']['KEY_PREFIX'], 'edubooker')
+
+    def test_set_get_delete(self):
+        """Test a round trip through the configured cache."""
+        cache.set('edubooker-test', {'shelf': 'A1'})
+        self.assertEqual(cache.get('edubooker-test'), {'shelf': 'A1'})
+        cache.delete('edubooker-test')
+        self.assertIsNone(cache.get('edubooker-test'))
+
+    def test_cache_url_schemes(self):
+        """Test that CACHE_URL values resolve to the expected backends."""
+        self.assertEqual(
+            environ.Env.cache_url_config('redis://redis:6379/1')['BACKEND'],
+            'django.core.cache.backends.redis.RedisCache'
+        )
+        self.assertEqual(
+            environ.Env.cache_url_config('filecache:///var/tmp/edubooker-cache')['LOCATION'],
+            '/var/tmp/edubooker-cache'
+        )
+
+    def test_sessions_are_cached(self):
+        """Test that a saved session can be loaded from the cache without a query."""
+        session = SessionStore()
+        session['borrower'] = 42
+        session.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(session_key=session.session_key)['borrower'], 42)
+
+    def test_template_loader_is_cached(self):
+        """Test that templates are compiled once and then served from the cached loader."""
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIsInstance(loader, CachedLoader)
+        loader.reset()
+        get_template('_footer.html')
+        self.assertTrue(loader.get_template_cache)
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.views import View
+
+
+class AsyncReadOnlyView(View):
+    """
+    Base class for read-only views with async handlers.
+
+    ATOMIC_REQUESTS cannot wrap async views, so the view is excluded from the
+    request transaction. Subclasses must only read from the database.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return transaction.non_atomic_requests(super().as_view(**initkwargs))
@@ -0,0 +1,23 @@
+from django.contrib import admin
+from .models import ChangeLogEntry
+
+class ChangeLogEntryAdmin(admin.ModelAdmin):
+    list_display = ('changed_at', 'action', 'content_type', 'object_id', 'user')
+    search_fields = ('object_id', 'user__email')
+    list_filter = ('action', 'content_type')
+    list_select_related = ('content_type', 'user')
+    date_hierarchy = 'changed_at'
+
+    readonly_fields = ('content_type', 'object_id', 'action', 'changes', 'user', 'changed_at')
+
+    # The change log is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+admin.site.register(ChangeLogEntry, ChangeLogEntryAdmin)
@@ -0,0 +1,14 @@
+from django.apps import AppConfig, apps
+
+
+class AuditConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "audit"
+
+    def ready(self):
+        from .signals import connect
+        from .tracking import AuditedModel
+
+        for model in apps.get_models():
+            if issubclass(model, AuditedModel):
+                connect(model)
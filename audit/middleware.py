@@ -0,0 +1,38 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from . import recorder
+
+
+class AuditMiddleware:
+    """
+    Collect the change log entries of a request and write them with one insert at its end.
+
+    Entries are handed over when the request's transaction commits (see audit.recorder),
+    so the insert contains only changes that were committed. Place it after
+    AuthenticationMiddleware: changes are attributed to request.user.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with recorder.collecting(get_user=lambda: getattr(request, 'user', None)) as buffer:
+            try:
+                return self.get_response(request)
+            finally:
+                recorder.flush(buffer)
+
+    async def __acall__(self, request):
+        with recorder.collecting(get_user=lambda: getattr(request, 'user', None)) as buffer:
+            try:
+                return await self.get_response(request)
+            finally:
+                if buffer:
+                    await sync_to_async(recorder.flush)(buffer)
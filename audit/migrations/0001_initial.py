@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:49
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.CharField(help_text='Primary key of the changed object.', max_length=64)),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('changes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Changed fields as {field: [old, new]}.')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Time of the change.')),
+                ('content_type', models.ForeignKey(help_text='Model of the changed object.', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, help_text='User who made the change.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'change log entries',
+                'ordering': ['-changed_at', '-id'],
+                'indexes': [models.Index(fields=['content_type', 'object_id', 'changed_at'], name='changelog_object_idx'), models.Index(fields=['changed_at'], name='changelog_changed_at_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only record of one change of an audited object.
+
+    Entries are collected by audit.recorder and written in one multi-row insert after
+    the transaction that made the changes has been committed.
+    """
+
+    class Action(models.TextChoices):
+        CREATE = 'create', 'Create'
+        UPDATE = 'update', 'Update'
+        DELETE = 'delete', 'Delete'
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+', help_text="Model of the changed object.")
+    object_id = models.CharField(max_length=64, help_text="Primary key of the changed object.")
+    action = models.CharField(max_length=10, choices=Action.choices)
+    changes = models.JSONField(encoder=DjangoJSONEncoder, default=dict, help_text="Changed fields as {field: [old, new]}.")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='+',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        help_text="User who made the change."
+    )
+    changed_at = models.DateTimeField(default=timezone.now, help_text="Time of the change.")
+
+    class Meta:
+        ordering = ['-changed_at', '-id']
+        verbose_name_plural = 'change log entries'
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'changed_at'], name='changelog_object_idx'),
+            models.Index(fields=['changed_at'], name='changelog_changed_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.content_type.model} {self.object_id}"
@@ -0,0 +1,144 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+
+from .models import ChangeLogEntry
+
+# Bookkeeping columns; the change log itself records who changed what and when
+EXCLUDED_FIELDS = ('created_at', 'updated_at', 'created_by', 'updated_by')
+
+# Entries committed during the current request, written by AuditMiddleware; None outside of requests
+_request_buffer = ContextVar('audit_request_buffer', default=None)
+# Callable returning the user the changes are attributed to
+_current_user = ContextVar('audit_current_user', default=None)
+_suppressed = ContextVar('audit_suppressed', default=False)
+
+
+def tracked_fields(model):
+    """Return the concrete fields of `model` whose changes are recorded."""
+    return [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in EXCLUDED_FIELDS
+    ]
+
+
+def snapshot(instance, attnames=None):
+    """Return the current values of the tracked fields of `instance` (or of `attnames`)."""
+    names = attnames if attnames is not None else [field.attname for field in tracked_fields(type(instance))]
+    return {name: instance.__dict__[name] for name in names if name in instance.__dict__}
+
+
+def _json_value(value):
+    if isinstance(value, FieldFile):
+        return value.name or None
+    return value
+
+
+def diff(old, new):
+    """Return {field: [old, new]} for the values of `new` that differ from `old`; unknown old values are None."""
+    return {
+        name: [_json_value(old.get(name)), _json_value(value)]
+        for name, value in new.items()
+        if name not in old or old[name] != value
+    }
+
+
+def current_user():
+    get_user = _current_user.get()
+    user = get_user() if get_user is not None else None
+    return user if user is not None and user.is_authenticated else None
+
+
+@contextmanager
+def acting_as(user):
+    """Attribute the changes made in the block to `user`, e.g. in management commands."""
+    token = _current_user.set(lambda: user)
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+@contextmanager
+def batched(user=None):
+    """Write all entries committed in the block with one insert at its end, e.g. in management commands."""
+    with collecting(get_user=lambda: user) as buffer:
+        try:
+            yield
+        finally:
+            flush(buffer)
+
+
+@contextmanager
+def suppressed():
+    """Do not record the changes made in the block, e.g. when restoring a backup."""
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def is_suppressed():
+    return _suppressed.get()
+
+
+def record(model, changes, action, using):
+    """
+    Queue change log entries for the objects of `model`.
+
+    The entries are handed over when the current transaction commits, so changes that
+    are rolled back are not logged. During a request they are collected and written
+    together at its end, otherwise right after the commit in one insert.
+
+    :param changes: Iterable of (primary key, {field: [old, new]}) pairs; empty diffs are skipped.
+    :param action: A ChangeLogEntry.Action.
+    """
+    if is_suppressed():
+        return
+    content_type = ContentType.objects.db_manager(using).get_for_model(model)
+    user = current_user()
+    entries = [
+        ChangeLogEntry(content_type=content_type, object_id=str(pk), action=action, changes=fields, user=user)
+        for pk, fields in changes
+        if fields or action != ChangeLogEntry.Action.UPDATE
+    ]
+    if entries:
+        transaction.on_commit(partial(_committed, entries, using), using=using)
+
+
+def _committed(entries, using):
+    buffer = _request_buffer.get()
+    if buffer is not None:
+        buffer.setdefault(using, []).extend(entries)
+    else:
+        ChangeLogEntry.objects.using(using).bulk_create(entries)
+
+
+def flush(buffer):
+    """Write the collected entries with one multi-row insert per database."""
+    for using, entries in buffer.items():
+        ChangeLogEntry.objects.using(using).bulk_create(entries)
+    buffer.clear()
+
+
+@contextmanager
+def collecting(get_user=None):
+    """
+    Collect the entries committed in the block instead of writing them one transaction
+    at a time. Yields the buffer, to be written with flush() afterwards.
+
+    :param get_user: Callable returning the user the changes are attributed to.
+    """
+    buffer = {}
+    buffer_token = _request_buffer.set(buffer)
+    user_token = _current_user.set(get_user)
+    try:
+        yield buffer
+    finally:
+        _request_buffer.reset(buffer_token)
+        _current_user.reset(user_token)
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+
+from . import recorder
+from .models import ChangeLogEntry
+
+
+def record_save(sender, instance, created, raw, using, update_fields, **kwargs):
+    """Record the fields changed by a save, compared with the values the object was loaded with."""
+    if raw:
+        # Fixture loading restores rows, it does not change them
+        return
+    if update_fields is None:
+        attnames = None
+    else:
+        attnames = [
+            field.attname for field in recorder.tracked_fields(sender) if field.name in update_fields
+        ]
+    new = recorder.snapshot(instance, attnames)
+    if created:
+        changes = recorder.diff({}, {name: value for name, value in new.items() if value is not None})
+        action = ChangeLogEntry.Action.CREATE
+    else:
+        changes = recorder.diff(getattr(instance, '_audit_state', {}), new)
+        action = ChangeLogEntry.Action.UPDATE
+    instance._audit_state = {**getattr(instance, '_audit_state', {}), **new}
+    recorder.record(sender, [(instance.pk, changes)], action, using)
+
+
+def record_delete(sender, instance, using, **kwargs):
+    """Record the last values of a deleted object."""
+    old = {name: value for name, value in recorder.snapshot(instance).items() if value is not None}
+    changes = {name: [value, None] for name, (_, value) in recorder.diff({}, old).items()}
+    recorder.record(sender, [(instance.pk, changes)], ChangeLogEntry.Action.DELETE, using)
+
+
+def connect(model):
+    """Record the saves and deletes of `model`, an AuditedModel."""
+    post_save.connect(record_save, sender=model, dispatch_uid=f'audit_save_{model._meta.label_lower}')
+    post_delete.connect(record_delete, sender=model, dispatch_uid=f'audit_delete_{model._meta.label_lower}')
@@ -0,0 +1,132 @@
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from inventory.models import LibrarySite
+from loan.models import Borrower
+from users.models import CustomUser
+from . import recorder
+from .middleware import AuditMiddleware
+from .models import ChangeLogEntry
+
+# The manifest storage needs collectstatic, which is not run for tests
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+class ChangeLogTest(TestCase):
+
+    def setUp(self):
+        self.borrower = Borrower.objects.create(given_name="Anna", surname="A", entry_school_year="2024/2025", initial_grade=1, borrower_class="1a")
+        self.others = [
+            Borrower.objects.create(given_name=name, surname="B", entry_school_year="2024/2025", initial_grade=1, borrower_class="1b")
+            for name in ("Ben", "Cem", "Dana")
+        ]
+
+    def entries(self, action):
+        return list(ChangeLogEntry.objects.filter(action=action).order_by('id'))
+
+    def test_create_records_the_initial_values(self):
+        """Test that a new object is logged with its values, without the bookkeeping columns."""
+        with self.captureOnCommitCallbacks(execute=True):
+            site = LibrarySite.objects.create(name="Aula")
+        entry, = self.entries(ChangeLogEntry.Action.CREATE)
+        self.assertEqual(entry.object_id, str(site.pk))
+        self.assertEqual(entry.content_type.model, 'librarysite')
+        self.assertEqual(entry.changes['name'], [None, "Aula"])
+        self.assertNotIn('created_at', entry.changes)
+
+    def test_save_records_only_changed_fields(self):
+        """Test that a save logs the diff against the loaded values and unchanged saves log nothing."""
+        borrower = Borrower.objects.get(pk=self.borrower.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            borrower.borrower_class = "2a"
+            borrower.save()
+            borrower.save()
+        entry, = self.entries(ChangeLogEntry.Action.UPDATE)
+        self.assertEqual(entry.changes, {'borrower_class': ["1a", "2a"]})
+
+    def test_bulk_update_reads_old_values_with_one_query(self):
+        """Test that bulk_update() of unloaded objects reads their old values with one SELECT."""
+        objs = [Borrower(pk=other.pk, borrower_class="2b") for other in self.others]
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            Borrower.objects.bulk_update(objs, ['borrower_class'])
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT') and 'loan_borrower' in query['sql']]
+        self.assertEqual(len(selects), 1)
+        entries = self.entries(ChangeLogEntry.Action.UPDATE)
+        self.assertEqual([entry.object_id for entry in entries], [str(other.pk) for other in self.others])
+        self.assertTrue(all(entry.changes == {'borrower_class': ["1b", "2b"]} for entry in entries))
+
+    def test_update_records_changed_rows(self):
+        """Test that queryset update() logs one entry per changed row in one INSERT."""
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            Borrower.objects.filter(borrower_class="1b").update(inactive=True)
+        entries = self.entries(ChangeLogEntry.Action.UPDATE)
+        self.assertEqual(len(entries), 3)
+        self.assertEqual(entries[0].changes, {'inactive': [False, True]})
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "audit_changelogentry"')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_delete_records_last_values(self):
+        """Test that a delete logs the last values of the object."""
+        pk = self.borrower.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.borrower.delete()
+        entry, = self.entries(ChangeLogEntry.Action.DELETE)
+        self.assertEqual(entry.object_id, str(pk))
+        self.assertEqual(entry.changes['surname'], ["A", None])
+
+    def test_rolled_back_changes_are_not_recorded(self):
+        """Test that changes of a rolled back transaction are not logged."""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Borrower.objects.filter(pk=self.borrower.pk).update(borrower_class="9z")
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertFalse(ChangeLogEntry.objects.exists())
+
+    def test_suppressed_changes_are_not_recorded(self):
+        """Test that nothing is logged inside recorder.suppressed()."""
+        with self.captureOnCommitCallbacks(execute=True), recorder.suppressed():
+            Borrower.objects.update(inactive=True)
+        self.assertFalse(ChangeLogEntry.objects.exists())
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_admin_search(self):
+        """Test that the change log can be searched by object id and user email in the admin."""
+        user = CustomUser.objects.create_superuser(email='admin@example.com', password=None)
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True), recorder.acting_as(user):
+            Borrower.objects.filter(pk=self.borrower.pk).update(borrower_class="2a")
+        url = reverse('admin:audit_changelogentry_changelist')
+        self.assertContains(self.client.get(url, {'q': 'admin@example'}), '1 change log entry')
+        self.assertContains(self.client.get(url, {'q': 'nobody@example'}), '0 change log entries')
+
+class AuditMiddlewareTest(TransactionTestCase):
+
+    def test_request_writes_entries_with_one_insert(self):
+        """Test that the entries of several transactions of a request are written with one INSERT, attributed to the user."""
+        user = CustomUser.objects.create_user(email='testuser@example.com', password=None)
+        borrower = Borrower.objects.create(given_name="Anna", surname="A", entry_school_year="2024/2025", initial_grade=1, borrower_class="1a")
+        ChangeLogEntry.objects.all().delete()
+
+        def view(request):
+            with transaction.atomic():
+                Borrower.objects.filter(pk=borrower.pk).update(borrower_class="2a")
+            with transaction.atomic():
+                LibrarySite.objects.create(name="Aula")
+            self.assertFalse(ChangeLogEntry.objects.exists())
+            return HttpResponse()
+
+        request = RequestFactory().post('/')
+        request.user = user
+        with CaptureQueriesContext(connection) as queries:
+            AuditMiddleware(view)(request)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "audit_changelogentry"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(ChangeLogEntry.objects.count(), 2)
+        self.assertEqual(set(ChangeLogEntry.objects.values_list('user', flat=True)), {user.pk})
@@ -0,0 +1,112 @@
+from django.db import models
+
+from . import recorder
+from .models import ChangeLogEntry
+
+# Primary keys per SELECT when reading the old values of bulk changes
+READ_BATCH_SIZE = 1000
+
+
+class AuditedModel(models.Model):
+    """
+    Abstract base of models whose changes are written to the change log.
+
+    The tracked values are remembered when a row is loaded, so the diff of a later save
+    needs no extra query. Saves and deletes are recorded by the receivers in audit.signals;
+    bulk operations by AuditQuerySet, which the model's managers must use.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._audit_state = recorder.snapshot(instance)
+        return instance
+
+
+def _old_values(queryset, pks, attnames):
+    """Read the current values of `attnames` for the given primary keys, one SELECT per READ_BATCH_SIZE rows."""
+    values = {}
+    pks = list(pks)
+    for start in range(0, len(pks), READ_BATCH_SIZE):
+        for pk, *row in queryset.filter(pk__in=pks[start:start + READ_BATCH_SIZE]).values_list('pk', *attnames):
+            values[pk] = dict(zip(attnames, row))
+    return values
+
+
+class AuditQuerySet(models.QuerySet):
+    """
+    QuerySet recording bulk_create(), bulk_update() and update() in the change log.
+
+    Old values of bulk changes are read with one query per call (and READ_BATCH_SIZE rows),
+    never with a query per object; objects loaded from the database bring their own.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if recorder.is_suppressed():
+            return objs
+        # With update_conflicts, rows may have existed before; their old values are unknown
+        action = ChangeLogEntry.Action.UPDATE if kwargs.get('update_conflicts') else ChangeLogEntry.Action.CREATE
+        changes = []
+        for obj in objs:
+            if obj.pk is None:
+                # Ignored conflicts, or a backend that does not return primary keys
+                continue
+            values = recorder.snapshot(obj)
+            changes.append((obj.pk, recorder.diff({}, {name: value for name, value in values.items() if value is not None})))
+            obj._audit_state = values
+        recorder.record(self.model, changes, action, self.db)
+        return objs
+
+    bulk_create.alters_data = True
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if recorder.is_suppressed():
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        objs = list(objs)
+        attnames = [
+            self.model._meta.get_field(name).attname for name in fields
+            if name not in recorder.EXCLUDED_FIELDS
+        ]
+        unknown = [obj.pk for obj in objs if not hasattr(obj, '_audit_state')]
+        old_values = _old_values(self, unknown, attnames) if unknown and attnames else {}
+
+        # bulk_update() runs one update() per batch; those are recorded here instead
+        with recorder.suppressed():
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+
+        changes = []
+        for obj in objs:
+            old = getattr(obj, '_audit_state', None)
+            if old is None:
+                old = old_values.get(obj.pk, {})
+            new = recorder.snapshot(obj, attnames)
+            changes.append((obj.pk, recorder.diff(old, new)))
+            obj._audit_state = {**getattr(obj, '_audit_state', {}), **new}
+        recorder.record(self.model, changes, ChangeLogEntry.Action.UPDATE, self.db)
+        return rows
+
+    bulk_update.alters_data = True
+
+    def update(self, **kwargs):
+        if recorder.is_suppressed():
+            return super().update(**kwargs)
+        attnames = [
+            self.model._meta.get_field(name).attname for name in kwargs
+            if name not in recorder.EXCLUDED_FIELDS
+        ]
+        if not attnames:
+            return super().update(**kwargs)
+
+        old_values = {pk: dict(zip(attnames, row)) for pk, *row in self.values_list('pk', *attnames)}
+        rows = super().update(**kwargs)
+        # Values may be expressions, so read back what was written
+        new_values = _old_values(self.model._base_manager.using(self.db), old_values, attnames)
+        changes = [(pk, recorder.diff(old, new_values.get(pk, {}))) for pk, old in old_values.items()]
+        recorder.record(self.model, changes, ChangeLogEntry.Action.UPDATE, self.db)
+        return rows
+
+    update.alters_data = True
@@ -0,0 +1,23 @@
+# Gunicorn configuration, picked up from the working directory by `gunicorn` (see Procfile).
+#
+# SERVER_INTERFACE=wsgi (default) runs EduBooker.wsgi with sync workers: one request per worker.
+# SERVER_INTERFACE=asgi runs EduBooker.asgi with uvicorn workers: the async catalogue search,
+# scan and availability endpoints are then served concurrently on one event loop per worker,
+# so a single worker can handle many kiosk clients. Sync views keep working in a thread pool.
+import os
+
+interface = os.environ.get("SERVER_INTERFACE", "wsgi").lower()
+if interface not in ("wsgi", "asgi"):
+    raise ValueError(f"SERVER_INTERFACE must be 'wsgi' or 'asgi', not {interface!r}.")
+
+if interface == "asgi":
+    # Async views get a new database connection per request (or one from the pool with
+    # DB_POOL=True); persistent connections would only pile up in the thread pool
+    # (see the Django docs on async views)
+    os.environ.setdefault("CONN_MAX_AGE", "0")
+
+wsgi_app = f"EduBooker.{interface}:application"
+worker_class = "uvicorn_worker.UvicornWorker" if interface == "asgi" else "sync"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
@@ -1,10 +1,30 @@
-from django.contrib import admin
+import io
+
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from .exports import export_response
+from .forms import ChangeMediaTypeForm, MediaImportForm, RecategoriseForm, RetireForm, TransferSiteForm
+from .imports import MediaImporter, read_media_rows
 from .models import MediaCategory, LibrarySite, MediaType, Media
+from .search import search_media
+from .services import change_media_type, recategorise, retire, transfer_site
+
+
+class CachedRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    """Related field filter taking its choices from the cached reference data instead of a query."""
+
+    def field_choices(self, field, request, model_admin):
+        return [(obj.pk, str(obj)) for obj in field.related_model.objects.cached()]
+
 
 class MediaCategoryAdmin(admin.ModelAdmin):
     list_display = ('code', 'name', 'colour', 'colour_code', 'created_by', 'updated_by', 'created_at', 'updated_at')
     search_fields = ('code', 'name', 'colour')
-    list_filter = ('colour', 'created_by')
+    list_filter = ('colour', ('created_by', admin.RelatedOnlyFieldListFilter))
+    list_select_related = ('created_by', 'updated_by')
     
     # Only make timestamps readonly
     readonly_fields = ('created_at', 'updated_at', 'created_by', 'updated_by')
@@ -24,7 +44,8 @@ admin.site.register(MediaCategory, MediaCategoryAdmin)
 class LibrarySiteAdmin(admin.ModelAdmin):
     list_display = ('name', 'is_active', 'created_by', 'updated_by', 'created_at', 'updated_at')
     search_fields = ('name', 'description')
-    list_filter = ('is_active', 'created_by')
+    list_filter = ('is_active', ('created_by', admin.RelatedOnlyFieldListFilter))
+    list_select_related = ('created_by', 'updated_by')
     readonly_fields = ('created_at', 'updated_at')
 
     # Exclude `created_by` and `updated_by` from the form altogether
@@ -43,6 +64,7 @@ admin.site.register(LibrarySite, LibrarySiteAdmin)
 class MediaTypeAdmin(admin.ModelAdmin):
     list_display = ('name', 'created_by', 'updated_by', 'created_at', 'updated_at')
     search_fields = ('name',)
+    list_select_related = ('created_by', 'updated_by')
     readonly_fields = ('created_at', 'updated_at')
     
     # Exclude `created_by` and `updated_by` from the form
@@ -60,9 +82,19 @@ admin.site.register(MediaType, MediaTypeAdmin)
 
 
 class MediaAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/inventory/media/change_list.html'
     list_display = ('media_number', 'title', 'site', 'category', 'media_type', 'created_by', 'updated_by', 'created_at', 'updated_at')
     search_fields = ('title', 'authors', 'media_number', 'isbn13')
-    list_filter = ('site', 'category', 'media_type', 'created_by', 'updated_by')
+    # Only offer users that actually created or updated media instead of listing every user
+    list_filter = (
+        ('site', CachedRelatedFieldListFilter),
+        ('category', CachedRelatedFieldListFilter),
+        ('media_type', CachedRelatedFieldListFilter),
+        ('created_by', admin.RelatedOnlyFieldListFilter),
+        ('updated_by', admin.RelatedOnlyFieldListFilter),
+    )
+    # Fetch all foreign keys shown in list_display with the page query instead of one query per row
+    list_select_related = ('site', 'category', 'media_type', 'created_by', 'updated_by')
     
     # Make `media_number` read-only
     readonly_fields = ('media_number', 'created_at', 'updated_at')
@@ -70,6 +102,8 @@ class MediaAdmin(admin.ModelAdmin):
     # Exclude `created_by` and `updated_by` from the form
     exclude = ('created_by', 'updated_by')
 
+    actions = ('export_csv', 'export_xlsx', 'transfer_site', 'change_media_type', 'recategorise', 'retire')
+
     def save_model(self, request, obj, form, change):
         """Automatically set `created_by` and `updated_by` fields based on the logged-in user."""
         if not obj.pk:  # New instance
@@ -77,4 +111,108 @@ class MediaAdmin(admin.ModelAdmin):
         obj.updated_by = request.user
         super().save_model(request, obj, form, change)
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """Render the site, category and type choices from the cached reference data."""
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name in ('site', 'category', 'media_type'):
+            formfield.choices = [('', formfield.empty_label)] + [
+                (obj.pk, str(obj)) for obj in db_field.related_model.objects.cached()
+            ]
+        return formfield
+
+    def get_search_results(self, request, queryset, search_term):
+        """Use the indexed catalogue search instead of ILIKE over all search_fields."""
+        return search_media(search_term, queryset), False
+
+    @admin.action(description="Export selected media as CSV", permissions=['view'])
+    def export_csv(self, request, queryset):
+        """Stream the selected media (use "select all" for the whole inventory) as CSV."""
+        return export_response('csv', queryset, request)
+
+    @admin.action(description="Export selected media as Excel (XLSX)", permissions=['view'])
+    def export_xlsx(self, request, queryset):
+        """Stream the selected media as XLSX workbook."""
+        return export_response('xlsx', queryset, request)
+
+    def bulk_change(self, request, queryset, action, form_class, change, message):
+        """
+        Ask for the target of a bulk change of the selected media and apply it once submitted.
+
+        :param change: Service function called with the queryset, the user and the cleaned form data.
+            A ValueError it raises is shown on the form.
+        :param message: Success message, formatted with the number of changed media and the form data.
+        """
+        form = form_class(request.POST if request.POST.get('apply') else None)
+        if form.is_valid():
+            try:
+                count = change(queryset, user=request.user, **form.cleaned_data)
+            except ValueError as error:
+                form.add_error(None, str(error))
+            else:
+                self.message_user(request, message.format(count=count, **form.cleaned_data), messages.SUCCESS)
+                return None
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': self.get_action(action)[2],
+            'opts': self.model._meta,
+            'form': form,
+            'action': action,
+            'selected': queryset.values_list('pk', flat=True),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/inventory/media/bulk_change.html', context)
+
+    @admin.action(description="Move selected media to another site", permissions=['change'])
+    def transfer_site(self, request, queryset):
+        return self.bulk_change(request, queryset, 'transfer_site', TransferSiteForm, transfer_site, "Moved {count} media to {site}.")
+
+    @admin.action(description="Change the media type of selected media", permissions=['change'])
+    def change_media_type(self, request, queryset):
+        return self.bulk_change(
+            request, queryset, 'change_media_type', ChangeMediaTypeForm, change_media_type, "Changed {count} media to {media_type}."
+        )
+
+    @admin.action(description="Move selected media to another category and renumber them", permissions=['change'])
+    def recategorise(self, request, queryset):
+        return self.bulk_change(
+            request, queryset, 'recategorise', RecategoriseForm, recategorise, "Moved {count} media to {category} and renumbered them."
+        )
+
+    @admin.action(description="Retire selected media (left the library)", permissions=['change'])
+    def retire(self, request, queryset):
+        return self.bulk_change(
+            request, queryset, 'retire', RetireForm, retire, "Retired {count} media on {left_library_date}."
+        )
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='inventory_media_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        """Upload a CSV or JSONL file and import its rows with the batched MediaImporter."""
+        if not self.has_add_permission(request):
+            return HttpResponseRedirect(reverse('admin:inventory_media_changelist'))
+
+        form = MediaImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            stream = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            result = MediaImporter(user=request.user).run(read_media_rows(stream, form.cleaned_data['file_format']))
+            for row_number, message in result.errors[:20]:
+                self.message_user(request, f"Row {row_number}: {message}", messages.WARNING)
+            if len(result.errors) > 20:
+                self.message_user(request, f"{len(result.errors) - 20} further rows were skipped.", messages.WARNING)
+            self.message_user(request, f"Imported {result.created} media.", messages.SUCCESS)
+            return HttpResponseRedirect(reverse('admin:inventory_media_changelist'))
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': "Import media",
+        }
+        return TemplateResponse(request, 'admin/inventory/media/import_form.html', context)
+
 admin.site.register(Media, MediaAdmin)
\ No newline at end of file
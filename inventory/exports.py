@@ -0,0 +1,243 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import date
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Media
+
+# (header, lookup) of the exported columns; the related names are joined by values_list()
+EXPORT_COLUMNS = (
+    ("Media number", 'media_number'),
+    ("Legacy number", 'legacy_media_number'),
+    ("Title", 'title'),
+    ("Authors", 'authors'),
+    ("Publisher", 'publisher'),
+    ("ISBN-13", 'isbn13'),
+    ("Site", 'site__name'),
+    ("Category code", 'category__code'),
+    ("Category", 'category__name'),
+    ("Media type", 'media_type__name'),
+    ("Acquisition date", 'acquisition_date'),
+    ("Left library", 'left_library_date'),
+    ("Price", 'price'),
+)
+PRICE_COLUMN = len(EXPORT_COLUMNS) - 1
+
+# Rows collected into one chunk of the response
+ROWS_PER_CHUNK = 500
+
+
+def export_rows(queryset=None, chunk_size=2000):
+    """
+    Yield the header, one tuple per media and a closing row with the number of media and the price total.
+
+    Rows are fetched with values_list() through a server-side cursor in chunks of `chunk_size`,
+    so memory stays flat however large the catalogue is.
+
+    :param queryset: Optional Media queryset to export (default: all media).
+    :param chunk_size: Number of rows fetched from the database at a time.
+    """
+    if queryset is None:
+        queryset = Media.objects.all()
+    yield tuple(header for header, _ in EXPORT_COLUMNS)
+
+    count = 0
+    price_total = Decimal('0.00')
+    for row in queryset.values_list(*(lookup for _, lookup in EXPORT_COLUMNS)).iterator(chunk_size=chunk_size):
+        count += 1
+        if row[PRICE_COLUMN] is not None:
+            price_total += row[PRICE_COLUMN]
+        yield row
+
+    total = [None] * len(EXPORT_COLUMNS)
+    total[0] = "Total"
+    total[2] = f"{count} media"
+    total[PRICE_COLUMN] = price_total
+    yield tuple(total)
+
+
+def _chunked(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Encode rows as UTF-8 CSV (with BOM, so spreadsheet programs detect the encoding) chunk by chunk."""
+    writer = csv.writer(_Echo())
+    yield '\ufeff'.encode('utf-8')
+    for chunk in _chunked(rows):
+        yield ''.join(writer.writerow(['' if value is None else value for value in row]) for row in chunk).encode('utf-8')
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, unseekable buffer that zipfile writes into and the XLSX generator drains."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Media" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Cell styles: 0 default, 1 date, 2 amount with two decimals
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+XLSX_SHEET_END = '</sheetData></worksheet>'
+XLSX_EPOCH = date(1899, 12, 30)
+
+# Characters XML 1.0 does not allow, even escaped
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - XLSX_EPOCH).days}</v></c>'
+    if isinstance(value, Decimal):
+        return f'<c s="2"><v>{value}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(ILLEGAL_XML_CHARS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def stream_xlsx(rows):
+    """
+    Write rows into a single-sheet XLSX workbook chunk by chunk.
+
+    The workbook is a zip archive written into an unseekable buffer, so zipfile emits
+    data descriptors instead of seeking back, and every chunk can be sent right away.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(XLSX_SHEET_START.encode('utf-8'))
+            for chunk in _chunked(rows):
+                sheet.write(''.join(
+                    '<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>' for row in chunk
+                ).encode('utf-8'))
+                data = buffer.drain()
+                if data:
+                    yield data
+            sheet.write(XLSX_SHEET_END.encode('utf-8'))
+    yield buffer.drain()
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def stream_export(file_format, queryset=None, chunk_size=2000):
+    """Return a generator of the encoded export in `file_format` ('csv' or 'xlsx')."""
+    writer, _ = EXPORT_FORMATS[file_format]
+    return writer(export_rows(queryset, chunk_size=chunk_size))
+
+
+async def _async_chunks(chunks):
+    """
+    Pull the chunks of a sync generator one at a time in the thread-sensitive worker thread.
+    The generator keeps its database cursor, as it always runs in the same thread.
+    """
+    done = object()
+    while (chunk := await sync_to_async(next)(chunks, done)) is not done:
+        yield chunk
+
+
+def export_response(file_format, queryset=None, request=None):
+    """
+    Return a StreamingHttpResponse downloading the media export.
+
+    Under ASGI, Django reads a sync iterator completely into memory before sending it, so
+    for ASGI requests the response gets an async iterator and still streams in flat memory.
+    """
+    _, content_type = EXPORT_FORMATS[file_format]
+    content = stream_export(file_format, queryset)
+    if isinstance(request, ASGIRequest):
+        content = _async_chunks(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    filename = f"media-{timezone.localdate().isoformat()}.{file_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
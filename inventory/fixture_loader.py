@@ -0,0 +1,262 @@
+import json
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+
+from audit import recorder
+
+from .functions import format_media_number, parse_media_number
+from .models import LibrarySite, Media, MediaCategory, MediaNumberCounter, MediaType
+
+FIXTURE_FORMATS = ('json', 'jsonl')
+
+READ_SIZE = 64 * 1024
+
+
+def iter_json_array(stream, read_size=READ_SIZE):
+    """
+    Yield the objects of a JSON array one by one without reading the whole document.
+
+    The stream is read in blocks of `read_size` characters and each array element is
+    decoded with JSONDecoder.raw_decode() as soon as it is complete, so memory use is
+    bounded by the largest single object instead of the file size.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    expect_value = True
+
+    while True:
+        # Skip whitespace, refilling the buffer as needed
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+        if position >= len(buffer):
+            buffer, position = stream.read(read_size), 0
+            if not buffer:
+                raise ValueError("Unexpected end of the JSON fixture.")
+            continue
+
+        char = buffer[position]
+        if not started:
+            if char != '[':
+                raise ValueError("A JSON fixture must be an array of objects.")
+            started = True
+            position += 1
+        elif char == ']':
+            return
+        elif not expect_value:
+            if char != ',':
+                raise ValueError(f"Expected ',' or ']' in the JSON fixture, found {char!r}.")
+            expect_value = True
+            position += 1
+        else:
+            while True:
+                try:
+                    obj, position = decoder.raw_decode(buffer, position)
+                    break
+                except json.JSONDecodeError:
+                    # The object continues in the next block
+                    chunk = stream.read(read_size)
+                    if not chunk:
+                        raise
+                    buffer, position = buffer[position:] + chunk, 0
+            if not isinstance(obj, dict):
+                raise ValueError("A JSON fixture must be an array of objects.")
+            yield obj
+            expect_value = False
+            if position > read_size:
+                buffer, position = buffer[position:], 0
+
+
+def iter_jsonl(stream):
+    """Yield one object per non-empty line of a JSON Lines fixture."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_fixture_objects(stream, file_format):
+    """
+    Stream the serialized objects of a fixture.
+
+    :param stream: A text stream of the fixture.
+    :param file_format: 'json' (an array, as written by dumpdata) or 'jsonl' (one object per line).
+    :return: An iterator of dicts in Django's serialization format (model, pk, fields).
+    """
+    if file_format == 'json':
+        return iter_json_array(stream)
+    if file_format == 'jsonl':
+        return iter_jsonl(stream)
+    raise ValueError(f"Unsupported fixture format '{file_format}'.")
+
+
+class Checkpoint:
+    """
+    Number of fixture objects already committed, stored in a small JSON file.
+
+    The fixture's size and modification time are stored with it, so a checkpoint is
+    never applied to a different file.
+    """
+
+    def __init__(self, path, fixture_path):
+        self.path = path
+        stat = os.stat(fixture_path)
+        self.fingerprint = {'fixture': os.path.abspath(fixture_path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def load(self):
+        """Return the number of objects to skip, 0 if there is no checkpoint for this fixture."""
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return 0
+        if {key: data.get(key) for key in self.fingerprint} != self.fingerprint:
+            raise ValueError(f"Checkpoint '{self.path}' belongs to another version of the fixture, use --restart.")
+        return data['objects']
+
+    def save(self, objects):
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({**self.fingerprint, 'objects': objects}, file)
+        # Atomic rename: an interruption never leaves a half written checkpoint
+        os.replace(temporary, self.path)
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def _keep_timestamps(model, field_names):
+    """Store the fixture's values of auto_now/auto_now_add fields, as loaddata does, instead of the current time."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if field.name in field_names and (getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False))
+    ]
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class FixtureLoader:
+    """
+    Upsert the objects of a streamed fixture in batches.
+
+    Each batch is written with one bulk_create(update_conflicts=True) per model in its own
+    transaction, so existing rows are updated by primary key and an interrupted load keeps
+    every batch committed so far. Unlike loaddata, model save() methods and signals are
+    bypassed and nothing is written to the change log; Media without a sequence get it from their media number (or new numbers
+    from the category counter), and the counters are advanced at the end.
+    """
+
+    def __init__(self, batch_size=1000, using=DEFAULT_DB_ALIAS):
+        self.batch_size = batch_size
+        self.using = using
+        self.models = set()
+        self.loaded = 0
+
+    def run(self, objects, skip=0, on_batch=None):
+        """
+        Load the serialized `objects`, skipping the first `skip` of them.
+
+        :param objects: Iterator of dicts in Django's serialization format.
+        :param skip: Number of objects committed by an earlier, interrupted run.
+        :param on_batch: Called with the total number of committed objects after each batch.
+        :return: The number of objects loaded by this run.
+        """
+        objects = islice(objects, skip, None)
+        loaded = 0
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            self._load_batch(batch)
+            loaded += len(batch)
+            if on_batch:
+                on_batch(skip + loaded)
+        self.loaded += loaded
+        return loaded
+
+    def _load_batch(self, batch):
+        groups = defaultdict(list)
+        m2m = []
+        deserialized = Deserializer(batch, using=self.using, handle_forward_references=False)
+        for data, item in zip(batch, deserialized):
+            model = type(item.object)
+            opts = model._meta
+            fields = tuple(sorted(
+                name for name in data.get('fields', {})
+                if not opts.get_field(name).many_to_many and not opts.get_field(name).primary_key
+            ))
+            groups[(model, fields)].append(item.object)
+            if item.m2m_data:
+                m2m.append(item)
+
+        # A restore is not a change, as with raw saves by loaddata it is not audited
+        with transaction.atomic(using=self.using), recorder.suppressed():
+            for (model, fields), instances in groups.items():
+                self.models.add(model)
+                if model is Media:
+                    self._number_media(instances, fields)
+                    fields = tuple(sorted(set(fields) | {'media_number', 'sequence'}))
+                with _keep_timestamps(model, fields):
+                    model.objects.using(self.using).bulk_create(
+                        instances,
+                        update_conflicts=bool(fields),
+                        ignore_conflicts=not fields,
+                        unique_fields=[model._meta.pk.name] if fields else None,
+                        update_fields=list(fields) or None,
+                    )
+            for item in m2m:
+                for name, values in item.m2m_data.items():
+                    getattr(item.object, name).set(values)
+
+    def _number_media(self, media, fields):
+        """Derive the sequence from the media number, reserving new numbers for media without one."""
+        categories = {category.pk: category for category in MediaCategory.objects.cached()}
+        unnumbered = defaultdict(list)
+        for obj in media:
+            category = categories.get(obj.category_id) or MediaCategory.objects.cached_get(obj.category_id)
+            if obj.media_number:
+                if obj.sequence is None:
+                    obj.sequence = parse_media_number(category.code, obj.media_number)
+            else:
+                unnumbered[category].append(obj)
+        for category, objs in unnumbered.items():
+            first_number = MediaNumberCounter.objects.reserve(category, count=len(objs))
+            for offset, obj in enumerate(objs):
+                obj.sequence = first_number + offset
+                obj.media_number = format_media_number(category.code, obj.sequence)
+
+    def finish(self):
+        """Reset database sequences, media number counters and cached reference data after loading."""
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(no_style(), list(self.models))
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+        if Media in self.models:
+            categories = {category.pk: category for category in MediaCategory.objects.all()}
+            for category_id, last_number in Media.objects.values_list('category').annotate(last_number=Max('sequence')).order_by():
+                if last_number:
+                    MediaNumberCounter.objects.advance_to(categories[category_id], last_number)
+        # bulk_create sends no post_save signals, so clear the caches explicitly
+        for model in (MediaCategory, MediaType, LibrarySite):
+            if model in self.models:
+                model.objects.clear_cache()
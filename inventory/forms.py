@@ -0,0 +1,33 @@
+from django import forms
+from django.utils import timezone
+
+from .imports import IMPORT_FORMATS
+from .models import LibrarySite, MediaCategory, MediaType
+
+
+class MediaImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV file with a header row, or JSONL file with one object per line.")
+    file_format = forms.ChoiceField(choices=[(name, name.upper()) for name in IMPORT_FORMATS], initial='csv', label="Format")
+
+
+class TransferSiteForm(forms.Form):
+    site = forms.ModelChoiceField(queryset=LibrarySite.objects.filter(is_active=True), help_text="Library site the media are moved to.")
+
+
+class ChangeMediaTypeForm(forms.Form):
+    media_type = forms.ModelChoiceField(queryset=MediaType.objects.all(), label="Media type")
+
+
+class RecategoriseForm(forms.Form):
+    category = forms.ModelChoiceField(
+        queryset=MediaCategory.objects.all(),
+        help_text="The media get new media numbers in this category, legacy numbers are kept."
+    )
+
+
+class RetireForm(forms.Form):
+    left_library_date = forms.DateField(
+        initial=timezone.localdate,
+        label="Left library on",
+        help_text="Media that already left the library keep their date."
+    )
@@ -32,3 +32,41 @@ def validate_isbn13(isbn):
 	
 	# Compare with the actual check digit (13th digit)
 	return check_digit == digits[12]
+
+
+def format_media_number(code, number):
+	"""
+	Build a media number from a category code and a running number.
+	
+	:param code: The category code, e.g. "T".
+	:param number: The running number as integer or string, e.g. 15 or "15".
+	:return: The media number, e.g. "T0015".
+	"""
+	return f"{code}{str(number).zfill(4)}"
+
+
+def parse_media_number(code, media_number):
+	"""
+	Extract the running number from a media number of the given category.
+	
+	:param code: The category code, e.g. "T".
+	:param media_number: The media number, e.g. "T0015".
+	:return: The running number as integer, or None if it cannot be parsed.
+	"""
+	if not media_number or not media_number.startswith(code):
+		return None
+	number = media_number[len(code):]
+	return int(number) if number.isdigit() else None
+
+
+def normalize_isbn(isbn):
+	"""
+	Strip hyphens and whitespace from an ISBN.
+	
+	:param isbn: The ISBN as entered, e.g. "978-3-16-148410-0".
+	:return: The digits only, e.g. "9783161484100", or None if empty.
+	"""
+	if isbn is None:
+		return None
+	isbn = str(isbn).replace('-', '').replace(' ', '').strip()
+	return isbn or None
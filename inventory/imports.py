@@ -0,0 +1,196 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from .functions import format_media_number, normalize_isbn, validate_isbn13
+from .models import LibrarySite, Media, MediaCategory, MediaNumberCounter, MediaType
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+TEXT_FIELDS = ('title', 'authors', 'publisher', 'comments', 'short_description')
+DATE_FIELDS = ('acquisition_date', 'left_library_date', 'publishing_date')
+PRICE_FIELD = Media._meta.get_field('price')
+
+
+@dataclass
+class InvalidRow:
+    """Placeholder for a record of an import file that could not be read."""
+    message: str
+
+
+def read_media_rows(stream, file_format):
+    """
+    Yield one dict per record from a CSV or JSONL text stream without reading the whole file.
+    Records that cannot be decoded are yielded as InvalidRow, so they are reported like
+    invalid values; a file that is not UTF-8 encoded ends with one.
+    :param stream: A text stream, e.g. an open file or a decoded upload.
+    :param file_format: Either 'csv' or 'jsonl'.
+    """
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format '{file_format}', expected one of {', '.join(IMPORT_FORMATS)}.")
+    try:
+        if file_format == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as error:
+                yield InvalidRow(f"Invalid JSON: {error.msg}.")
+                continue
+            yield row if isinstance(row, dict) else InvalidRow("A JSONL line must be an object.")
+    except UnicodeDecodeError:
+        yield InvalidRow("The file is not UTF-8 encoded; the rest of it was skipped.")
+    except csv.Error as error:
+        yield InvalidRow(f"Invalid CSV: {error}; the rest of the file was skipped.")
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+class MediaImporter:
+    """
+    Import media rows in batches.
+
+    Sites, categories and media types are resolved from in-memory lookups that are
+    loaded once, media numbers are reserved per category with one counter update
+    per batch and rows are written with bulk_create. Invalid rows are skipped and
+    reported in the ImportResult.
+    """
+
+    def __init__(self, user=None, batch_size=500):
+        self.user = user
+        self.batch_size = batch_size
+        self.sites = {}
+        for site in LibrarySite.objects.cached():
+            self.sites[site.name.casefold()] = site
+            self.sites[str(site.pk)] = site
+        self.categories = {category.code.casefold(): category for category in MediaCategory.objects.cached()}
+        self.media_types = {media_type.name.casefold(): media_type for media_type in MediaType.objects.cached()}
+
+    def run(self, rows):
+        """Import all rows from an iterable of dicts and return an ImportResult."""
+        result = ImportResult()
+        rows = enumerate(rows, start=1)
+        with transaction.atomic():
+            while batch := list(islice(rows, self.batch_size)):
+                self._import_batch(batch, result)
+        return result
+
+    def _lookup(self, mapping, value):
+        return mapping.get(str(value or '').strip().casefold())
+
+    def _build(self, row_number, row, result):
+        """Turn one raw row into an unsaved Media instance, or return None and record the error."""
+        title = str(row.get('title') or '').strip()
+        if not title:
+            result.add_error(row_number, "Title is missing.")
+            return None
+
+        site = self._lookup(self.sites, row.get('site'))
+        category = self._lookup(self.categories, row.get('category'))
+        media_type = self._lookup(self.media_types, row.get('media_type'))
+        for value, key in ((site, 'site'), (category, 'category'), (media_type, 'media_type')):
+            if value is None:
+                result.add_error(row_number, f"Unknown {key} '{row.get(key)}'.")
+                return None
+
+        isbn13 = normalize_isbn(row.get('isbn13'))
+        if isbn13 and not validate_isbn13(isbn13):
+            result.add_error(row_number, f"The ISBN-13 number '{row.get('isbn13')}' is not valid.")
+            return None
+
+        media = Media(site=site, category=category, media_type=media_type, isbn13=isbn13,
+                      created_by=self.user, updated_by=self.user)
+        for name in TEXT_FIELDS:
+            setattr(media, name, str(row.get(name) or '').strip() or None)
+        media.title = title
+
+        for name in DATE_FIELDS:
+            value = str(row.get(name) or '').strip()
+            try:
+                parsed = parse_date(value) if value else None
+            except ValueError:
+                parsed = None
+            if value and parsed is None:
+                result.add_error(row_number, f"Invalid {name} '{value}'.")
+                return None
+            setattr(media, name, parsed)
+
+        price = str(row.get('price') or '').strip()
+        if price:
+            # The field validators also reject NaN, Infinity and values beyond max_digits/decimal_places,
+            # which would otherwise fail the whole bulk_create() on PostgreSQL
+            try:
+                media.price = PRICE_FIELD.clean(price.replace(',', '.'), media)
+            except ValidationError as error:
+                result.add_error(row_number, f"Invalid price '{price}': {' '.join(error.messages)}")
+                return None
+
+        legacy_media_number = str(row.get('legacy_media_number') or '').strip()
+        if legacy_media_number:
+            if not legacy_media_number.isdigit() or len(legacy_media_number) > 4:
+                result.add_error(row_number, f"Invalid legacy media number '{legacy_media_number}'.")
+                return None
+            media.legacy_media_number = legacy_media_number.zfill(4)
+            media.sequence = int(legacy_media_number)
+            media.media_number = format_media_number(category.code, legacy_media_number)
+        return media
+
+    def _import_batch(self, batch, result):
+        invalid = [(row_number, row) for row_number, row in batch if isinstance(row, InvalidRow)]
+        for row_number, row in invalid:
+            result.add_error(row_number, row.message)
+        batch = [(row_number, row) for row_number, row in batch if not isinstance(row, InvalidRow)]
+
+        built = []
+        for row_number, row in batch:
+            media = self._build(row_number, row, result)
+            if media is not None:
+                built.append((row_number, media))
+
+        # Legacy numbers must be free; earlier batches are already written, so one query covers them too
+        legacy_media_numbers = [media.media_number for _, media in built if media.legacy_media_number]
+        taken = set(
+            Media.objects.filter(media_number__in=legacy_media_numbers).values_list('media_number', flat=True)
+        ) if legacy_media_numbers else set()
+        media_list = []
+        for row_number, media in built:
+            if media.legacy_media_number:
+                if media.media_number in taken:
+                    result.add_error(row_number, f"Media number '{media.media_number}' already exists.")
+                    continue
+                taken.add(media.media_number)
+            media_list.append(media)
+
+        # Reserve all new numbers of a category with one counter update
+        by_category = {}
+        for media in media_list:
+            by_category.setdefault(media.category, []).append(media)
+        for category, category_media in by_category.items():
+            legacy_numbers = [int(media.legacy_media_number) for media in category_media if media.legacy_media_number]
+            if legacy_numbers:
+                MediaNumberCounter.objects.advance_to(category, max(legacy_numbers))
+            unnumbered = [media for media in category_media if not media.media_number]
+            if unnumbered:
+                first_number = MediaNumberCounter.objects.reserve(category, count=len(unnumbered))
+                for offset, media in enumerate(unnumbered):
+                    media.sequence = first_number + offset
+                    media.media_number = format_media_number(category.code, media.sequence)
+
+        Media.objects.bulk_create(media_list, batch_size=self.batch_size)
+        result.created += len(media_list)
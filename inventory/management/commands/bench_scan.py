@@ -0,0 +1,50 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from inventory.models import Media
+from inventory.scan import scan_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency of the scan endpoint through the full middleware stack and fail "
+        "if the 99th percentile exceeds --max-p99-ms."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=1000, help="Number of scans to time.")
+        parser.add_argument('--sample', type=int, default=200, help="Number of distinct media numbers to scan.")
+        parser.add_argument('--max-p99-ms', type=float, default=10.0, help="Allowed 99th percentile latency in milliseconds.")
+        parser.add_argument('--host', default='localhost', help="Host header sent with the requests (must be in ALLOWED_HOSTS).")
+        parser.add_argument('--cold', action='store_true', help="Clear the scan cache before every request.")
+
+    def handle(self, *args, **options):
+        codes = list(Media.objects.values_list('media_number', flat=True)[:options['sample']])
+        if not codes:
+            raise CommandError("There are no media to scan.")
+
+        client = Client(HTTP_HOST=options['host'])
+        urls = [reverse('inventory-scan', args=[code]) for code in codes]
+        durations = []
+        for iteration in range(options['iterations']):
+            if options['cold']:
+                scan_cache.clear()
+            start = time.perf_counter()
+            response = client.get(urls[iteration % len(urls)])
+            durations.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"Scan of {urls[iteration % len(urls)]} returned HTTP {response.status_code}.")
+
+        durations.sort()
+        p50 = statistics.median(durations)
+        p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+        self.stdout.write(
+            f"{len(durations)} scans of {len(codes)} media: p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {durations[-1]:.2f} ms"
+        )
+        if p99 > options['max_p99_ms']:
+            raise CommandError(f"p99 latency {p99:.2f} ms exceeds {options['max_p99_ms']} ms.")
+        self.stdout.write(self.style.SUCCESS(f"p99 within {options['max_p99_ms']} ms."))
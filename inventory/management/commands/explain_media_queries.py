@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from inventory.models import LibrarySite, Media, MediaCategory, MediaType
+from inventory.search import search_media
+
+# Indexes added in 0008_media_indexes, dropped temporarily for the "before" plans
+MEDIA_INDEXES = (
+    'media_category_number_idx',
+    'media_isbn13_idx',
+    'media_legacy_number_idx',
+    'media_site_in_stock_idx',
+)
+
+# Planner settings switched off for the "before" plans on PostgreSQL
+INDEX_SCAN_SETTINGS = ('enable_indexscan', 'enable_indexonlyscan', 'enable_bitmapscan')
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the EXPLAIN plans of the most frequent media queries with and without the "
+        "composite and partial indexes on Media. On PostgreSQL the 'before' plans are made with "
+        "index scans switched off for the transaction, as DROP INDEX would lock the media table; "
+        "on SQLite the indexes are dropped inside a transaction that is rolled back. The "
+        "database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help="Run EXPLAIN ANALYZE (PostgreSQL only).")
+
+    def get_queries(self):
+        site_id = LibrarySite.objects.values_list('pk', flat=True).first() or 0
+        category_id = MediaCategory.objects.values_list('pk', flat=True).first() or 0
+        media_type_id = MediaType.objects.values_list('pk', flat=True).first() or 0
+        isbn13 = Media.objects.filter(isbn13__isnull=False).values_list('isbn13', flat=True).first() or '9780000000002'
+        return [
+            ("Highest media number in a category",
+             Media.objects.filter(category_id=category_id).order_by('-sequence')[:1]),
+            ("Lookup by ISBN-13",
+             Media.objects.filter(isbn13=isbn13)),
+            ("Lookup by legacy media number",
+             Media.objects.filter(category_id=category_id, legacy_media_number='0001')),
+            ("Items in stock at a site",
+             Media.objects.filter(site_id=site_id, left_library_date__isnull=True).order_by('media_number')[:100]),
+            ("Admin list filtered by category",
+             Media.objects.filter(category_id=category_id).order_by('sequence')[:100]),
+            ("Admin list filtered by site, category and type",
+             Media.objects.filter(site_id=site_id, category_id=category_id, media_type_id=media_type_id).order_by('media_number')[:100]),
+            ("Catalogue search by title and authors",
+             search_media("Fuchs Muster")[:100]),
+        ]
+
+    def explain_all(self, options):
+        explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+        for title, queryset in self.get_queries():
+            self.stdout.write(self.style.MIGRATE_LABEL(f"  {title}"))
+            for line in queryset.explain(**explain_options).splitlines():
+                self.stdout.write(f"    {line}")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{Media.objects.count()} media rows, database vendor {connection.vendor}.")
+        self.stdout.write("Small tables are usually scanned sequentially regardless of indexes.\n")
+
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f"Comparing plans is not supported on {connection.vendor}.")
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    for setting in INDEX_SCAN_SETTINGS:
+                        cursor.execute(f"SET LOCAL {setting} = off")
+                    heading = "Before (index scans disabled):"
+                else:
+                    for name in MEDIA_INDEXES:
+                        cursor.execute(f"DROP INDEX IF EXISTS {connection.ops.quote_name(name)}")
+                    heading = "Before (without media indexes):"
+            self.stdout.write(self.style.MIGRATE_HEADING(heading))
+            self.explain_all(options)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("After (with media indexes):"))
+        self.explain_all(options)
@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.exports import EXPORT_FORMATS, stream_export
+from inventory.models import Media
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the media inventory with site, category and type names and the price total "
+        "as CSV or XLSX. Rows are streamed, so memory use does not grow with the catalogue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or '-' for standard output.")
+        parser.add_argument('--format', choices=EXPORT_FORMATS, help="File format (default: derived from the file extension).")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Number of rows fetched from the database at a time.")
+        parser.add_argument('--site', help="Only export media of the site with this name.")
+        parser.add_argument('--category', help="Only export media of the category with this code.")
+        parser.add_argument('--in-stock', action='store_true', help="Skip media that have left the library.")
+
+    def handle(self, *args, **options):
+        to_stdout = options['path'] == '-'
+        path = Path(options['path'])
+        file_format = options['format'] or ('csv' if to_stdout else path.suffix.lstrip('.').lower())
+        if file_format not in EXPORT_FORMATS:
+            raise CommandError(f"Cannot derive the format from '{path.name}', use --format.")
+
+        queryset = Media.objects.all()
+        if options['site']:
+            queryset = queryset.filter(site__name=options['site'])
+        if options['category']:
+            queryset = queryset.filter(category__code=options['category'].upper())
+        if options['in_stock']:
+            queryset = queryset.filter(left_library_date__isnull=True)
+
+        chunks = stream_export(file_format, queryset, chunk_size=options['chunk_size'])
+        if to_stdout:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        with path.open('wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Exported media to {path}."))
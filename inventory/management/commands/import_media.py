@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventory.imports import IMPORT_FORMATS, MediaImporter, read_media_rows
+
+
+class Command(BaseCommand):
+    help = "Import media from a CSV or JSONL file in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the CSV or JSONL file.")
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help="File format (default: derived from the file extension).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Number of rows written per bulk insert.")
+        parser.add_argument('--user', help="Email of the user recorded as creator of the imported media.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without saving anything.")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f"File '{path}' does not exist.")
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(f"Cannot derive the format from '{path.name}', use --format.")
+
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        with transaction.atomic():
+            importer = MediaImporter(user=user, batch_size=options['batch_size'])
+            with path.open(encoding='utf-8-sig', newline='') as stream:
+                result = importer.run(read_media_rows(stream, file_format))
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        for row_number, message in result.errors:
+            self.stderr.write(f"Row {row_number}: {message}")
+        verb = "Would import" if options['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {result.created} media, skipped {len(result.errors)} rows."))
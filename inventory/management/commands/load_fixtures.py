@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.fixture_loader import FIXTURE_FORMATS, Checkpoint, FixtureLoader, iter_fixture_objects
+
+
+class Command(BaseCommand):
+    help = (
+        "Load large JSON or JSONL fixtures with constant memory, upserting the objects in batches. "
+        "Progress is checkpointed after every batch, so an interrupted load resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Fixture files in Django's serialization format.")
+        parser.add_argument('--format', choices=FIXTURE_FORMATS, help="File format (default: derived from the file extension).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of objects written per transaction.")
+        parser.add_argument('--restart', action='store_true', help="Ignore existing checkpoints and load from the start.")
+
+    def handle(self, *args, **options):
+        loader = FixtureLoader(batch_size=options['batch_size'])
+        for path in map(Path, options['paths']):
+            if not path.is_file():
+                raise CommandError(f"File '{path}' does not exist.")
+            file_format = options['format'] or path.suffix.lstrip('.').lower()
+            if file_format not in FIXTURE_FORMATS:
+                raise CommandError(f"Cannot derive the format from '{path.name}', use --format.")
+
+            checkpoint = Checkpoint(f"{path}.checkpoint", path)
+            if options['restart']:
+                checkpoint.delete()
+            try:
+                skip = checkpoint.load()
+            except ValueError as error:
+                raise CommandError(str(error))
+            if skip:
+                self.stdout.write(f"Resuming {path} after {skip} objects.")
+
+            try:
+                with path.open(encoding='utf-8-sig') as stream:
+                    loaded = loader.run(iter_fixture_objects(stream, file_format), skip=skip, on_batch=checkpoint.save)
+            except Exception as error:
+                raise CommandError(
+                    f"Loading {path} failed: {error}. Committed batches are kept; run the command again to resume."
+                ) from error
+            checkpoint.delete()
+            self.stdout.write(f"Loaded {loaded} objects from {path}.")
+
+        loader.finish()
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loader.loaded} objects."))
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    """Initialise one counter per category with the highest media number already in use."""
+    MediaCategory = apps.get_model('inventory', 'MediaCategory')
+    Media = apps.get_model('inventory', 'Media')
+    MediaNumberCounter = apps.get_model('inventory', 'MediaNumberCounter')
+
+    counters = []
+    for category in MediaCategory.objects.all():
+        last_number = 0
+        for media_number in Media.objects.filter(category=category).values_list('media_number', flat=True).iterator():
+            number = media_number[len(category.code):]
+            if media_number.startswith(category.code) and number.isdigit():
+                last_number = max(last_number, int(number))
+        counters.append(MediaNumberCounter(category=category, last_number=last_number))
+    MediaNumberCounter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_media_legacy_media_number_alter_media_media_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_number', models.PositiveIntegerField(default=0, help_text='Highest media number handed out in this category.')),
+                ('category', models.OneToOneField(help_text='Media category this counter allocates numbers for.', on_delete=django.db.models.deletion.CASCADE, related_name='media_number_counter', to='inventory.mediacategory')),
+            ],
+            options={
+                'verbose_name': 'Media Number Counter',
+                'verbose_name_plural': 'Media Number Counters',
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
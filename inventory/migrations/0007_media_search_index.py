@@ -0,0 +1,58 @@
+from django.db import migrations
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS media_title_trgm_idx ON inventory_media USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS media_authors_trgm_idx ON inventory_media USING gin (authors gin_trgm_ops)",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS media_authors_trgm_idx",
+    "DROP INDEX IF EXISTS media_title_trgm_idx",
+]
+
+# External content FTS5 table kept in sync by triggers; the trigram tokenizer
+# gives the same substring semantics as icontains.
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS inventory_media_fts USING fts5(
+        title, authors, content='inventory_media', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_media_fts_insert AFTER INSERT ON inventory_media BEGIN
+        INSERT INTO inventory_media_fts(rowid, title, authors) VALUES (new.id, new.title, new.authors);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_media_fts_delete AFTER DELETE ON inventory_media BEGIN
+        INSERT INTO inventory_media_fts(inventory_media_fts, rowid, title, authors) VALUES ('delete', old.id, old.title, old.authors);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS inventory_media_fts_update AFTER UPDATE OF title, authors ON inventory_media BEGIN
+        INSERT INTO inventory_media_fts(inventory_media_fts, rowid, title, authors) VALUES ('delete', old.id, old.title, old.authors);
+        INSERT INTO inventory_media_fts(rowid, title, authors) VALUES (new.id, new.title, new.authors);
+    END""",
+    "INSERT INTO inventory_media_fts(inventory_media_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS inventory_media_fts_update",
+    "DROP TRIGGER IF EXISTS inventory_media_fts_delete",
+    "DROP TRIGGER IF EXISTS inventory_media_fts_insert",
+    "DROP TABLE IF EXISTS inventory_media_fts",
+]
+
+
+def run_for_vendor(postgresql, sqlite):
+    def run(apps, schema_editor):
+        statements = {'postgresql': postgresql, 'sqlite': sqlite}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_medianumbercounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(POSTGRESQL_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRESQL_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
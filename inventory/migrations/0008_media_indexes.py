@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_media_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(fields=['category', 'media_number'], name='media_category_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(condition=models.Q(('isbn13__isnull', False)), fields=['isbn13'], name='media_isbn13_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(condition=models.Q(('legacy_media_number__isnull', False)), fields=['category', 'legacy_media_number'], name='media_legacy_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='media',
+            index=models.Index(condition=models.Q(('left_library_date__isnull', True)), fields=['site', 'media_number'], name='media_site_in_stock_idx'),
+        ),
+    ]
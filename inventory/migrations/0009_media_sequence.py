@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:14
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_sequence(apps, schema_editor):
+    """Derive the running number from the numeric part of every existing media number."""
+    MediaCategory = apps.get_model('inventory', 'MediaCategory')
+    Media = apps.get_model('inventory', 'Media')
+
+    for category in MediaCategory.objects.all():
+        batch = []
+        for media in Media.objects.filter(category=category).only('pk', 'media_number').iterator(chunk_size=BATCH_SIZE):
+            number = media.media_number[len(category.code):]
+            if media.media_number.startswith(category.code) and number.isdigit():
+                media.sequence = int(number)
+                batch.append(media)
+            if len(batch) >= BATCH_SIZE:
+                Media.objects.bulk_update(batch, ['sequence'])
+                batch = []
+        Media.objects.bulk_update(batch, ['sequence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_media_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='media',
+            name='sequence',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Running number within the category; media_number is derived from it.', null=True),
+        ),
+        migrations.RunPython(backfill_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:14
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module('inventory.migrations.0007_media_search_index')
+
+# SQLite adds and removes the constraint by rebuilding inventory_media, which drops
+# the full-text search triggers; recreate them and rebuild the index afterwards.
+restore_search_index = search_index.run_for_vendor([], search_index.SQLITE_FORWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_media_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_index),
+        migrations.AddConstraint(
+            model_name='media',
+            constraint=models.UniqueConstraint(fields=('category', 'sequence'), name='media_category_sequence_unique'),
+        ),
+        migrations.RunPython(restore_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-17 21:03
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_media_category_sequence_unique'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='media',
+            options={'ordering': ['category__code', 'sequence', 'media_number'], 'verbose_name': 'Media', 'verbose_name_plural': 'Media'},
+        ),
+    ]
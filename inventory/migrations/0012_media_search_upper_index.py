@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# icontains compiles to UPPER("title"::text) LIKE UPPER(%s) on PostgreSQL, which only an
+# index on the same expression can serve; the indexes on the bare columns were never used.
+POSTGRESQL_FORWARD = [
+    "DROP INDEX IF EXISTS media_title_trgm_idx",
+    "DROP INDEX IF EXISTS media_authors_trgm_idx",
+    "CREATE INDEX IF NOT EXISTS media_title_upper_trgm_idx ON inventory_media USING gin (UPPER(title::text) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS media_authors_upper_trgm_idx ON inventory_media USING gin (UPPER(authors::text) gin_trgm_ops)",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS media_authors_upper_trgm_idx",
+    "DROP INDEX IF EXISTS media_title_upper_trgm_idx",
+    "CREATE INDEX IF NOT EXISTS media_title_trgm_idx ON inventory_media USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS media_authors_trgm_idx ON inventory_media USING gin (authors gin_trgm_ops)",
+]
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_media_numeric_ordering'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(POSTGRESQL_FORWARD), run_on_postgresql(POSTGRESQL_BACKWARD)),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_media_search_upper_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='media',
+            options={'ordering': ['category_id', models.OrderBy(models.F('sequence'), nulls_last=True), 'media_number'], 'verbose_name': 'Media', 'verbose_name_plural': 'Media'},
+        ),
+    ]
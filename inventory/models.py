@@ -1,11 +1,61 @@
-from django.db import models
+import time
+
+from django.core.cache import cache
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from .functions import validate_isbn13
+from audit.tracking import AuditedModel, AuditQuerySet
+from .functions import validate_isbn13, format_media_number
+
+
+class ReferenceDataManager(models.Manager.from_queryset(AuditQuerySet)):
+    """
+    Manager for small lookup tables that change a few times a year.
+
+    `cached()` keeps all rows in a process-local cache for REFERENCE_DATA_LOCAL_TIMEOUT
+    seconds, backed by the shared Django cache. Saving or deleting a row clears both
+    tiers in this process (see inventory.signals); other processes pick up the change
+    when their local copy expires. Treat the returned instances as read-only.
+    """
+    _local = {}
+
+    @property
+    def cache_key(self):
+        return f'inventory:reference:{self.model._meta.label_lower}'
+
+    def cached(self):
+        """Return all rows in the model's default ordering, from cache if possible."""
+        local_timeout = getattr(settings, 'REFERENCE_DATA_LOCAL_TIMEOUT', 60)
+        entry = self._local.get(self.cache_key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        objects = cache.get(self.cache_key)
+        if objects is None:
+            objects = list(self.get_queryset())
+            cache.set(self.cache_key, objects, getattr(settings, 'REFERENCE_DATA_TIMEOUT', 3600))
+        self._local[self.cache_key] = (time.monotonic() + local_timeout, objects)
+        return objects
+
+    def cached_get(self, pk):
+        """Return the row with the given primary key, from cache if possible."""
+        for obj in self.cached():
+            if obj.pk == pk:
+                return obj
+        # Possibly created in another process after our copy was cached
+        self.clear_cache()
+        return self.get(pk=pk)
 
-class MediaCategory(models.Model):
+    def clear_cache(self):
+        self._local.pop(self.cache_key, None)
+        cache.delete(self.cache_key)
+
+
+class MediaCategory(AuditedModel):
     code = models.CharField(
         max_length=3, 
         unique=True, 
@@ -50,6 +100,8 @@ class MediaCategory(models.Model):
         help_text="User who last updated the category."
     )
 
+    objects = ReferenceDataManager()
+
     class Meta:
         ordering = ['code']
         verbose_name = 'Media Category'
@@ -59,7 +111,7 @@ class MediaCategory(models.Model):
         return f'{self.code} - {self.name}'
     
 
-class MediaType(models.Model):
+class MediaType(AuditedModel):
     name = models.CharField(max_length=255, unique=True, help_text="Name of the media type, e.g., Book, Game, Music CD.")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -80,6 +132,8 @@ class MediaType(models.Model):
         help_text="User who last updated this media type."
     )
 
+    objects = ReferenceDataManager()
+
     class Meta:
         ordering = ['name']
         verbose_name = 'Media Type'
@@ -88,7 +142,7 @@ class MediaType(models.Model):
     def __str__(self):
         return self.name
 
-class LibrarySite(models.Model):
+class LibrarySite(AuditedModel):
     name = models.CharField(max_length=255, unique=True, help_text="Unique name of the library site.")
     description = models.TextField(blank=True, null=True, help_text="Optional description of the library site.")
     opening_hours = models.TextField(blank=True, null=True, help_text="Opening hours for the library site.")
@@ -112,6 +166,8 @@ class LibrarySite(models.Model):
         help_text="User who last updated the site."
     )
 
+    objects = ReferenceDataManager()
+
     class Meta:
         ordering = ['name']
         verbose_name = 'Library Site'
@@ -121,7 +177,7 @@ class LibrarySite(models.Model):
         return self.name
     
 
-class Media(models.Model):
+class Media(AuditedModel):
     title = models.CharField(max_length=255, help_text="Full title of the media.")
     authors = models.CharField(max_length=255, blank=True, null=True, help_text="Authors of the media (optional).")
     site = models.ForeignKey(LibrarySite, on_delete=models.CASCADE, help_text="Library site where this media is stored.")
@@ -129,6 +185,12 @@ class Media(models.Model):
     media_type = models.ForeignKey(MediaType, on_delete=models.CASCADE, help_text="Type of media (e.g., Book, Game, Music CD).")
     legacy_media_number = models.CharField(max_length=4, blank=True, null=True, help_text="Legacy media number (0001-9999).")
     media_number = models.CharField(max_length=10, unique=True, help_text="Automatically generated media number.")
+    sequence = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Running number within the category; media_number is derived from it."
+    )
     isbn13 = models.CharField(max_length=13, blank=True, null=True, help_text="ISBN13 number (optional).")
     acquisition_date = models.DateField(blank=True, null=True, help_text="Acquisition date of the media (optional).")
     price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, help_text="Price of the media (optional).")
@@ -157,10 +219,32 @@ class Media(models.Model):
         help_text="User who last updated this media."
     )
 
+    objects = AuditQuerySet.as_manager()
+
     class Meta:
-        ordering = ['media_number']
+        # Numeric within a category, so T9999 comes before T10000, without joining the category and
+        # in the order of media_category_sequence_unique. Rows without a sequence (non-numeric legacy
+        # numbers) come last on every database.
+        ordering = ['category_id', models.F('sequence').asc(nulls_last=True), 'media_number']
         verbose_name = 'Media'
         verbose_name_plural = 'Media'
+        constraints = [
+            # Also serves the highest number per category as an integer index scan
+            models.UniqueConstraint(fields=['category', 'sequence'], name='media_category_sequence_unique'),
+        ]
+        indexes = [
+            # Admin lists filtered by category and ordered by media number
+            models.Index(fields=['category', 'media_number'], name='media_category_number_idx'),
+            # ISBN and legacy number lookups; most rows have neither, so only index the set ones
+            models.Index(fields=['isbn13'], condition=models.Q(isbn13__isnull=False), name='media_isbn13_idx'),
+            models.Index(
+                fields=['category', 'legacy_media_number'],
+                condition=models.Q(legacy_media_number__isnull=False),
+                name='media_legacy_number_idx'
+            ),
+            # Items still in stock per site
+            models.Index(fields=['site', 'media_number'], condition=models.Q(left_library_date__isnull=True), name='media_site_in_stock_idx'),
+        ]
 
     def clean(self):
         """
@@ -174,27 +258,98 @@ class Media(models.Model):
         if self.isbn13 and not validate_isbn13(self.isbn13):
             raise ValidationError("The ISBN-13 number is not valid.")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the category the row was loaded with to detect recategorisation on save."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
+
     def save(self, *args, **kwargs):
         """
         Override save method to set the media_number automatically.
+        New numbers are taken from the per-category MediaNumberCounter, so existing
+        media keep their number unless they move to another category.
         """
-        # If legacy_media_number is provided, use it as media_number
-        if self.legacy_media_number:
-            self.media_number = f"{self.category.code}{self.legacy_media_number.zfill(4)}"
+        if self.category_id is not None and not Media.category.is_cached(self):
+            # Avoid a query for the category code if only category_id is set. The cached
+            # instance is shared by the whole process, so only its code is read.
+            category_code = MediaCategory.objects.cached_get(self.category_id).code
         else:
-            # Find the highest media_number in the same category
-            last_media = Media.objects.filter(category=self.category).order_by('-media_number').first()
+            category_code = self.category.code
 
-            if last_media:
-                # Extract the numeric part from the media_number and increment it
-                last_number = int(last_media.media_number[len(self.category.code):])
-                new_number = last_number + 1
-            else:
-                new_number = 1  # Start with 0001 if no media in this category
+        with transaction.atomic(using=kwargs.get('using')):
+            # If legacy_media_number is provided, use it as media_number
+            if self.legacy_media_number:
+                media_number = format_media_number(category_code, self.legacy_media_number)
+                if media_number != self.media_number and self.legacy_media_number.isdigit():
+                    # Keep the counter ahead of manually assigned legacy numbers
+                    MediaNumberCounter.objects.advance_to(self.category_id, int(self.legacy_media_number))
+                self.media_number = media_number
+                self.sequence = int(self.legacy_media_number) if self.legacy_media_number.isdigit() else None
+            elif self._state.adding or not self.media_number or self.category_id != getattr(self, '_loaded_category_id', self.category_id):
+                self.sequence = MediaNumberCounter.objects.reserve(self.category_id)
+                self.media_number = format_media_number(category_code, self.sequence)
 
-            self.media_number = f"{self.category.code}{str(new_number).zfill(4)}"
-        
-        super().save(*args, **kwargs)  # Call the real save() method
+            super().save(*args, **kwargs)  # Call the real save() method
+        self._loaded_category_id = self.category_id
+
+    def __str__(self):
+        return f"{self.media_number} - {self.title}"
+
+
+class MediaNumberCounterManager(models.Manager):
+    def _ensure(self, category):
+        """Create the counter for `category` (an instance or primary key), seeded from the media already stored in it."""
+        if self.filter(category=category).exists():
+            return
+        last_number = Media.objects.filter(category=category).aggregate(last_number=Max('sequence'))['last_number'] or 0
+        try:
+            with transaction.atomic():
+                self.create(category_id=getattr(category, 'pk', category), last_number=last_number)
+        except IntegrityError:
+            pass  # Another worker created the counter concurrently
+
+    def reserve(self, category, count=1):
+        """
+        Atomically reserve a block of `count` consecutive media numbers for `category`.
+
+        :param category: The MediaCategory, or its primary key, to allocate numbers in.
+        :param count: Number of media numbers to reserve.
+        :return: The first number of the reserved block.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        with transaction.atomic(savepoint=False):
+            # The UPDATE takes the row lock, so concurrent callers are serialised until commit
+            if not self.filter(category=category).update(last_number=F('last_number') + count):
+                self._ensure(category)
+                self.filter(category=category).update(last_number=F('last_number') + count)
+            last_number = self.filter(category=category).values_list('last_number', flat=True).get()
+        return last_number - count + 1
+
+    def advance_to(self, category, number):
+        """Make sure the counter for `category` never hands out `number` or anything below it."""
+        with transaction.atomic(savepoint=False):
+            if not self.filter(category=category).update(last_number=Greatest(F('last_number'), number)):
+                self._ensure(category)
+                self.filter(category=category).update(last_number=Greatest(F('last_number'), number))
+
+
+class MediaNumberCounter(models.Model):
+    category = models.OneToOneField(
+        MediaCategory,
+        on_delete=models.CASCADE,
+        related_name='media_number_counter',
+        help_text="Media category this counter allocates numbers for."
+    )
+    last_number = models.PositiveIntegerField(default=0, help_text="Highest media number handed out in this category.")
+
+    objects = MediaNumberCounterManager()
+
+    class Meta:
+        verbose_name = 'Media Number Counter'
+        verbose_name_plural = 'Media Number Counters'
 
     def __str__(self):
-        return f"{self.media_number} - {self.title}"
\ No newline at end of file
+        return f"{self.category.code}: {self.last_number}"
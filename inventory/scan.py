@@ -0,0 +1,136 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .functions import normalize_isbn, validate_isbn13
+from .models import Media
+
+LABEL_PATTERN = re.compile(r'^([A-Z]{1,3})(\d{1,4})$')
+
+SCAN_FIELDS = ('media_number', 'title', 'authors', 'isbn13', 'site__name', 'category__code', 'media_type__name', 'left_library_date')
+
+
+class LRUCache:
+    """Small thread-safe in-process LRU cache with a time to live per entry."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+scan_cache = LRUCache(
+    maxsize=getattr(settings, 'SCAN_CACHE_SIZE', 4096),
+    timeout=getattr(settings, 'SCAN_CACHE_TIMEOUT', 300),
+)
+
+
+def _serialize(row):
+    media_number, title, authors, isbn13, site, category, media_type, left_library_date = row
+    return {
+        'media_number': media_number,
+        'title': title,
+        'authors': authors,
+        'isbn13': isbn13,
+        'site': site,
+        'category': category,
+        'media_type': media_type,
+        'in_stock': left_library_date is None,
+    }
+
+
+def _candidates(code):
+    """Return the indexed exact lookups for a scanned code, in the order they are tried."""
+    isbn = normalize_isbn(code)
+    if isbn and isbn.isdigit() and len(isbn) == 13 and validate_isbn13(isbn):
+        # Several copies can share an ISBN
+        return [Media.objects.filter(isbn13=isbn).values_list(*SCAN_FIELDS)]
+
+    code = code.upper()
+    candidates = [Media.objects.filter(media_number=code).values_list(*SCAN_FIELDS)[:1]]
+    # Legacy labels may carry the legacy number without leading zeros, e.g. "T15" for T0015
+    match = LABEL_PATTERN.match(code)
+    if match:
+        candidates.append(
+            Media.objects
+            .filter(category__code=match.group(1), legacy_media_number=match.group(2).zfill(4))
+            .values_list(*SCAN_FIELDS)[:1]
+        )
+    return candidates
+
+
+def _lookup(code):
+    for queryset in _candidates(code):
+        rows = list(queryset)
+        if rows:
+            return [_serialize(row) for row in rows]
+    return []
+
+
+async def _alookup(code):
+    for queryset in _candidates(code):
+        rows = [row async for row in queryset]
+        if rows:
+            return [_serialize(row) for row in rows]
+    return []
+
+
+def resolve_scan(code):
+    """
+    Turn a scanned media number, legacy label or ISBN-13 into the matching media.
+    Found codes are kept in the in-process LRU cache; unknown codes are not cached,
+    so freshly catalogued media are found immediately.
+
+    :param code: The scanned code.
+    :return: A list of media dicts (empty if nothing matches).
+    """
+    code = code.strip()
+    key = code.upper()
+    media = scan_cache.get(key)
+    if media is None:
+        media = _lookup(code)
+        if media:
+            scan_cache.set(key, media)
+    return media
+
+
+async def aresolve_scan(code):
+    """Async version of resolve_scan() using the async ORM, for the ASGI scan endpoint."""
+    code = code.strip()
+    key = code.upper()
+    media = scan_cache.get(key)
+    if media is None:
+        media = await _alookup(code)
+        if media:
+            scan_cache.set(key, media)
+    return media
@@ -0,0 +1,69 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .functions import normalize_isbn, validate_isbn13
+from .models import Media
+
+MEDIA_NUMBER_PATTERN = re.compile(r'^[A-Za-z]{1,3}\d{4,}$')
+
+# Shortest term the SQLite trigram tokenizer can match
+FTS_MIN_LENGTH = 3
+
+
+def _exact_match(term):
+    """
+    Return an exact lookup for terms that look like an ISBN-13 or a media number, else None.
+    Both columns are indexed, so these lookups never touch the text search.
+    """
+    isbn = normalize_isbn(term)
+    if isbn and validate_isbn13(isbn):
+        return Q(isbn13=isbn)
+    if MEDIA_NUMBER_PATTERN.match(term):
+        return Q(media_number=term.upper())
+    return None
+
+
+def _fts_quote(word):
+    return '"' + word.replace('"', '""') + '"'
+
+
+def search_media(term, queryset=None):
+    """
+    Search media by media number, ISBN-13, title and authors.
+
+    ISBNs and media numbers are looked up exactly. Otherwise every word of the term
+    has to occur in the title or the authors. On PostgreSQL the icontains lookups compile
+    to UPPER(column) LIKE UPPER(%s), served by the trigram GIN indexes on UPPER(title) and
+    UPPER(authors) for words of three or more characters; on SQLite the words are matched
+    against the inventory_media_fts table.
+
+    :param term: The search term as entered by the user.
+    :param queryset: Optional Media queryset to search in (default: all media).
+    :return: A filtered queryset.
+    """
+    if queryset is None:
+        queryset = Media.objects.all()
+    term = term.strip()
+    if not term:
+        return queryset
+
+    exact = _exact_match(term)
+    if exact is not None:
+        return queryset.filter(exact)
+
+    words = term.split()
+    if connection.vendor == 'sqlite':
+        fts_words = [word for word in words if len(word) >= FTS_MIN_LENGTH]
+        if fts_words:
+            match = ' AND '.join(_fts_quote(word) for word in fts_words)
+            queryset = queryset.filter(pk__in=RawSQL(
+                "SELECT rowid FROM inventory_media_fts WHERE inventory_media_fts MATCH %s", (match,)
+            ))
+            words = [word for word in words if len(word) < FTS_MIN_LENGTH]
+
+    for word in words:
+        queryset = queryset.filter(Q(title__icontains=word) | Q(authors__icontains=word))
+    return queryset
@@ -0,0 +1,121 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .functions import format_media_number
+from .models import Media, MediaNumberCounter
+from .scan import scan_cache
+
+# Rows per UPDATE statement when media are renumbered
+BATCH_SIZE = 500
+
+
+def _update(queryset, user, **values):
+    """Write `values` and the audit columns of the media in `queryset` with one UPDATE."""
+    with transaction.atomic():
+        count = queryset.update(**values, updated_at=timezone.now(), updated_by=user)
+        # update() sends no post_save signals, so forget resolved scans explicitly
+        transaction.on_commit(scan_cache.clear)
+    return count
+
+
+def transfer_site(queryset, site, user=None):
+    """
+    Move the media in `queryset` to another LibrarySite with one UPDATE.
+
+    :return: The number of media moved; those already at `site` are not touched.
+    """
+    return _update(queryset.exclude(site=site), user, site=site)
+
+
+def change_media_type(queryset, media_type, user=None):
+    """Set the MediaType of the media in `queryset` with one UPDATE and return their number."""
+    return _update(queryset.exclude(media_type=media_type), user, media_type=media_type)
+
+
+def retire(queryset, left_library_date=None, user=None):
+    """
+    Stamp the date discarded media left the library with one UPDATE.
+
+    :param left_library_date: Default: today. Media that already left keep their date.
+    :return: The number of media retired.
+    """
+    left_library_date = left_library_date or timezone.localdate()
+    return _update(queryset.filter(left_library_date__isnull=True), user, left_library_date=left_library_date)
+
+
+def recategorise(queryset, category, user=None, batch_size=BATCH_SIZE):
+    """
+    Move the media in `queryset` to another MediaCategory and renumber them in bulk.
+
+    As in Media.save(), media with a legacy number keep it under the new category code;
+    the others get consecutive numbers from one block reserved on the category counter,
+    in the order of their old media numbers. The rows are written with bulk_update(),
+    one UPDATE per `batch_size` media, instead of one save() per media.
+
+    :return: The number of media moved; those already in `category` are not touched.
+    :raises ValueError: If a legacy number is already taken in `category`; nothing is moved then.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        media = list(
+            # Admin changelists join the related models, which cannot be combined with only()
+            queryset.select_related(None)
+            .exclude(category=category)
+            .select_for_update(of=('self',))
+            .order_by('category_id', F('sequence').asc(nulls_last=True), 'media_number')
+            .only('legacy_media_number', 'media_number', 'sequence', 'category')
+        )
+        if not media:
+            return 0
+        _check_legacy_numbers(media, category)
+
+        unnumbered = []
+        legacy_numbers = []
+        for obj in media:
+            if obj.legacy_media_number:
+                obj.media_number = format_media_number(category.code, obj.legacy_media_number)
+                obj.sequence = int(obj.legacy_media_number) if obj.legacy_media_number.isdigit() else None
+                if obj.sequence is not None:
+                    legacy_numbers.append(obj.sequence)
+            else:
+                unnumbered.append(obj)
+        if legacy_numbers:
+            # Keep the counter ahead of the legacy numbers moved into the category
+            MediaNumberCounter.objects.advance_to(category, max(legacy_numbers))
+        if unnumbered:
+            first_number = MediaNumberCounter.objects.reserve(category, count=len(unnumbered))
+            for offset, obj in enumerate(unnumbered):
+                obj.sequence = first_number + offset
+                obj.media_number = format_media_number(category.code, obj.sequence)
+
+        for obj in media:
+            obj.category = category
+            obj.updated_at = now
+            obj.updated_by = user
+        Media.objects.bulk_update(
+            media, ['category', 'media_number', 'sequence', 'updated_at', 'updated_by'], batch_size=batch_size
+        )
+        transaction.on_commit(scan_cache.clear)
+    return len(media)
+
+
+def _check_legacy_numbers(media, category):
+    """Raise ValueError if the legacy numbers of `media` are taken in `category` or used twice among them."""
+    legacy_numbers = [obj.legacy_media_number for obj in media if obj.legacy_media_number]
+    if not legacy_numbers:
+        return
+    media_numbers = Counter(format_media_number(category.code, legacy) for legacy in legacy_numbers)
+    sequences = [int(legacy) for legacy in legacy_numbers if legacy.isdigit()]
+    # One query for the numbers and sequences already used in the category
+    taken = set(
+        Media.objects.filter(Q(media_number__in=media_numbers) | Q(category=category, sequence__in=sequences))
+        .values_list('media_number', flat=True)
+    )
+    taken.update(number for number, count in media_numbers.items() if count > 1)
+    if taken:
+        raise ValueError(
+            f"Legacy media numbers already taken in {category}: {', '.join(sorted(taken))}. No media were moved."
+        )
@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import LibrarySite, Media, MediaCategory, MediaType
+from .scan import scan_cache
+
+
+@receiver([post_save, post_delete], sender=MediaCategory)
+@receiver([post_save, post_delete], sender=MediaType)
+@receiver([post_save, post_delete], sender=LibrarySite)
+def clear_reference_data_cache(sender, **kwargs):
+    """
+    Drop the cached rows of the changed lookup table.
+    Cleared again after commit, in case the table was re-cached while the transaction was open.
+    """
+    sender.objects.clear_cache()
+    transaction.on_commit(sender.objects.clear_cache)
+
+
+@receiver([post_save, post_delete], sender=Media)
+@receiver([post_save, post_delete], sender=MediaCategory)
+@receiver([post_save, post_delete], sender=MediaType)
+@receiver([post_save, post_delete], sender=LibrarySite)
+def clear_scan_cache(sender, **kwargs):
+    """Forget resolved scans, their media numbers, titles or site names may have changed."""
+    scan_cache.clear()
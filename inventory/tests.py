@@ -278,10 +278,42 @@ class ISBN13ValidationTest(TestCase):
         self.assertFalse(validate_isbn13(isbn))
         
         
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date
+from freezegun import freeze_time
+from decimal import Decimal
+from pathlib import Path
+from xml.etree import ElementTree
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from django.core.exceptions import ValidationError
 from users.models import CustomUser
-from .models import Media, MediaCategory, MediaType, LibrarySite
+from .exports import export_response, stream_export
+from .fixture_loader import Checkpoint, iter_fixture_objects, iter_json_array
+from .imports import MediaImporter, read_media_rows
+from .scan import aresolve_scan, resolve_scan, scan_cache
+from .search import search_media
+from .services import recategorise, retire, transfer_site
+from .models import Media, MediaCategory, MediaType, LibrarySite, MediaNumberCounter
+
+# The manifest storage needs collectstatic, which is not run for tests
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
 
 class MediaModelTest(TestCase):
 
@@ -336,4 +368,700 @@ class MediaModelTest(TestCase):
             created_by=self.user,
             updated_by=self.user
         )
-        self.assertEqual(media.media_number, "T0001")
\ No newline at end of file
+        self.assertEqual(media.media_number, "T0001")
+
+    def test_media_number_kept_on_update(self):
+        """Test that saving an existing media item does not allocate a new media_number."""
+        media = Media.objects.create(
+            title="Stable Number",
+            site=self.site,
+            category=self.category,
+            media_type=self.media_type,
+            created_by=self.user,
+            updated_by=self.user
+        )
+        media.title = "Stable Number (2nd edition)"
+        media.save()
+        media.refresh_from_db()
+        self.assertEqual(media.media_number, "T0001")
+
+    def test_media_number_after_legacy(self):
+        """Test that auto-generated numbers continue after the highest legacy number."""
+        Media.objects.create(
+            title="Legacy Media",
+            site=self.site,
+            category=self.category,
+            media_type=self.media_type,
+            legacy_media_number="0042",
+            created_by=self.user,
+            updated_by=self.user
+        )
+        media = Media.objects.create(
+            title="Next Media",
+            site=self.site,
+            category=self.category,
+            media_type=self.media_type,
+            created_by=self.user,
+            updated_by=self.user
+        )
+        self.assertEqual(media.media_number, "T0043")
+
+    def test_media_number_on_category_change(self):
+        """Test that moving a media item to another category allocates a number in that category."""
+        other_category = MediaCategory.objects.create(code='M', name='Märchen', created_by=self.user)
+        media = Media.objects.create(
+            title="Moving Media",
+            site=self.site,
+            category=self.category,
+            media_type=self.media_type,
+            created_by=self.user,
+            updated_by=self.user
+        )
+        media = Media.objects.get(pk=media.pk)
+        media.category = other_category
+        media.save()
+        self.assertEqual(media.media_number, "M0001")
+
+
+class MediaNumberCounterTest(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='testuser@example.com', password='12345')
+        self.category = MediaCategory.objects.create(code='T', name='Tiergeschichten', created_by=self.user)
+
+    def test_reserve_block(self):
+        """Test that reserving a block returns consecutive numbers and advances the counter."""
+        self.assertEqual(MediaNumberCounter.objects.reserve(self.category, count=10), 1)
+        self.assertEqual(MediaNumberCounter.objects.reserve(self.category), 11)
+        self.assertEqual(MediaNumberCounter.objects.get(category=self.category).last_number, 11)
+
+    def test_reserve_seeds_from_existing_media(self):
+        """Test that a missing counter is seeded from the media numbers already in the category."""
+        media_type = MediaType.objects.create(name='Book', created_by=self.user)
+        site = LibrarySite.objects.create(name='Central Library', created_by=self.user)
+        Media.objects.create(title="Legacy", site=site, category=self.category, media_type=media_type, legacy_media_number="0007")
+        MediaNumberCounter.objects.all().delete()
+        self.assertEqual(MediaNumberCounter.objects.reserve(self.category), 8)
+
+    def test_reserve_single_query_when_counter_exists(self):
+        """Test that an existing counter is incremented without scanning the media table."""
+        MediaNumberCounter.objects.reserve(self.category)
+        with self.assertNumQueries(2):
+            MediaNumberCounter.objects.reserve(self.category)
+
+    def test_sequence_continues_past_9999(self):
+        """Test that numbering continues numerically once a category has more than 9999 media."""
+        media_type = MediaType.objects.create(name='Book', created_by=self.user)
+        site = LibrarySite.objects.create(name='Central Library', created_by=self.user)
+        MediaNumberCounter.objects.reserve(self.category, count=9998)
+        numbers = [
+            Media.objects.create(title=f"Book {index}", site=site, category=self.category, media_type=media_type)
+            for index in range(3)
+        ]
+        self.assertEqual([media.media_number for media in numbers], ['T9999', 'T10000', 'T10001'])
+        self.assertEqual([media.sequence for media in numbers], [9999, 10000, 10001])
+        # The default ordering is numeric as well, without joining the category; media without a sequence come last
+        Media.objects.create(title="Altbestand", legacy_media_number="AB12", site=site, category=self.category, media_type=media_type)
+        self.assertEqual(list(Media.objects.values_list('media_number', flat=True)), ['T9999', 'T10000', 'T10001', 'TAB12'])
+        self.assertNotIn('JOIN', str(Media.objects.all().query))
+
+        # A re-seeded counter takes the numeric maximum, not the lexical one ('T9999' > 'T10001')
+        MediaNumberCounter.objects.all().delete()
+        self.assertEqual(MediaNumberCounter.objects.reserve(self.category), 10002)
+
+
+class MediaImporterTest(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='testuser@example.com', password='12345')
+        self.category = MediaCategory.objects.create(code='T', name='Tiergeschichten', created_by=self.user)
+        self.media_type = MediaType.objects.create(name='Book', created_by=self.user)
+        self.site = LibrarySite.objects.create(name='Central Library', created_by=self.user)
+
+    def test_import_csv(self):
+        """Test that valid rows are imported with consecutive media numbers and invalid rows are reported."""
+        data = io.StringIO(
+            "title,authors,site,category,media_type,isbn13,price\n"
+            "Der Fuchs,A. Autor,Central Library,T,Book,9781861972712,\"12,50\"\n"
+            "Der Hase,,Central Library,T,Book,,\n"
+            "Falsche ISBN,,Central Library,T,Book,9781861972718,\n"
+            "Unbekannt,,Nowhere,T,Book,,\n"
+        )
+        result = MediaImporter(user=self.user).run(read_media_rows(data, 'csv'))
+        self.assertEqual(result.created, 2)
+        self.assertEqual([row_number for row_number, _ in result.errors], [3, 4])
+        self.assertEqual(
+            list(Media.objects.values_list('media_number', 'title')),
+            [('T0001', 'Der Fuchs'), ('T0002', 'Der Hase')]
+        )
+        self.assertEqual(Media.objects.get(media_number='T0001').created_by, self.user)
+
+    def test_invalid_prices_reported_per_row(self):
+        """Test that prices the price column cannot store are row errors and the other rows are imported."""
+        data = io.StringIO(
+            "title,site,category,media_type,price\n"
+            "Gut,Central Library,T,Book,\"12,50\"\n"
+            "Keine Zahl,Central Library,T,Book,NaN\n"
+            "Unendlich,Central Library,T,Book,Infinity\n"
+            "Zu teuer,Central Library,T,Book,12345678901\n"
+            "Zu genau,Central Library,T,Book,1.005\n"
+            "Kaputt,Central Library,T,Book,abc\n"
+        )
+        result = MediaImporter(user=self.user).run(read_media_rows(data, 'csv'))
+        self.assertEqual(result.created, 1)
+        self.assertEqual([row_number for row_number, _ in result.errors], [2, 3, 4, 5, 6])
+        self.assertTrue(all(message.startswith("Invalid price") for _, message in result.errors))
+        self.assertEqual(Media.objects.get().price, Decimal('12.50'))
+
+    def test_import_jsonl_with_legacy_numbers(self):
+        """Test that legacy numbers are kept and new numbers continue after them."""
+        data = io.StringIO(
+            '{"title": "Alt", "site": "Central Library", "category": "t", "media_type": "book", "legacy_media_number": "12"}\n'
+            '{"title": "Neu", "site": "Central Library", "category": "T", "media_type": "Book"}\n'
+        )
+        result = MediaImporter().run(read_media_rows(data, 'jsonl'))
+        self.assertEqual(result.created, 2)
+        self.assertEqual(set(Media.objects.values_list('media_number', flat=True)), {'T0012', 'T0013'})
+
+    def test_import_query_count_independent_of_rows(self):
+        """Test that a batch costs a constant number of queries regardless of its size."""
+        rows = [{'title': f"Buch {i}", 'site': 'Central Library', 'category': 'T', 'media_type': 'Book'} for i in range(200)]
+        importer = MediaImporter(batch_size=500)
+        with CaptureQueriesContext(connection) as queries:
+            importer.run(rows)
+        # Lookups, counter update and a handful of INSERTs (SQLite splits them by its variable limit)
+        self.assertLess(len(queries), 20)
+        self.assertEqual(Media.objects.count(), 200)
+
+    def test_unreadable_rows_reported(self):
+        """Test that invalid JSON lines and non-UTF-8 files are reported as row errors instead of aborting."""
+        data = io.StringIO(
+            '{"title": "Gut", "site": "Central Library", "category": "T", "media_type": "Book"}\n'
+            '{"title": "Kaputt", \n'
+            '["keine", "Zeile"]\n'
+        )
+        result = MediaImporter().run(read_media_rows(data, 'jsonl'))
+        self.assertEqual(result.created, 1)
+        self.assertEqual([row_number for row_number, _ in result.errors], [2, 3])
+
+        data = io.TextIOWrapper(io.BytesIO("title,site,category,media_type\nB\xfccher,Central Library,T,Book\n".encode('cp1252')), encoding='utf-8')
+        result = MediaImporter().run(read_media_rows(data, 'csv'))
+        self.assertEqual(result.created, 0)
+        self.assertIn("not UTF-8", result.errors[0][1])
+
+    def test_duplicate_legacy_numbers_reported(self):
+        """Test that legacy numbers taken in the database or earlier in the file are reported per row."""
+        Media.objects.create(title="Alt", site=self.site, category=self.category, media_type=self.media_type, legacy_media_number="0012")
+        rows = [
+            {'title': title, 'site': 'Central Library', 'category': 'T', 'media_type': 'Book', 'legacy_media_number': number}
+            for title, number in (("Doppelt", "12"), ("Neu", "13"), ("Nochmal", "0013"))
+        ]
+        result = MediaImporter(batch_size=2).run(rows)
+        self.assertEqual(result.created, 1)
+        self.assertEqual([row_number for row_number, _ in result.errors], [1, 3])
+        self.assertEqual(Media.objects.get(media_number='T0013').title, "Neu")
+
+    def test_import_media_command(self):
+        """Test the import_media command, also as dry run."""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as file:
+            file.write("title,site,category,media_type\nDer Fuchs,Central Library,T,Book\nOhne Ort,Nowhere,T,Book\n")
+        self.addCleanup(os.remove, file.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_media', file.name, '--dry-run', stdout=out, stderr=err)
+        self.assertIn("Would import 1 media, skipped 1 rows.", out.getvalue())
+        self.assertIn("Row 2: Unknown site 'Nowhere'.", err.getvalue())
+        self.assertFalse(Media.objects.exists())
+        call_command('import_media', file.name, '--user', 'testuser@example.com', stdout=out, stderr=err)
+        self.assertEqual(Media.objects.get().created_by, self.user)
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_admin_upload(self):
+        """Test that the admin upload imports a file and reports an undecodable one instead of failing."""
+        self.client.force_login(CustomUser.objects.create_superuser(email='admin@example.com', password='12345'))
+        url = reverse('admin:inventory_media_import')
+        upload = SimpleUploadedFile('media.jsonl', b'{"title": "Der Fuchs", "site": "Central Library", "category": "T", "media_type": "Book"}\n{"title"\n')
+        response = self.client.post(url, {'file': upload, 'file_format': 'jsonl'}, follow=True)
+        self.assertContains(response, "Imported 1 media.")
+        self.assertContains(response, "Row 2: Invalid JSON")
+
+        upload = SimpleUploadedFile('media.csv', "title,site,category,media_type\nB\xfccher,Central Library,T,Book\n".encode('cp1252'))
+        response = self.client.post(url, {'file': upload, 'file_format': 'csv'}, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "not UTF-8 encoded")
+        self.assertEqual(Media.objects.count(), 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class InventoryAdminQueryCountTest(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_superuser(email='admin@example.com', password='12345')
+        self.client.force_login(self.user)
+        self.category = MediaCategory.objects.create(code='T', name='Tiergeschichten', created_by=self.user, updated_by=self.user)
+        self.media_type = MediaType.objects.create(name='Book', created_by=self.user, updated_by=self.user)
+        self.site = LibrarySite.objects.create(name='Central Library', created_by=self.user, updated_by=self.user)
+        self.editors = [CustomUser.objects.create_user(email=f'editor{i}@example.com', password=None) for i in range(3)]
+
+    def create_media(self, count):
+        editors = self.editors
+        Media.objects.bulk_create([
+            Media(
+                title=f"Buch {i}",
+                site=self.site,
+                category=self.category,
+                media_type=self.media_type,
+                media_number=f"T{Media.objects.count() + i:04d}",
+                created_by=editors[i % 3],
+                updated_by=editors[(i + 1) % 3],
+            )
+            for i in range(count)
+        ])
+
+    def count_changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_media_changelist_constant_queries(self):
+        """Test that the media changelist costs the same number of queries for 5 and 100 rows."""
+        url = reverse('admin:inventory_media_changelist')
+        self.create_media(5)
+        self.client.get(url)  # Warm the reference data cache used by the list filters
+        small_page = self.count_changelist_queries(url)
+        self.create_media(95)
+        full_page = self.count_changelist_queries(url)
+        self.assertEqual(small_page, full_page)
+
+    def test_reference_changelists_constant_queries(self):
+        """Test that the category, site and type changelists do not query users per row."""
+        for model, make in (
+            (MediaCategory, lambda i, user: MediaCategory(code=f'C{i}', name=f'Kategorie {i}', created_by=user, updated_by=user)),
+            (LibrarySite, lambda i, user: LibrarySite(name=f'Standort {i}', created_by=user, updated_by=user)),
+            (MediaType, lambda i, user: MediaType(name=f'Typ {i}', created_by=user, updated_by=user)),
+        ):
+            url = reverse(f'admin:inventory_{model._meta.model_name}_changelist')
+            small_page = self.count_changelist_queries(url)
+            users = [CustomUser.objects.create_user(email=f'{model._meta.model_name}{i}@example.com', password=None) for i in range(20)]
+            model.objects.bulk_create([make(i, user) for i, user in enumerate(users)])
+            self.assertEqual(self.count_changelist_queries(url), small_page, model._meta.model_name)
+
+
+class MediaSearchTest(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='testuser@example.com', password=None)
+        self.category = MediaCategory.objects.create(code='T', name='Tiergeschichten', created_by=self.user)
+        self.media_type = MediaType.objects.create(name='Book', created_by=self.user)
+        self.site = LibrarySite.objects.create(name='Central Library', created_by=self.user)
+        self.fox = Media.objects.create(title="Der kleine Fuchs", authors="Erika Muster", isbn13="9781861972712",
+                                        site=self.site, category=self.category, media_type=self.media_type)
+        self.hare = Media.objects.create(title="Hase und Igel", authors="Brüder Grimm",
+                                         site=self.site, category=self.category, media_type=self.media_type)
+
+    def search(self, term):
+        return set(search_media(term).values_list('title', flat=True))
+
+    def test_search_title_substring(self):
+        """Test that a part of a word in the title finds the media."""
+        self.assertEqual(self.search("fuch"), {"Der kleine Fuchs"})
+
+    def test_search_words_across_title_and_authors(self):
+        """Test that every word has to match either the title or the authors."""
+        self.assertEqual(self.search("Igel Grimm"), {"Hase und Igel"})
+        self.assertEqual(self.search("Igel Muster"), set())
+
+    def test_search_short_words(self):
+        """Test that words shorter than a trigram still match."""
+        self.assertEqual(self.search("Ig"), {"Hase und Igel"})
+
+    def test_search_exact_isbn_and_media_number(self):
+        """Test the exact-match fast paths for ISBN-13 and media number."""
+        self.assertEqual(self.search("978-1861972712"), {"Der kleine Fuchs"})
+        self.assertEqual(self.search(self.hare.media_number.lower()), {"Hase und Igel"})
+
+    def test_search_index_follows_updates(self):
+        """Test that changed and deleted titles are reflected in the search."""
+        self.fox.title = "Der große Bär"
+        self.fox.save()
+        self.hare.delete()
+        self.assertEqual(self.search("Fuchs"), set())
+        self.assertEqual(self.search("Bär"), {"Der große Bär"})
+        self.assertEqual(self.search("Hase"), set())
+
+    def test_search_endpoint(self):
+        """Test the JSON catalogue search endpoint."""
+        response = self.client.get(reverse('inventory-search'), {'q': 'Fuchs'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['media_number'], self.fox.media_number)
+        self.assertTrue(results[0]['in_stock'])
+
+    def test_search_endpoint_limit_bounds(self):
+        """Test that negative, zero and oversized limits are clamped instead of failing."""
+        url = reverse('inventory-search')
+        for limit, expected in (('-1', 1), ('0', 1), ('1000', 2), ('abc', 2)):
+            response = self.client.get(url, {'q': 'e', 'limit': limit})
+            self.assertEqual(response.status_code, 200, limit)
+            self.assertEqual(len(response.json()['results']), expected, limit)
+
+    def test_search_plan_uses_text_index(self):
+        """Test that the word search is answered from the text index instead of scanning every title."""
+        queryset = search_media("Fuchs Muster")
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # Rolled back with the test transaction; makes the planner pick an index if one matches
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            self.assertIn('media_title_upper_trgm_idx', queryset.explain())
+        else:
+            self.assertIn('inventory_media_fts', queryset.explain())
+
+
+class ExplainMediaQueriesCommandTest(TestCase):
+
+    def test_indexes_survive_command(self):
+        """Test that the plans are printed and the temporarily dropped indexes are restored."""
+        out = io.StringIO()
+        call_command('explain_media_queries', stdout=out)
+        self.assertIn("Before (without media indexes)", out.getvalue())
+        self.assertIn("After (with media indexes)", out.getvalue())
+        with connection.cursor() as cursor:
+            index_names = connection.introspection.get_constraints(cursor, Media._meta.db_table)
+        self.assertIn('media_isbn13_idx', index_names)
+
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class MediaExportTest(TestCase):
+
+    def setUp(self):
+        self.category = MediaCategory.objects.create(code='T', name='Tiergeschichten')
+        self.media_type = MediaType.objects.create(name='Book')
+        self.site = LibrarySite.objects.create(name='Central Library')
+        Media.objects.create(title="Der Fuchs, der \"Schlaue\"", price=Decimal('12.50'), acquisition_date=date(2024, 3, 1),
+                             site=self.site, category=self.category, media_type=self.media_type)
+        Media.objects.create(title="Der Hase & der Igel", price=Decimal('7.25'),
+                             site=self.site, category=self.category, media_type=self.media_type)
+        Media.objects.create(title="Ohne Preis", site=self.site, category=self.category, media_type=self.media_type)
+
+    def test_csv_export(self):
+        """Test that the CSV export has a header, one row per media with names and a price total."""
+        content = b''.join(stream_export('csv', chunk_size=2)).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:3], ["Media number", "Legacy number", "Title"])
+        self.assertEqual(rows[1][0], 'T0001')
+        self.assertEqual(rows[1][2], 'Der Fuchs, der "Schlaue"')
+        self.assertEqual(rows[1][6:10], ['Central Library', 'T', 'Tiergeschichten', 'Book'])
+        self.assertEqual(rows[1][10], '2024-03-01')
+        self.assertEqual(rows[-1][0], "Total")
+        self.assertEqual(rows[-1][2], "3 media")
+        self.assertEqual(rows[-1][-1], '19.75')
+
+    def test_xlsx_export(self):
+        """Test that the streamed XLSX export is a valid workbook containing all rows."""
+        content = b''.join(stream_export('xlsx'))
+        with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+            self.assertIsNone(workbook.testzip())
+            sheet = ElementTree.fromstring(workbook.read('xl/worksheets/sheet1.xml'))
+        namespace = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        rows = sheet.findall('.//x:row', namespace)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[2].find('.//x:t', namespace).text, 'T0002')
+        self.assertEqual(rows[2].findall('.//x:t', namespace)[1].text, "Der Hase & der Igel")
+        self.assertEqual(rows[-1].findall('x:c', namespace)[-1].find('x:v', namespace).text, '19.75')
+
+    def test_export_streams_from_iterator(self):
+        """Test that the media rows are fetched in chunks by the response generator, not up front."""
+        response = export_response('csv', Media.objects.all())
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Disposition'][:30], 'attachment; filename="media-20')
+        with self.assertNumQueries(1):
+            content = b''.join(response.streaming_content)
+        self.assertEqual(content.count(b'\n'), 5)
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        """Test that ASGI requests get an async iterator, which Django streams instead of reading it into memory."""
+        response = export_response('csv', Media.objects.all(), AsyncRequestFactory().get('/'))
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content.count(b'\n'), 5)
+        self.assertIn(b'"Der Fuchs, der ""Schlaue"""', content)
+
+    def test_admin_export_action(self):
+        """Test the admin action exporting the selected media."""
+        self.client.force_login(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        response = self.client.post(reverse('admin:inventory_media_changelist'), {
+            'action': 'export_xlsx',
+            'index': 0,
+            'select_across': '1',
+            '_selected_action': [Media.objects.first().pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+
+    def test_export_command(self):
+        """Test the export_media command writing a filtered file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'inventory.csv'
+            call_command('export_media', str(path), category='t', stdout=io.StringIO())
+            self.assertIn("3 media", path.read_text(encoding='utf-8-sig'))
+
+
+class FixtureLoaderTest(TestCase):
+
+    fixture_path = Path(settings.BASE_DIR) / 'inventory' / 'fixtures' / 'initial_mediacatory_data.json'
+
+    def test_stream_json_array(self):
+        """Test that the streaming parser yields the same objects as json.load, across block boundaries."""
+        with self.fixture_path.open(encoding='utf-8') as stream:
+            expected = json.load(stream)
+        with self.fixture_path.open(encoding='utf-8') as stream:
+            self.assertEqual(list(iter_fixture_objects(stream, 'json')), expected)
+        with self.fixture_path.open(encoding='utf-8') as stream:
+            self.assertEqual(list(iter_json_array(stream, read_size=7)), expected)
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('{"model": "inventory.mediacategory"}')))
+
+    def test_load_and_upsert(self):
+        """Test that loading a fixture twice updates the existing rows instead of duplicating them."""
+        call_command('load_fixtures', str(self.fixture_path), batch_size=10, stdout=io.StringIO())
+        self.assertEqual(MediaCategory.objects.count(), 26)
+        MediaCategory.objects.filter(code='T').update(name="Changed")
+        call_command('load_fixtures', str(self.fixture_path), stdout=io.StringIO())
+        self.assertEqual(MediaCategory.objects.count(), 26)
+        category = MediaCategory.objects.get(code='T')
+        self.assertEqual(category.name, "Tiergeschichten")
+        self.assertEqual(category.created_at.year, 2024)
+
+    def test_resume_from_checkpoint(self):
+        """Test that an interrupted load resumes after the objects committed before."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'categories.json'
+            shutil.copy(self.fixture_path, path)
+            Checkpoint(f"{path}.checkpoint", path).save(20)
+            out = io.StringIO()
+            call_command('load_fixtures', str(path), stdout=out)
+            self.assertIn("Resuming", out.getvalue())
+            self.assertEqual(MediaCategory.objects.count(), 6)
+            self.assertFalse(Path(f"{path}.checkpoint").exists())
+
+    def test_media_sequence_and_counter(self):
+        """Test that loaded media get their sequence from the media number and the counter is advanced."""
+        site = LibrarySite.objects.create(name='Central Library')
+        media_type = MediaType.objects.create(name='Book')
+        category = MediaCategory.objects.create(code='T', name='Tiergeschichten')
+        rows = [
+            {'model': 'inventory.media', 'pk': pk, 'fields': {
+                'title': f"Alt {pk}", 'site': site.pk, 'category': category.pk, 'media_type': media_type.pk,
+                'media_number': f"T{pk:04d}",
+            }}
+            for pk in (7, 12000)
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'media.jsonl'
+            path.write_text(''.join(json.dumps(row) + '\n' for row in rows), encoding='utf-8')
+            call_command('load_fixtures', str(path), stdout=io.StringIO())
+        self.assertEqual(Media.objects.get(pk=12000).sequence, 12000)
+        new = Media.objects.create(title="Neu", site=site, category=category, media_type=media_type)
+        self.assertEqual(new.media_number, 'T12001')
+
+
+class ReferenceDataCacheTest(TestCase):
+
+    def setUp(self):
+        self.category = MediaCategory.objects.create(code='T', name='Tiergeschichten')
+        self.media_type = MediaType.objects.create(name='Book')
+        self.site = LibrarySite.objects.create(name='Central Library')
+
+    def test_cached_avoids_queries(self):
+        """Test that repeated reads of the reference tables do not query the database."""
+        MediaCategory.objects.cached()
+        with self.assertNumQueries(0):
+            self.assertEqual([category.code for category in MediaCategory.objects.cached()], ['T'])
+            self.assertEqual(MediaCategory.objects.cached_get(self.category.pk).code, 'T')
+
+    def test_cache_invalidated_on_save_and_delete(self):
+        """Test that saving or deleting a row clears the cached table."""
+        MediaCategory.objects.cached()
+        MediaCategory.objects.create(code='M', name='Märchen')
+        self.assertEqual([category.code for category in MediaCategory.objects.cached()], ['M', 'T'])
+        self.category.delete()
+        self.assertEqual([category.code for category in MediaCategory.objects.cached()], ['M'])
+
+    def test_cached_get_falls_back_to_database(self):
+        """Test that rows missing from a stale cache are still found."""
+        MediaType.objects.cached()
+        game = MediaType(name='Game')
+        MediaType.objects.bulk_create([game])  # bulk_create sends no signals
+        self.assertEqual(MediaType.objects.cached_get(MediaType.objects.get(name='Game').pk).name, 'Game')
+
+    def test_media_save_uses_cached_category(self):
+        """Test that saving media with only category_id set takes the category code from cache."""
+        MediaCategory.objects.cached()
+        media = Media(title="Fuchs", site_id=self.site.pk, category_id=self.category.pk, media_type_id=self.media_type.pk)
+        media.save()
+        self.assertEqual(media.media_number, "T0001")
+        # The process-wide cached category is never bound to the media
+        self.assertFalse(Media.category.is_cached(media))
+        self.assertIsNot(media.category, MediaCategory.objects.cached_get(self.category.pk))
+
+
+class ScanTest(TestCase):
+
+    def setUp(self):
+        scan_cache.clear()
+        self.category = MediaCategory.objects.create(code='T', name='Tiergeschichten')
+        self.media_type = MediaType.objects.create(name='Book')
+        self.site = LibrarySite.objects.create(name='Central Library')
+        self.fox = Media.objects.create(title="Der kleine Fuchs", isbn13="9781861972712",
+                                        site=self.site, category=self.category, media_type=self.media_type)
+        self.legacy = Media.objects.create(title="Alter Bestand", legacy_media_number="0015",
+                                           site=self.site, category=self.category, media_type=self.media_type)
+
+    def test_resolve_media_number_legacy_and_isbn(self):
+        """Test that media numbers, short legacy labels and ISBNs resolve to the media."""
+        self.assertEqual(resolve_scan(' t0001 ')[0]['title'], "Der kleine Fuchs")
+        self.assertEqual(resolve_scan('T15')[0]['media_number'], "T0015")
+        self.assertEqual(resolve_scan('978-1-86197-271-2')[0]['media_number'], "T0001")
+        self.assertEqual(resolve_scan('X0001'), [])
+
+    def test_repeated_scan_served_from_cache(self):
+        """Test that a repeated scan does not query the database and changes invalidate the cache."""
+        resolve_scan('T0001')
+        with self.assertNumQueries(0):
+            resolve_scan('T0001')
+        self.fox.title = "Der große Fuchs"
+        self.fox.save()
+        self.assertEqual(resolve_scan('T0001')[0]['title'], "Der große Fuchs")
+
+    def test_unknown_codes_not_cached(self):
+        """Test that a code scanned before its media exists is found right after cataloguing."""
+        self.assertEqual(resolve_scan('T0003'), [])
+        Media.objects.bulk_create([Media(title="Neu", media_number="T0003", site=self.site, category=self.category, media_type=self.media_type)])
+        self.assertEqual(resolve_scan('T0003')[0]['title'], "Neu")
+
+    def test_scan_endpoint(self):
+        """Test the JSON scan endpoint for known and unknown codes."""
+        response = self.client.get(reverse('inventory-scan', args=['T0001']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['media'][0]['title'], "Der kleine Fuchs")
+        self.assertEqual(self.client.get(reverse('inventory-scan', args=['X0001'])).status_code, 404)
+
+    async def test_async_resolve_and_endpoints(self):
+        """Test the async scan lookup and the async scan and search endpoints."""
+        self.assertEqual((await aresolve_scan('T15'))[0]['media_number'], "T0015")
+        self.assertEqual((await aresolve_scan('X0001')), [])
+        response = await self.async_client.get(reverse('inventory-scan', args=['9781861972712']))
+        self.assertEqual(response.json()['media'][0]['media_number'], "T0001")
+        response = await self.async_client.get(reverse('inventory-search'), {'q': 'Fuchs'})
+        self.assertEqual([media['title'] for media in response.json()['results']], ["Der kleine Fuchs"])
+
+    def test_scan_endpoint_served_from_cache(self):
+        """Test that a repeated scan through the endpoint is answered from the cache without queries."""
+        url = reverse('inventory-scan', args=['T0001'])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json()['media'][0]['title'], "Der kleine Fuchs")
+        self.assertEqual(len(scan_cache), 1)
+
+    def test_scan_benchmark_command(self):
+        """Test that the benchmark reports the percentiles and fails above the bound; the latency itself is not asserted."""
+        out = io.StringIO()
+        call_command('bench_scan', iterations=20, max_p99_ms=60000, host='testserver', stdout=out)
+        self.assertIn("20 scans of 2 media", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "exceeds 0 ms"):
+            call_command('bench_scan', iterations=20, max_p99_ms=0, host='testserver', stdout=io.StringIO())
+
+class MediaBulkChangeTest(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_superuser(email='admin@example.com', password='12345')
+        self.category = MediaCategory.objects.create(code='T', name='Tiergeschichten', created_by=self.user)
+        self.other_category = MediaCategory.objects.create(code='S', name='Sachbuch', created_by=self.user)
+        self.media_type = MediaType.objects.create(name='Book', created_by=self.user)
+        self.site = LibrarySite.objects.create(name='Central Library', created_by=self.user)
+        self.other_site = LibrarySite.objects.create(name='Aula', created_by=self.user)
+        self.media = [
+            Media.objects.create(title=f"Buch {i}", site=self.site, category=self.category, media_type=self.media_type)
+            for i in range(3)
+        ]
+        Media.objects.create(title="Sachbuch", site=self.site, category=self.other_category, media_type=self.media_type)
+
+    def count_media_updates(self, queries):
+        return len([query for query in queries if query['sql'].startswith('UPDATE "inventory_media"')])
+
+    def test_transfer_site_single_update(self):
+        """Test that a site transfer writes the site and audit fields with one UPDATE."""
+        with CaptureQueriesContext(connection) as queries:
+            count = transfer_site(Media.objects.filter(category=self.category), self.other_site, user=self.user)
+        self.assertEqual(count, 3)
+        self.assertEqual(self.count_media_updates(queries), 1)
+        self.assertEqual(Media.objects.filter(site=self.other_site, updated_by=self.user).count(), 3)
+        self.assertEqual(transfer_site(Media.objects.filter(category=self.category), self.other_site), 0)
+
+    def test_retire_keeps_existing_dates(self):
+        """Test that retiring stamps today and leaves media that already left untouched."""
+        Media.objects.filter(pk=self.media[0].pk).update(left_library_date=date(2020, 1, 1))
+        with freeze_time("2024-06-15"):
+            self.assertEqual(retire(Media.objects.filter(category=self.category)), 2)
+        self.assertEqual(
+            sorted(Media.objects.filter(category=self.category).values_list('left_library_date', flat=True)),
+            [date(2020, 1, 1), date(2024, 6, 15), date(2024, 6, 15)],
+        )
+
+    def test_recategorise_renumbers_in_bulk(self):
+        """Test that recategorised media continue the counter of the new category and legacy numbers are kept."""
+        Media.objects.filter(pk=self.media[2].pk).update(legacy_media_number="0042")
+        with CaptureQueriesContext(connection) as queries:
+            count = recategorise(Media.objects.filter(category=self.category), self.other_category, user=self.user)
+        self.assertEqual(count, 3)
+        self.assertEqual(self.count_media_updates(queries), 1)
+        numbers = dict(Media.objects.filter(pk__in=[media.pk for media in self.media]).values_list('pk', 'media_number'))
+        self.assertEqual([numbers[media.pk] for media in self.media], ['S0043', 'S0044', 'S0042'])
+        self.assertEqual(MediaNumberCounter.objects.get(category=self.other_category).last_number, 44)
+        self.assertEqual(Media.objects.create(title="Neu", site=self.site, category=self.other_category, media_type=self.media_type).media_number, 'S0045')
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_admin_action(self):
+        """Test that the admin action asks for the target site and applies the transfer."""
+        self.client.force_login(self.user)
+        url = reverse('admin:inventory_media_changelist')
+        data = {'action': 'transfer_site', '_selected_action': [media.pk for media in self.media]}
+        response = self.client.post(url, data)
+        self.assertContains(response, 'Aula')
+        self.assertEqual(Media.objects.filter(site=self.other_site).count(), 0)
+
+        response = self.client.post(url, {**data, 'apply': 'yes', 'site': self.other_site.pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Media.objects.filter(site=self.other_site).count(), 3)
+
+    def test_recategorise_rejects_taken_legacy_numbers(self):
+        """Test that legacy numbers already used in the new category are reported and nothing is moved."""
+        Media.objects.filter(pk=self.media[0].pk).update(legacy_media_number="0001")
+        Media.objects.filter(pk=self.media[1].pk).update(legacy_media_number="0042")
+        Media.objects.filter(pk=self.media[2].pk).update(legacy_media_number="42")
+        with self.assertRaisesMessage(ValueError, "already taken in S - Sachbuch: S0001, S0042."):
+            recategorise(Media.objects.filter(category=self.category), self.other_category)
+        self.assertEqual(Media.objects.filter(category=self.category).count(), 3)
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_admin_recategorise(self):
+        """Test that the recategorise action works on the changelist queryset and reports taken legacy numbers."""
+        self.client.force_login(self.user)
+        url = reverse('admin:inventory_media_changelist')
+        data = {'action': 'recategorise', '_selected_action': [media.pk for media in self.media], 'apply': 'yes'}
+        Media.objects.filter(pk=self.media[0].pk).update(legacy_media_number="0001")
+        response = self.client.post(url, {**data, 'category': self.other_category.pk})
+        self.assertContains(response, "Legacy media numbers already taken in S - Sachbuch: S0001.")
+        self.assertEqual(Media.objects.filter(category=self.other_category).count(), 1)
+
+        Media.objects.filter(pk=self.media[0].pk).update(legacy_media_number=None)
+        response = self.client.post(url, {**data, 'category': self.other_category.pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(Media.objects.filter(category=self.other_category).values_list('media_number', flat=True)),
+            ['S0001', 'S0002', 'S0003', 'S0004'],
+        )
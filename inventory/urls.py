@@ -3,4 +3,6 @@ from . import views
 
 urlpatterns = [
 #    path('', views.MainView.as_view(), name='auditing-main'),
-]
\ No newline at end of file
+    path('search/', views.MediaSearchView.as_view(), name='inventory-search'),
+    path('scan/<str:code>/', views.MediaScanView.as_view(), name='inventory-scan'),
+]
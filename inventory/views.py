@@ -1,3 +1,53 @@
-from django.shortcuts import render
+from django.http import JsonResponse
 
-# Create your views here.
+from EduBooker.views import AsyncReadOnlyView
+from .scan import aresolve_scan
+from .search import search_media
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+
+class MediaSearchView(AsyncReadOnlyView):
+    """Catalogue search returning matching media as JSON."""
+
+    # noinspection PyMethodMayBeStatic
+    async def get(self, request):
+        term = request.GET.get('q', '')
+        try:
+            limit = max(1, min(int(request.GET.get('limit', SEARCH_DEFAULT_LIMIT)), SEARCH_MAX_LIMIT))
+        except ValueError:
+            limit = SEARCH_DEFAULT_LIMIT
+
+        results = []
+        if term.strip():
+            media = search_media(term).values_list(
+                'media_number', 'title', 'authors', 'isbn13', 'site__name', 'category__code', 'left_library_date'
+            )[:limit]
+            results = [
+                {
+                    'media_number': media_number,
+                    'title': title,
+                    'authors': authors,
+                    'isbn13': isbn13,
+                    'site': site,
+                    'category': category,
+                    'in_stock': left_library_date is None,
+                }
+                async for media_number, title, authors, isbn13, site, category, left_library_date in media
+            ]
+
+        return JsonResponse({'query': term, 'results': results})
+
+
+class MediaScanView(AsyncReadOnlyView):
+    """
+    Resolve a scanned media number, legacy label or ISBN-13 for scanner stations.
+    Kept minimal on purpose: read-only, no transaction, no session or user access and no templates.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    # noinspection PyMethodMayBeStatic
+    async def get(self, request, code):
+        media = await aresolve_scan(code)
+        return JsonResponse({'code': code, 'media': media}, status=200 if media else 404)
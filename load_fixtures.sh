@@ -1 +1 @@
-python manage.py loaddata inventory/fixtures/initial_mediacatory_data.json
\ No newline at end of file
+python manage.py load_fixtures inventory/fixtures/initial_mediacatory_data.json
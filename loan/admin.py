@@ -1,13 +1,121 @@
-from django.contrib import admin
-from .models import Borrower
+import io
+
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from .forms import RosterImportForm
+from .models import Borrower, Loan, ReminderLog
 from .functions import get_school_year_choices
+from .roster import ROSTER_DEACTIVATION_SKIPPED, RosterSync, read_roster_rows
+from .rollover import plan_rollover, rollover
+
+
+class CurrentGradeListFilter(admin.SimpleListFilter):
+    """Filter borrowers by the grade they are in during the current school year."""
+    title = 'actual grade'
+    parameter_name = 'grade'
+
+    def lookups(self, request, model_admin):
+        grades = (
+            Borrower.objects.with_current_grade()
+            .order_by('current_grade')
+            .values_list('current_grade', flat=True)
+            .distinct()
+        )
+        return [(grade, grade) for grade in grades]
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.in_grade(int(self.value()))
+        return queryset
+
 
 class BorrowerAdmin(admin.ModelAdmin):
-    list_display = ('given_name', 'surname', 'entry_school_year', 'initial_grade', 'actual_grade', 'borrower_class', 'inactive', 'user', 'created_by', 'updated_by', 'created_at', 'updated_at')
-    search_fields = ('given_name', 'surname', 'entry_school_year', 'borrower_class')
-    list_filter = ('inactive', 'borrower_class', 'entry_school_year')
+    list_display = ('given_name', 'surname', 'entry_school_year', 'initial_grade', 'current_grade', 'borrower_class', 'inactive', 'user', 'contact_email', 'created_by', 'updated_by', 'created_at', 'updated_at')
+    search_fields = ('given_name', 'surname', 'entry_school_year', 'borrower_class', 'contact_email')
+    list_filter = ('inactive', CurrentGradeListFilter, 'borrower_class', 'entry_school_year')
+    list_select_related = ('user', 'created_by', 'updated_by')
 
     readonly_fields = ('actual_grade', 'created_at', 'updated_at', 'created_by', 'updated_by')
+    actions = ('rollover_school_year',)
+
+    def get_queryset(self, request):
+        """Compute the actual grade in the database so it can be displayed and sorted without per-row Python."""
+        return super().get_queryset(request).with_current_grade()
+
+    @admin.display(description='Actual grade', ordering='current_grade')
+    def current_grade(self, obj):
+        return obj.current_grade
+
+    @admin.action(description="Roll selected borrowers over to the current school year", permissions=['change'])
+    def rollover_school_year(self, request, queryset):
+        """Show the rollover report of the selected borrowers and apply it once confirmed."""
+        if request.POST.get('confirm'):
+            plan = rollover(queryset=queryset, user=request.user)
+            self.message_user(
+                request,
+                f"School year {plan.school_year}: {len(plan.promotions)} new classes, {len(plan.leavers)} leavers set inactive.",
+                messages.SUCCESS,
+            )
+            return None
+
+        plan = plan_rollover(queryset=queryset)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f"Roll over to {plan.school_year}",
+            'opts': self.model._meta,
+            'plan': plan,
+            'selected': queryset.values_list('pk', flat=True),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/loan/borrower/rollover_confirmation.html', context)
+
+    def get_urls(self):
+        urls = [
+            path('roster/', self.admin_site.admin_view(self.roster_view), name='loan_borrower_roster'),
+        ]
+        return urls + super().get_urls()
+
+    def roster_view(self, request):
+        """Upload a roster export of the school office and apply the differences with RosterSync."""
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return HttpResponseRedirect(reverse('admin:loan_borrower_changelist'))
+
+        form = RosterImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            stream = io.TextIOWrapper(form.cleaned_data['file'].file, encoding=form.cleaned_data['encoding'], newline='')
+            sync = RosterSync(user=request.user, deactivate_missing=form.cleaned_data['deactivate_missing'])
+            try:
+                result = sync.run(read_roster_rows(stream), dry_run=form.cleaned_data['dry_run'])
+            except UnicodeDecodeError:
+                form.add_error('encoding', f"The file is not encoded as {form.cleaned_data['encoding']}; choose the encoding of the export.")
+            except ValueError as error:
+                form.add_error('file', str(error))
+            else:
+                for row_number, message in result.errors[:20]:
+                    self.message_user(request, f"Row {row_number}: {message}", messages.WARNING)
+                if len(result.errors) > 20:
+                    self.message_user(request, f"{len(result.errors) - 20} further rows were skipped.", messages.WARNING)
+                if result.deactivation_skipped:
+                    self.message_user(request, ROSTER_DEACTIVATION_SKIPPED, messages.WARNING)
+                verb = "Would add" if form.cleaned_data['dry_run'] else "Added"
+                self.message_user(
+                    request,
+                    f"{verb} {result.created}, updated {result.updated} and deactivated {result.deactivated} borrowers; "
+                    f"{result.unchanged} unchanged.",
+                    messages.SUCCESS,
+                )
+                return HttpResponseRedirect(reverse('admin:loan_borrower_changelist'))
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': "Sync roster",
+        }
+        return TemplateResponse(request, 'admin/loan/borrower/roster_form.html', context)
 
     def formfield_for_choice_field(self, db_field, request, **kwargs):
         if db_field.name == 'entry_school_year':
@@ -21,4 +129,39 @@ class BorrowerAdmin(admin.ModelAdmin):
         obj.updated_by = request.user
         super().save_model(request, obj, form, change)
 
-admin.site.register(Borrower, BorrowerAdmin)
\ No newline at end of file
+admin.site.register(Borrower, BorrowerAdmin)
+
+
+class LoanAdmin(admin.ModelAdmin):
+    list_display = ('media', 'borrower', 'loaned_at', 'due_date', 'returned_at', 'created_by', 'updated_by')
+    search_fields = ('media__media_number', 'media__title', 'borrower__given_name', 'borrower__surname')
+    list_filter = ('due_date', 'returned_at')
+    list_select_related = ('media', 'borrower', 'created_by', 'updated_by')
+    raw_id_fields = ('media', 'borrower')
+    date_hierarchy = 'loaned_at'
+
+    readonly_fields = ('created_at', 'updated_at', 'created_by', 'updated_by')
+
+    def save_model(self, request, obj, form, change):
+        """Automatically set the created_by and updated_by fields based on the logged-in user."""
+        if not obj.pk:  # New instance
+            obj.created_by = request.user
+        obj.updated_by = request.user
+        super().save_model(request, obj, form, change)
+
+admin.site.register(Loan, LoanAdmin)
+
+
+class ReminderLogAdmin(admin.ModelAdmin):
+    list_display = ('borrower', 'reminder_date', 'email', 'status', 'overdue_count', 'due_soon_count', 'attempts', 'sent_at')
+    search_fields = ('borrower__given_name', 'borrower__surname', 'email')
+    list_filter = ('status', 'reminder_date')
+    list_select_related = ('borrower',)
+    date_hierarchy = 'reminder_date'
+
+    readonly_fields = ('borrower', 'reminder_date', 'email', 'status', 'overdue_count', 'due_soon_count', 'attempts', 'error', 'sent_at', 'created_at', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+admin.site.register(ReminderLog, ReminderLogAdmin)
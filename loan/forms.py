@@ -0,0 +1,14 @@
+from django import forms
+
+# Encodings of roster exports: UTF-8 (with or without BOM) and the Windows/Excel default
+ROSTER_ENCODINGS = (
+    ('utf-8-sig', "UTF-8"),
+    ('cp1252', "Windows (Excel, cp1252)"),
+)
+
+
+class RosterImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV export of the school office with the columns given_name, surname, entry_school_year, initial_grade and borrower_class.")
+    encoding = forms.ChoiceField(choices=ROSTER_ENCODINGS, initial='utf-8-sig', help_text="Character encoding of the file.")
+    deactivate_missing = forms.BooleanField(required=False, initial=True, help_text="Set active borrowers who are not in the roster inactive (skipped if a row is invalid).")
+    dry_run = forms.BooleanField(required=False, help_text="Only report the changes.")
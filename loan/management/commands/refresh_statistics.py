@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from loan.statistics import refresh_media_statistics
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the media statistics per site and category shown on the dashboard. "
+        "Schedule it, e.g. every 10 minutes with cron; it is also run on release."
+    )
+
+    def handle(self, *args, **options):
+        refresh_media_statistics()
+        self.stdout.write(self.style.SUCCESS("Media statistics refreshed."))
@@ -0,0 +1,35 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loan.rollover import rollover
+
+SCHOOL_YEAR = re.compile(r'^(\d{4})/(\d{4})$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll the borrowers over to the new school year: reassign the classes to the new grade "
+        "and set leavers above FINAL_GRADE inactive, in one transaction. Run it once after July 1; "
+        "running it again changes nothing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school-year', help="The new school year, e.g. 2025/2026 (default: the current one).")
+        parser.add_argument('--final-grade', type=int, default=None, help="Highest grade of the school (default: FINAL_GRADE).")
+        parser.add_argument('--dry-run', action='store_true', help="Only report the changes.")
+
+    def handle(self, *args, **options):
+        school_year = options['school_year']
+        if school_year:
+            match = SCHOOL_YEAR.match(school_year)
+            if not match or int(match.group(2)) != int(match.group(1)) + 1:
+                raise CommandError(f"Invalid school year '{school_year}', expected e.g. 2025/2026.")
+
+        plan = rollover(school_year=school_year, final_grade=options['final_grade'], dry_run=options['dry_run'])
+        for line in plan.report():
+            self.stdout.write(line)
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Dry run, nothing was changed."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(plan.changes)} borrowers updated."))
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loan.notifications import send_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Email every borrower with overdue or soon due loans one reminder. "
+        "Schedule it every morning, e.g. with cron; running it again the same day only retries failed reminders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Day to send the reminders for, YYYY-MM-DD (default: today).")
+        parser.add_argument('--batch-size', type=int, default=None, help="Reminders sent over one mail connection.")
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError:
+            raise CommandError(f"Invalid date '{options['date']}', expected YYYY-MM-DD.")
+
+        result = send_reminders(today=today, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{result.sent} reminders sent."))
+        if result.without_email:
+            self.stdout.write(self.style.WARNING(f"{result.without_email} borrowers with due loans have no email address."))
+        if result.failed:
+            raise CommandError(f"{result.failed} reminders could not be sent, run the command again to retry them.")
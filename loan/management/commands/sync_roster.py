@@ -0,0 +1,53 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from loan.roster import ROSTER_DEACTIVATION_SKIPPED, RosterSync, read_roster_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Synchronise the borrowers with a CSV roster export of the school office: "
+        "new pupils are added, changed grades and classes updated and missing pupils set inactive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the CSV file.")
+        parser.add_argument('--encoding', default='utf-8-sig', help="Character encoding of the file, e.g. cp1252 for Excel exports (default: UTF-8).")
+        parser.add_argument('--keep-missing', action='store_true', help="Do not set borrowers missing from the roster inactive.")
+        parser.add_argument('--user', help="Email of the user recorded as creator or updater of the borrowers.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without saving anything.")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f"File '{path}' does not exist.")
+
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        sync = RosterSync(user=user, deactivate_missing=not options['keep_missing'])
+        try:
+            with path.open(encoding=options['encoding'], newline='') as stream:
+                result = sync.run(read_roster_rows(stream), dry_run=options['dry_run'])
+        except LookupError:
+            raise CommandError(f"Unknown encoding '{options['encoding']}'.")
+        except UnicodeDecodeError:
+            raise CommandError(f"'{path}' is not encoded as {options['encoding']}, use --encoding.")
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        for row_number, message in result.errors:
+            self.stderr.write(f"Row {row_number}: {message}")
+        verb = "Would add" if options['dry_run'] else "Added"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.created}, updated {result.updated} and deactivated {result.deactivated} borrowers; "
+            f"{result.unchanged} unchanged, {len(result.errors)} rows skipped."
+        ))
+        if result.deactivation_skipped:
+            self.stderr.write(ROSTER_DEACTIVATION_SKIPPED)
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0002_alter_borrower_entry_school_year'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrower',
+            index=models.Index(fields=['entry_school_year', 'initial_grade'], name='borrower_grade_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_media_indexes'),
+        ('loan', '0003_borrower_grade_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Loan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loaned_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Time of checkout.')),
+                ('due_date', models.DateField(help_text='Date by which the media has to be returned.')),
+                ('returned_at', models.DateTimeField(blank=True, help_text='Time of return, empty while the media is on loan.', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('borrower', models.ForeignKey(help_text='Borrower who took the media.', on_delete=django.db.models.deletion.PROTECT, related_name='loans', to='loan.borrower')),
+                ('created_by', models.ForeignKey(blank=True, help_text='User who checked out this loan.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loans_created', to=settings.AUTH_USER_MODEL)),
+                ('media', models.ForeignKey(help_text='Media that was lent.', on_delete=django.db.models.deletion.PROTECT, related_name='loans', to='inventory.media')),
+                ('updated_by', models.ForeignKey(blank=True, help_text='User who last updated this loan.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loans_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-loaned_at'],
+                'indexes': [models.Index(condition=models.Q(('returned_at__isnull', True)), fields=['borrower', 'due_date'], name='loan_open_by_borrower_idx'), models.Index(condition=models.Q(('returned_at__isnull', True)), fields=['due_date'], name='loan_open_due_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('returned_at__isnull', True)), fields=('media',), name='loan_one_open_loan_per_media')],
+            },
+        ),
+    ]
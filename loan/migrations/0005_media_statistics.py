@@ -0,0 +1,90 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+POSTGRESQL_FORWARD = [
+    # At most one open loan per media (loan_one_open_loan_per_media), so the join never duplicates media
+    """CREATE MATERIALIZED VIEW loan_media_statistics AS
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY m.site_id, m.category_id) AS id,
+            m.site_id,
+            m.category_id,
+            COUNT(*) AS media_count,
+            COUNT(*) FILTER (WHERE m.left_library_date IS NULL) AS in_stock_count,
+            COUNT(*) FILTER (WHERE m.left_library_date IS NOT NULL) AS left_library_count,
+            COUNT(l.id) AS on_loan_count,
+            COALESCE(SUM(m.price), 0) AS price_total,
+            now() AS refreshed_at
+        FROM inventory_media m
+        LEFT JOIN loan_loan l ON l.media_id = m.id AND l.returned_at IS NULL
+        GROUP BY m.site_id, m.category_id""",
+    # Required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+    "CREATE UNIQUE INDEX loan_media_statistics_site_category ON loan_media_statistics (site_id, category_id)",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP MATERIALIZED VIEW IF EXISTS loan_media_statistics",
+]
+
+# SQLite has no materialised views: a table filled by refresh_media_statistics()
+SQLITE_FORWARD = [
+    """CREATE TABLE loan_media_statistics (
+        id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+        site_id bigint NOT NULL,
+        category_id bigint NOT NULL,
+        media_count integer unsigned NOT NULL,
+        in_stock_count integer unsigned NOT NULL,
+        left_library_count integer unsigned NOT NULL,
+        on_loan_count integer unsigned NOT NULL,
+        price_total decimal NOT NULL,
+        refreshed_at datetime NOT NULL
+    )""",
+    "CREATE UNIQUE INDEX loan_media_statistics_site_category ON loan_media_statistics (site_id, category_id)",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS loan_media_statistics",
+]
+
+
+def run_for_vendor(postgresql, sqlite):
+    def run(apps, schema_editor):
+        statements = {'postgresql': postgresql, 'sqlite': sqlite}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_media_category_sequence_unique'),
+        ('loan', '0004_loan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='inventory.librarysite')),
+                ('category', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='inventory.mediacategory')),
+                ('media_count', models.PositiveIntegerField(help_text='All media, including those that left the library.')),
+                ('in_stock_count', models.PositiveIntegerField(help_text='Media still in the library.')),
+                ('left_library_count', models.PositiveIntegerField(help_text='Media with a left library date.')),
+                ('on_loan_count', models.PositiveIntegerField(help_text='Media currently on loan.')),
+                ('price_total', models.DecimalField(decimal_places=2, help_text='Total acquisition price of all media.', max_digits=12)),
+                ('refreshed_at', models.DateTimeField(help_text='Time of the last refresh.')),
+            ],
+            options={
+                'verbose_name': 'Media Statistics',
+                'verbose_name_plural': 'Media Statistics',
+                'db_table': 'loan_media_statistics',
+                'ordering': ['site', 'category'],
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRESQL_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRESQL_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
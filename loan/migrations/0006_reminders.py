@@ -0,0 +1,40 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loan', '0005_media_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrower',
+            name='contact_email',
+            field=models.EmailField(blank=True, help_text='Address for loan reminders, e.g. of the parents (default: the email of the linked user).', max_length=254),
+        ),
+        migrations.CreateModel(
+            name='ReminderLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reminder_date', models.DateField(help_text='Day the reminder is for.')),
+                ('email', models.EmailField(help_text='Address the reminder was sent to.', max_length=254)),
+                ('status', models.CharField(choices=[('sent', 'Sent'), ('failed', 'Failed')], help_text='Outcome of the last attempt.', max_length=10)),
+                ('overdue_count', models.PositiveIntegerField(default=0, help_text='Number of overdue loans in the reminder.')),
+                ('due_soon_count', models.PositiveIntegerField(default=0, help_text='Number of soon due loans in the reminder.')),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of runs that tried to send the reminder.')),
+                ('error', models.TextField(blank=True, help_text='Error of the last failed attempt.')),
+                ('sent_at', models.DateTimeField(blank=True, help_text='Time the reminder was sent.', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('borrower', models.ForeignKey(help_text='Borrower who was reminded.', on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='loan.borrower')),
+            ],
+            options={
+                'ordering': ['-reminder_date', 'borrower'],
+                'constraints': [models.UniqueConstraint(fields=('borrower', 'reminder_date'), name='reminder_one_per_borrower_and_day')],
+            },
+        ),
+    ]
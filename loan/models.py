@@ -1,14 +1,47 @@
 from django.db import models
+from django.db.models import F, Q, Value, IntegerField
+from django.db.models.functions import Cast, Greatest, Substr
 from django.conf import settings
+from django.utils import timezone
+from audit.tracking import AuditedModel, AuditQuerySet
 from datetime import date
 from .functions import calculate_current_school_year, calculate_actual_grade, get_school_year_choices
 
-class Borrower(models.Model):
+
+class BorrowerQuerySet(AuditQuerySet):
+    def with_current_grade(self, current_school_year=None):
+        """
+        Annotate each borrower with `current_grade`, computed in SQL the same way as `Borrower.actual_grade`.
+        :param current_school_year: The school year to compute the grade for (default: the current one).
+        """
+        current_year = int((current_school_year or calculate_current_school_year()).split("/")[0])
+        entry_year = Cast(Substr('entry_school_year', 1, 4), IntegerField())
+        return self.annotate(
+            current_grade=F('initial_grade') + Greatest(Value(current_year) - entry_year, Value(0))
+        )
+
+    def in_grade(self, grade, current_school_year=None):
+        """
+        Filter borrowers who are in `grade` in the given (default: current) school year.
+        The condition is expanded into equality lookups on entry_school_year and initial_grade,
+        so it can use the index on both columns instead of computing the grade for every row.
+        """
+        current_year = int((current_school_year or calculate_current_school_year()).split("/")[0])
+        # Borrowers entering this year (or later) are still in their initial grade
+        condition = Q(initial_grade=grade, entry_school_year__gte=f"{current_year}/")
+        for initial_grade in range(grade):
+            entry_year = current_year - (grade - initial_grade)
+            condition |= Q(initial_grade=initial_grade, entry_school_year=f"{entry_year}/{entry_year + 1}")
+        return self.filter(condition)
+
+
+class Borrower(AuditedModel):
     given_name = models.CharField(max_length=255, help_text="Given name of the borrower.")
     surname = models.CharField(max_length=255, help_text="Surname of the borrower.")
     entry_school_year = models.CharField(max_length=9, choices=get_school_year_choices(), help_text="The school year the borrower started.")
     initial_grade = models.PositiveIntegerField(help_text="Initial grade when the borrower started.")
     borrower_class = models.CharField(max_length=10, help_text="Class of the borrower.")
+    contact_email = models.EmailField(blank=True, help_text="Address for loan reminders, e.g. of the parents (default: the email of the linked user).")
     inactive = models.BooleanField(default=False, help_text="Set to true if the borrower is inactive.")
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, help_text="Optional reference to a Django user.")
     
@@ -32,6 +65,13 @@ class Borrower(models.Model):
         help_text="User who last updated this borrower."
     )
 
+    objects = BorrowerQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['entry_school_year', 'initial_grade'], name='borrower_grade_idx'),
+        ]
+
     @property
     def actual_grade(self):
         """Calculate the actual grade based on the entry school year, initial grade, and current year."""
@@ -46,4 +86,111 @@ class Borrower(models.Model):
         super().save(*args, **kwargs)  # Call the real save method
 
     def __str__(self):
-        return f"{self.given_name} {self.surname}"
\ No newline at end of file
+        return f"{self.given_name} {self.surname}"
+
+class Loan(models.Model):
+    media = models.ForeignKey('inventory.Media', on_delete=models.PROTECT, related_name='loans', help_text="Media that was lent.")
+    borrower = models.ForeignKey(Borrower, on_delete=models.PROTECT, related_name='loans', help_text="Borrower who took the media.")
+    loaned_at = models.DateTimeField(default=timezone.now, help_text="Time of checkout.")
+    due_date = models.DateField(help_text="Date by which the media has to be returned.")
+    returned_at = models.DateTimeField(blank=True, null=True, help_text="Time of return, empty while the media is on loan.")
+
+    # Timestamps and user tracking
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='loans_created',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        help_text="User who checked out this loan."
+    )
+    updated_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='loans_updated',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        help_text="User who last updated this loan."
+    )
+
+    class Meta:
+        ordering = ['-loaned_at']
+        constraints = [
+            # A media item can only be on loan once at a time
+            models.UniqueConstraint(fields=['media'], condition=Q(returned_at__isnull=True), name='loan_one_open_loan_per_media'),
+        ]
+        indexes = [
+            models.Index(fields=['borrower', 'due_date'], condition=Q(returned_at__isnull=True), name='loan_open_by_borrower_idx'),
+            models.Index(fields=['due_date'], condition=Q(returned_at__isnull=True), name='loan_open_due_idx'),
+        ]
+
+    @property
+    def is_open(self):
+        return self.returned_at is None
+
+    def __str__(self):
+        return f"{self.media} → {self.borrower} (due {self.due_date})"
+
+
+class ReminderLog(models.Model):
+    """
+    One reminder per borrower and day, covering all their overdue and soon due loans.
+
+    Written by loan.notifications.ReminderDispatcher: a sent reminder is not sent again
+    on the same day, a failed one is retried by the next run.
+    """
+
+    class Status(models.TextChoices):
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    borrower = models.ForeignKey(Borrower, on_delete=models.CASCADE, related_name='reminders', help_text="Borrower who was reminded.")
+    reminder_date = models.DateField(help_text="Day the reminder is for.")
+    email = models.EmailField(help_text="Address the reminder was sent to.")
+    status = models.CharField(max_length=10, choices=Status.choices, help_text="Outcome of the last attempt.")
+    overdue_count = models.PositiveIntegerField(default=0, help_text="Number of overdue loans in the reminder.")
+    due_soon_count = models.PositiveIntegerField(default=0, help_text="Number of soon due loans in the reminder.")
+    attempts = models.PositiveIntegerField(default=0, help_text="Number of runs that tried to send the reminder.")
+    error = models.TextField(blank=True, help_text="Error of the last failed attempt.")
+    sent_at = models.DateTimeField(blank=True, null=True, help_text="Time the reminder was sent.")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-reminder_date', 'borrower']
+        constraints = [
+            models.UniqueConstraint(fields=['borrower', 'reminder_date'], name='reminder_one_per_borrower_and_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.borrower} ({self.reminder_date}, {self.status})"
+
+
+class MediaStatistics(models.Model):
+    """
+    Precomputed media counts per site and category for the dashboard.
+
+    Not managed by Django: on PostgreSQL this is a materialised view, on SQLite a plain
+    table. Both are rebuilt by loan.statistics.refresh_media_statistics().
+    """
+    site = models.ForeignKey('inventory.LibrarySite', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    category = models.ForeignKey('inventory.MediaCategory', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    media_count = models.PositiveIntegerField(help_text="All media, including those that left the library.")
+    in_stock_count = models.PositiveIntegerField(help_text="Media still in the library.")
+    left_library_count = models.PositiveIntegerField(help_text="Media with a left library date.")
+    on_loan_count = models.PositiveIntegerField(help_text="Media currently on loan.")
+    price_total = models.DecimalField(max_digits=12, decimal_places=2, help_text="Total acquisition price of all media.")
+    refreshed_at = models.DateTimeField(help_text="Time of the last refresh.")
+
+    class Meta:
+        managed = False
+        db_table = 'loan_media_statistics'
+        ordering = ['site', 'category']
+        verbose_name = 'Media Statistics'
+        verbose_name_plural = 'Media Statistics'
+
+    def __str__(self):
+        return f"{self.site_id}/{self.category_id}: {self.media_count}"
@@ -0,0 +1,182 @@
+import logging
+import smtplib
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import Loan, ReminderLog
+
+logger = logging.getLogger('edubooker.reminders')
+
+REMINDER_FIELDS = (
+    'borrower_id', 'borrower__given_name', 'borrower__surname', 'email',
+    'media__media_number', 'media__title', 'due_date',
+)
+
+
+@dataclass
+class Reminder:
+    borrower_id: int
+    name: str
+    email: str
+    overdue: list = field(default_factory=list)
+    due_soon: list = field(default_factory=list)
+
+
+@dataclass
+class ReminderResult:
+    sent: int = 0
+    failed: int = 0
+    # Borrowers with due loans but neither a contact email nor a user with an email
+    without_email: int = 0
+
+
+class ReminderDispatcher:
+    """
+    Send one reminder per borrower listing their overdue and soon due loans.
+
+    The loans are read with one query ordered by borrower, excluding borrowers already
+    reminded today, and grouped while streaming. Messages are rendered from templates
+    loaded once and sent in batches, each over one mail connection that is reopened and
+    retried with a growing delay when it fails. Every reminder is recorded in ReminderLog,
+    so a run can be repeated: sent reminders are skipped, failed ones are tried again.
+    """
+
+    subject_template_name = 'loan/email/reminder_subject.txt'
+    body_template_name = 'loan/email/reminder.txt'
+
+    def __init__(self, today=None, batch_size=None, max_attempts=None, retry_delay=None):
+        self.today = today or timezone.localdate()
+        self.due_soon_days = getattr(settings, 'REMINDER_DUE_SOON_DAYS', 2)
+        self.batch_size = batch_size or getattr(settings, 'REMINDER_BATCH_SIZE', 100)
+        self.max_attempts = max_attempts or getattr(settings, 'REMINDER_MAX_ATTEMPTS', 3)
+        self.retry_delay = getattr(settings, 'REMINDER_RETRY_DELAY', 5) if retry_delay is None else retry_delay
+        self.subject_template = get_template(self.subject_template_name)
+        self.body_template = get_template(self.body_template_name)
+
+    def loans(self):
+        """Return the open loans due by the end of the reminder window, one row per loan ordered by borrower."""
+        reminded = ReminderLog.objects.filter(
+            borrower=OuterRef('borrower'), reminder_date=self.today, status=ReminderLog.Status.SENT
+        )
+        return (
+            Loan.objects
+            .filter(returned_at__isnull=True, due_date__lte=self.today + timedelta(days=self.due_soon_days), borrower__inactive=False)
+            .exclude(Exists(reminded))
+            .annotate(email=Coalesce(NullIf('borrower__contact_email', Value('')), 'borrower__user__email'))
+            .order_by('borrower_id', 'due_date', 'media__media_number')
+            .values_list(*REMINDER_FIELDS)
+        )
+
+    def reminders(self, result):
+        """Yield a Reminder per borrower; borrowers without an email address are only counted."""
+        rows = self.loans().iterator(chunk_size=2000)
+        for borrower_id, loans in groupby(rows, key=lambda row: row[0]):
+            loans = list(loans)
+            _, given_name, surname, email, _, _, _ = loans[0]
+            if not email:
+                result.without_email += 1
+                continue
+            reminder = Reminder(borrower_id=borrower_id, name=f"{given_name} {surname}", email=email)
+            for *_, media_number, title, due_date in loans:
+                item = {'media_number': media_number, 'title': title, 'due_date': due_date}
+                (reminder.overdue if due_date < self.today else reminder.due_soon).append(item)
+            yield reminder
+
+    def message(self, reminder):
+        context = {
+            'name': reminder.name,
+            'overdue': reminder.overdue,
+            'due_soon': reminder.due_soon,
+            'today': self.today,
+        }
+        subject = ' '.join(self.subject_template.render(context).split())
+        return EmailMessage(subject, self.body_template.render(context), settings.DEFAULT_FROM_EMAIL, [reminder.email])
+
+    def run(self):
+        """Send all reminders of the day and return a ReminderResult."""
+        result = ReminderResult()
+        reminders = self.reminders(result)
+        while batch := list(islice(reminders, self.batch_size)):
+            errors = self.send_batch(batch)
+            self.record(batch, errors)
+            result.failed += len(errors)
+            result.sent += len(batch) - len(errors)
+        return result
+
+    def send_batch(self, batch):
+        """
+        Send the reminders of a batch over one connection.
+
+        :return: Dict of borrower id -> error for the reminders that could not be sent.
+        """
+        errors = {}
+        pending = [(reminder, self.message(reminder)) for reminder in batch]
+        position = 0
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with get_connection(fail_silently=False) as connection:
+                    while position < len(pending):
+                        reminder, message = pending[position]
+                        try:
+                            connection.send_messages([message])
+                        except smtplib.SMTPRecipientsRefused as exc:
+                            # The address itself is rejected, retrying will not help
+                            errors[reminder.borrower_id] = f"Recipient refused: {exc}"
+                        position += 1
+                return errors
+            except (smtplib.SMTPException, OSError) as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                logger.warning("Sending reminders failed (attempt %d of %d): %s", attempt, self.max_attempts, error)
+                if attempt < self.max_attempts:
+                    time.sleep(self.retry_delay * attempt)
+        for reminder, _ in pending[position:]:
+            errors[reminder.borrower_id] = error
+        return errors
+
+    def record(self, batch, errors):
+        """Write the outcome of a batch to ReminderLog with one insert and one update."""
+        now = timezone.now()
+        existing = {
+            log.borrower_id: log
+            for log in ReminderLog.objects.filter(reminder_date=self.today, borrower_id__in=[reminder.borrower_id for reminder in batch])
+        }
+        created, updated = [], []
+        for reminder in batch:
+            log = existing.get(reminder.borrower_id)
+            if log is None:
+                log = ReminderLog(borrower_id=reminder.borrower_id, reminder_date=self.today)
+                created.append(log)
+            else:
+                updated.append(log)
+            log.email = reminder.email
+            log.overdue_count = len(reminder.overdue)
+            log.due_soon_count = len(reminder.due_soon)
+            log.attempts += 1
+            log.updated_at = now
+            if reminder.borrower_id in errors:
+                log.status = ReminderLog.Status.FAILED
+                log.error = errors[reminder.borrower_id]
+            else:
+                log.status = ReminderLog.Status.SENT
+                log.error = ''
+                log.sent_at = now
+        with transaction.atomic():
+            ReminderLog.objects.bulk_create(created)
+            ReminderLog.objects.bulk_update(
+                updated, ['email', 'overdue_count', 'due_soon_count', 'attempts', 'status', 'error', 'sent_at', 'updated_at']
+            )
+
+
+def send_reminders(today=None, **kwargs):
+    """Send the reminders for `today` (default: today); see ReminderDispatcher."""
+    return ReminderDispatcher(today=today, **kwargs).run()
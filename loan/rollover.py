@@ -0,0 +1,138 @@
+import re
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .functions import calculate_current_school_year
+from .models import Borrower
+
+# Leading grade of a class name, e.g. "3" in "3b"
+CLASS_GRADE = re.compile(r'^\d+')
+
+# Rows per UPDATE statement
+BATCH_SIZE = 1000
+
+
+@dataclass
+class RolloverChange:
+    borrower_id: int
+    name: str
+    old_class: str
+    new_class: str
+    grade: int
+    leaves: bool = False
+
+    def __str__(self):
+        if self.leaves:
+            return f"{self.name}: {self.old_class} -> leaves (grade {self.grade}), set inactive"
+        return f"{self.name}: {self.old_class} -> {self.new_class}"
+
+
+@dataclass
+class RolloverPlan:
+    school_year: str
+    final_grade: int
+    changes: list = field(default_factory=list)
+    # Active borrowers looked at, including those without a change
+    checked: int = 0
+
+    @property
+    def leavers(self):
+        return [change for change in self.changes if change.leaves]
+
+    @property
+    def promotions(self):
+        return [change for change in self.changes if not change.leaves]
+
+    def report(self):
+        """Return the diff report as a list of lines."""
+        return [str(change) for change in self.changes] + [
+            f"School year {self.school_year}: {self.checked} active borrowers, "
+            f"{len(self.promotions)} new classes, {len(self.leavers)} leavers."
+        ]
+
+
+def next_class(borrower_class, grade):
+    """
+    Return the class name for `grade`: the leading grade of the class is replaced and
+    the rest kept, e.g. "3b" in grade 4 becomes "4b". Names without a grade are kept.
+    """
+    if not CLASS_GRADE.match(borrower_class):
+        return borrower_class
+    return CLASS_GRADE.sub(str(grade), borrower_class, count=1)
+
+
+def plan_rollover(school_year=None, queryset=None, final_grade=None):
+    """
+    Compute the new class of every active borrower and who leaves the school, in one pass.
+
+    The grade is computed in SQL (see BorrowerQuerySet.with_current_grade), so the plan
+    only reads the borrowers' names and classes.
+
+    :param school_year: The new school year (default: the current one).
+    :param queryset: Optional Borrower queryset to restrict the rollover to.
+    :param final_grade: Highest grade of the school (default: settings.FINAL_GRADE); borrowers
+        above it leave.
+    :return: A RolloverPlan.
+    """
+    school_year = school_year or calculate_current_school_year()
+    final_grade = final_grade or getattr(settings, 'FINAL_GRADE', 13)
+    queryset = Borrower.objects.all() if queryset is None else queryset
+    plan = RolloverPlan(school_year=school_year, final_grade=final_grade)
+
+    rows = (
+        queryset
+        .filter(inactive=False)
+        .with_current_grade(school_year)
+        .order_by('current_grade', 'borrower_class', 'surname', 'given_name')
+        .values_list('pk', 'given_name', 'surname', 'borrower_class', 'current_grade')
+    )
+    for pk, given_name, surname, borrower_class, grade in rows.iterator(chunk_size=2000):
+        plan.checked += 1
+        name = f"{given_name} {surname}"
+        if grade > final_grade:
+            plan.changes.append(RolloverChange(pk, name, borrower_class, borrower_class, grade, leaves=True))
+        elif (new_class := next_class(borrower_class, grade)) != borrower_class:
+            plan.changes.append(RolloverChange(pk, name, borrower_class, new_class, grade))
+    return plan
+
+
+def apply_rollover(plan, user=None):
+    """
+    Write a RolloverPlan: leavers are set inactive with set-based UPDATEs and the new classes
+    are written with bulk_update(), all in one transaction. save() and signals are bypassed.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        leavers = [change.borrower_id for change in plan.leavers]
+        for start in range(0, len(leavers), BATCH_SIZE):
+            Borrower.objects.filter(pk__in=leavers[start:start + BATCH_SIZE]).update(
+                inactive=True, updated_at=now, updated_by=user
+            )
+        Borrower.objects.bulk_update(
+            [
+                Borrower(pk=change.borrower_id, borrower_class=change.new_class, updated_at=now, updated_by=user)
+                for change in plan.promotions
+            ],
+            ['borrower_class', 'updated_at', 'updated_by'],
+            batch_size=BATCH_SIZE,
+        )
+
+
+def rollover(school_year=None, queryset=None, final_grade=None, dry_run=False, user=None):
+    """
+    Roll the borrowers over to a new school year; see plan_rollover().
+
+    Planning and writing happen in one transaction, so the applied changes are exactly
+    the reported ones. Running it again in the same school year changes nothing.
+
+    :param dry_run: Only compute the plan, e.g. to show the report.
+    :return: The RolloverPlan.
+    """
+    with transaction.atomic():
+        plan = plan_rollover(school_year=school_year, queryset=queryset, final_grade=final_grade)
+        if not dry_run:
+            apply_rollover(plan, user=user)
+    return plan
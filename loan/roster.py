@@ -0,0 +1,171 @@
+import csv
+import hashlib
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Borrower
+
+ROSTER_COLUMNS = ('given_name', 'surname', 'entry_school_year', 'initial_grade', 'borrower_class')
+SCHOOL_YEAR = re.compile(r'^(\d{4})/(\d{4})$')
+
+# Rows per INSERT/UPDATE statement
+BATCH_SIZE = 500
+
+ROSTER_DEACTIVATION_SKIPPED = (
+    "Nobody was set inactive because the roster had invalid rows or none at all; correct it and sync again."
+)
+
+
+def read_roster_rows(stream):
+    """
+    Return an iterator of one dict per pupil from a CSV roster export with a header row.
+    School office exports are often separated by semicolons, so the delimiter is sniffed.
+    Raises ValueError if the header lacks one of the ROSTER_COLUMNS, before any row is read.
+    """
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(stream, dialect=dialect)
+    reader.fieldnames = [name.strip() for name in reader.fieldnames or []]
+    missing = [name for name in ROSTER_COLUMNS if name not in reader.fieldnames]
+    if missing:
+        raise ValueError(
+            f"The roster has no column {', '.join(missing)}; the header must contain {', '.join(ROSTER_COLUMNS)}."
+        )
+    return reader
+
+
+def normalize(value):
+    """Normalise a name for comparison: Unicode NFC, collapsed whitespace, case-folded."""
+    return ' '.join(unicodedata.normalize('NFC', str(value or '')).split()).casefold()
+
+
+def identity_hash(given_name, surname, entry_school_year):
+    """Hash of the normalised fields identifying a pupil across roster exports."""
+    identity = '\x1f'.join(normalize(value) for value in (given_name, surname, entry_school_year))
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class RosterResult:
+    created: int = 0
+    updated: int = 0
+    deactivated: int = 0
+    unchanged: int = 0
+    errors: list = field(default_factory=list)
+    # Missing borrowers were kept active because the roster had invalid rows or none at all
+    deactivation_skipped: bool = False
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+class RosterSync:
+    """
+    Synchronise the borrowers with a roster export of the school office.
+
+    Pupils are identified by the hash of their normalised given name, surname and entry
+    school year. The existing borrowers are loaded with one query and diffed in memory
+    against the roster; only the differences are written: new pupils with bulk_create(),
+    changed grades, classes or reactivations with bulk_update() and active borrowers missing
+    from the roster are set inactive. Nobody is set inactive if a row was invalid, as the pupil
+    of that row would count as missing. Re-syncing an unchanged roster writes nothing.
+    """
+
+    def __init__(self, user=None, deactivate_missing=True, batch_size=BATCH_SIZE):
+        self.user = user
+        self.deactivate_missing = deactivate_missing
+        self.batch_size = batch_size
+
+    def _parse(self, row_number, row, result):
+        """Return the cleaned values of one roster row, or None and record the error."""
+        values = {name: ' '.join(str(row.get(name) or '').split()) for name in ROSTER_COLUMNS}
+        for name in ('given_name', 'surname', 'borrower_class'):
+            if not values[name]:
+                result.add_error(row_number, f"{name} is missing.")
+                return None
+        if len(values['borrower_class']) > Borrower._meta.get_field('borrower_class').max_length:
+            result.add_error(row_number, f"Class '{values['borrower_class']}' is too long.")
+            return None
+
+        match = SCHOOL_YEAR.match(values['entry_school_year'])
+        if not match or int(match.group(2)) != int(match.group(1)) + 1:
+            result.add_error(row_number, f"Invalid entry school year '{values['entry_school_year']}'.")
+            return None
+        if not values['initial_grade'].isdigit():
+            result.add_error(row_number, f"Invalid initial grade '{values['initial_grade']}'.")
+            return None
+        values['initial_grade'] = int(values['initial_grade'])
+        return values
+
+    def run(self, rows, dry_run=False):
+        """
+        Apply a roster in one transaction and return a RosterResult.
+
+        :param rows: Iterable of dicts with the ROSTER_COLUMNS.
+        :param dry_run: Only count the changes.
+        """
+        result = RosterResult()
+        incoming = {}
+        for row_number, row in enumerate(rows, start=1):
+            values = self._parse(row_number, row, result)
+            if values is None:
+                continue
+            key = identity_hash(values['given_name'], values['surname'], values['entry_school_year'])
+            if key in incoming:
+                result.add_error(row_number, f"{values['given_name']} {values['surname']} is listed twice.")
+                continue
+            incoming[key] = values
+
+        now = timezone.now()
+        with transaction.atomic():
+            existing = {}
+            # Lowest primary key first: of duplicates typed in by hand, the oldest one is kept in sync
+            for pk, given_name, surname, entry_school_year, initial_grade, borrower_class, inactive in (
+                Borrower.objects.order_by('-pk')
+                .values_list('pk', 'given_name', 'surname', 'entry_school_year', 'initial_grade', 'borrower_class', 'inactive')
+                .iterator(chunk_size=2000)
+            ):
+                existing[identity_hash(given_name, surname, entry_school_year)] = (pk, initial_grade, borrower_class, inactive)
+
+            created, updated = [], []
+            for key, values in incoming.items():
+                current = existing.pop(key, None)
+                if current is None:
+                    created.append(Borrower(**values, created_by=self.user, updated_by=self.user))
+                    continue
+                pk, initial_grade, borrower_class, inactive = current
+                if (initial_grade, borrower_class, inactive) == (values['initial_grade'], values['borrower_class'], False):
+                    result.unchanged += 1
+                    continue
+                updated.append(Borrower(
+                    pk=pk, initial_grade=values['initial_grade'], borrower_class=values['borrower_class'],
+                    inactive=False, updated_at=now, updated_by=self.user,
+                ))
+            missing = []
+            if self.deactivate_missing:
+                if result.errors or not incoming:
+                    result.deactivation_skipped = True
+                else:
+                    missing = [pk for pk, _, _, inactive in existing.values() if not inactive]
+
+            result.created, result.updated, result.deactivated = len(created), len(updated), len(missing)
+            if dry_run:
+                return result
+
+            Borrower.objects.bulk_create(created, batch_size=self.batch_size)
+            Borrower.objects.bulk_update(
+                updated, ['initial_grade', 'borrower_class', 'inactive', 'updated_at', 'updated_by'], batch_size=self.batch_size
+            )
+            for start in range(0, len(missing), self.batch_size):
+                Borrower.objects.filter(pk__in=missing[start:start + self.batch_size]).update(
+                    inactive=True, updated_at=now, updated_by=self.user
+                )
+        return result
@@ -0,0 +1,113 @@
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from inventory.models import Media
+from .models import Loan
+
+
+@dataclass
+class CheckoutResult:
+    loans: list = field(default_factory=list)
+    # media_number -> reason why it could not be lent
+    unavailable: dict = field(default_factory=dict)
+
+
+@dataclass
+class ReturnResult:
+    returned: list = field(default_factory=list)
+    not_on_loan: list = field(default_factory=list)
+
+
+def _normalize_media_numbers(media_numbers):
+    """Strip, upper-case and de-duplicate scanned media numbers while keeping their order."""
+    return list(dict.fromkeys(number.strip().upper() for number in media_numbers if number and number.strip()))
+
+
+def default_due_date():
+    return timezone.localdate() + timedelta(days=getattr(settings, 'LOAN_PERIOD_DAYS', 14))
+
+
+def checkout(borrower, media_numbers, user=None, due_date=None):
+    """
+    Lend a stack of scanned media to one borrower in a single transaction.
+
+    The available media rows are selected with SELECT ... FOR UPDATE SKIP LOCKED, so a
+    concurrent checkout of the same item skips it instead of waiting, and all loans are
+    written with one bulk insert. The partial unique index on open loans is the final
+    guard against double loans (e.g. on SQLite, which has no row locks).
+
+    :param borrower: The Borrower taking the media.
+    :param media_numbers: Iterable of scanned media numbers.
+    :param user: The user operating the circulation desk.
+    :param due_date: Return date (default: today plus LOAN_PERIOD_DAYS).
+    :return: A CheckoutResult with the created loans and the media that could not be lent.
+    """
+    if borrower.inactive:
+        raise ValidationError(f"{borrower} is inactive and cannot borrow media.")
+
+    media_numbers = _normalize_media_numbers(media_numbers)
+    due_date = due_date or default_due_date()
+    result = CheckoutResult()
+
+    with transaction.atomic():
+        available = {
+            media.media_number: media
+            for media in Media.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(media_number__in=media_numbers, left_library_date__isnull=True)
+            .exclude(Exists(Loan.objects.filter(media=OuterRef('pk'), returned_at__isnull=True)))
+            .only('pk', 'media_number')
+        }
+        for number in media_numbers:
+            if number not in available:
+                result.unavailable[number] = "not available"
+
+        loans = [
+            Loan(media=available[number], borrower=borrower, due_date=due_date, created_by=user, updated_by=user)
+            for number in media_numbers if number in available
+        ]
+        try:
+            with transaction.atomic():
+                result.loans = Loan.objects.bulk_create(loans)
+        except IntegrityError:
+            # Another desk won the race for at least one item: keep the others
+            for loan in loans:
+                try:
+                    with transaction.atomic():
+                        loan.save()
+                    result.loans.append(loan)
+                except IntegrityError:
+                    result.unavailable[loan.media.media_number] = "already on loan"
+    return result
+
+
+def return_media(media_numbers, user=None):
+    """
+    Close the open loans of the scanned media.
+
+    :param media_numbers: Iterable of scanned media numbers.
+    :param user: The user operating the circulation desk.
+    :return: A ReturnResult listing returned media numbers and those that were not on loan.
+    """
+    media_numbers = _normalize_media_numbers(media_numbers)
+    result = ReturnResult()
+
+    with transaction.atomic():
+        open_loans = dict(
+            Loan.objects
+            .filter(media__media_number__in=media_numbers, returned_at__isnull=True)
+            .values_list('media__media_number', 'pk')
+        )
+        now = timezone.now()
+        Loan.objects.filter(pk__in=open_loans.values(), returned_at__isnull=True).update(
+            returned_at=now, updated_at=now, updated_by=user
+        )
+    for number in media_numbers:
+        (result.returned if number in open_loans else result.not_on_loan).append(number)
+    return result
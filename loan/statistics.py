@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import MediaStatistics
+
+# Sent after the statistics have been recomputed
+statistics_refreshed = Signal()
+
+# Same aggregation as the PostgreSQL materialised view created in 0005_media_statistics
+SQLITE_REFRESH = [
+    "DELETE FROM loan_media_statistics",
+    """INSERT INTO loan_media_statistics (
+            site_id, category_id, media_count, in_stock_count, left_library_count, on_loan_count, price_total, refreshed_at
+        )
+        SELECT
+            m.site_id,
+            m.category_id,
+            COUNT(*),
+            SUM(CASE WHEN m.left_library_date IS NULL THEN 1 ELSE 0 END),
+            SUM(CASE WHEN m.left_library_date IS NOT NULL THEN 1 ELSE 0 END),
+            COUNT(l.id),
+            COALESCE(SUM(m.price), 0),
+            %s
+        FROM inventory_media m
+        LEFT JOIN loan_loan l ON l.media_id = m.id AND l.returned_at IS NULL
+        GROUP BY m.site_id, m.category_id""",
+]
+
+
+def refresh_media_statistics(using=DEFAULT_DB_ALIAS):
+    """
+    Recompute the per site and category statistics.
+
+    On PostgreSQL the materialised view is refreshed concurrently, so the dashboard keeps
+    reading the previous numbers meanwhile. On SQLite the table is rebuilt in one transaction.
+    Run periodically with the refresh_statistics command.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY loan_media_statistics")
+        else:
+            with transaction.atomic(using=using):
+                cursor.execute(SQLITE_REFRESH[0])
+                cursor.execute(SQLITE_REFRESH[1], [connection.ops.adapt_datetimefield_value(timezone.now())])
+    statistics_refreshed.send(sender=MediaStatistics, using=using)
+
+
+@dataclass
+class StatisticsRow:
+    label: str
+    media_count: int = 0
+    in_stock_count: int = 0
+    left_library_count: int = 0
+    on_loan_count: int = 0
+    price_total: Decimal = Decimal('0.00')
+
+    def add(self, row):
+        self.media_count += row.media_count
+        self.in_stock_count += row.in_stock_count
+        self.left_library_count += row.left_library_count
+        self.on_loan_count += row.on_loan_count
+        self.price_total += row.price_total
+
+
+@dataclass
+class StatisticsSummary:
+    total: StatisticsRow
+    sites: list
+    categories: list
+    refreshed_at: object = None
+
+
+def media_statistics_summary():
+    """Totals overall, per site and per category, read from the precomputed table with one query."""
+    total = StatisticsRow("Total")
+    sites = {}
+    categories = {}
+    refreshed_at = None
+    for row in MediaStatistics.objects.select_related('site', 'category'):
+        total.add(row)
+        sites.setdefault(row.site_id, StatisticsRow(row.site.name)).add(row)
+        categories.setdefault(row.category_id, StatisticsRow(str(row.category))).add(row)
+        refreshed_at = row.refreshed_at
+    return StatisticsSummary(
+        total=total,
+        sites=sorted(sites.values(), key=lambda row: row.label),
+        categories=sorted(categories.values(), key=lambda row: row.label),
+        refreshed_at=refreshed_at,
+    )
@@ -1,8 +1,41 @@
-from django.test import TestCase
-from datetime import date
+import io
+import os
+import smtplib
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from datetime import date, timedelta
+from decimal import Decimal
 from .functions import get_school_year_choices, calculate_actual_grade, calculate_current_school_year
+from inventory.models import LibrarySite, Media, MediaCategory, MediaType
+from users.models import CustomUser
+from .models import Borrower, Loan, MediaStatistics, ReminderLog
+from .notifications import send_reminders
+from .rollover import rollover
+from .roster import RosterSync, read_roster_rows
+from .services import checkout, return_media
+from .statistics import media_statistics_summary, refresh_media_statistics
 from freezegun import freeze_time
 
+# The manifest storage needs collectstatic, which is not run for tests
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
 class CalculateCurrentSchoolYearTest(TestCase):
 
     @freeze_time("2024-06-15")
@@ -85,4 +118,491 @@ class CalculateActualGradeTest(TestCase):
         initial_grade = 2
         current_school_year = "2023/2024"  # Future entry year
         expected_grade = 2  # No change
-        self.assertEqual(calculate_actual_grade(entry_school_year, initial_grade, current_school_year), expected_grade)
\ No newline at end of file
+        self.assertEqual(calculate_actual_grade(entry_school_year, initial_grade, current_school_year), expected_grade)
+
+class BorrowerCurrentGradeTest(TestCase):
+
+    def setUp(self):
+        self.borrowers = [
+            Borrower.objects.create(given_name="Anna", surname="A", entry_school_year="2024/2025", initial_grade=1, borrower_class="1a"),
+            Borrower.objects.create(given_name="Ben", surname="B", entry_school_year="2022/2023", initial_grade=1, borrower_class="3a"),
+            Borrower.objects.create(given_name="Cem", surname="C", entry_school_year="2023/2024", initial_grade=2, borrower_class="3b"),
+            Borrower.objects.create(given_name="Dana", surname="D", entry_school_year="2021/2022", initial_grade=0, borrower_class="3c"),
+        ]
+
+    @freeze_time("2024-09-01")
+    def test_with_current_grade_matches_property(self):
+        """Test that the SQL annotation yields the same grade as the actual_grade property."""
+        for borrower in Borrower.objects.with_current_grade():
+            self.assertEqual(borrower.current_grade, borrower.actual_grade)
+
+    @freeze_time("2024-09-01")
+    def test_in_grade(self):
+        """Test that in_grade selects exactly the borrowers whose actual grade matches."""
+        self.assertEqual(
+            set(Borrower.objects.in_grade(3).values_list('given_name', flat=True)),
+            {"Ben", "Cem", "Dana"}
+        )
+        self.assertEqual(list(Borrower.objects.in_grade(1).values_list('given_name', flat=True)), ["Anna"])
+
+    def test_in_grade_for_given_school_year(self):
+        """Test that the grade can be computed for another school year, e.g. the upcoming one."""
+        self.assertEqual(
+            set(Borrower.objects.in_grade(4, current_school_year="2025/2026").values_list('given_name', flat=True)),
+            {"Ben", "Cem", "Dana"}
+        )
+
+
+class LoanServiceTest(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='desk@example.com', password=None)
+        category = MediaCategory.objects.create(code='T', name='Tiergeschichten')
+        media_type = MediaType.objects.create(name='Book')
+        site = LibrarySite.objects.create(name='Central Library')
+        self.media = [
+            Media.objects.create(title=f"Buch {i}", site=site, category=category, media_type=media_type)
+            for i in range(3)
+        ]
+        self.borrower = Borrower.objects.create(given_name="Anna", surname="A", entry_school_year="2024/2025", initial_grade=1, borrower_class="1a")
+        self.other_borrower = Borrower.objects.create(given_name="Ben", surname="B", entry_school_year="2024/2025", initial_grade=1, borrower_class="1a")
+
+    def test_checkout_stack(self):
+        """Test that a stack of media is lent in one go and unknown numbers are reported."""
+        result = checkout(self.borrower, ['t0001', 'T0002', 'T0002', 'X9999'], user=self.user)
+        self.assertEqual([loan.media.media_number for loan in result.loans], ['T0001', 'T0002'])
+        self.assertEqual(result.unavailable, {'X9999': "not available"})
+        self.assertEqual(Loan.objects.filter(borrower=self.borrower, returned_at__isnull=True).count(), 2)
+
+    def test_checkout_query_count(self):
+        """Test that checking out a stack costs the same number of queries as a single item."""
+        with CaptureQueriesContext(connection) as single:
+            checkout(self.borrower, ['T0001'])
+        with CaptureQueriesContext(connection) as stack:
+            checkout(self.borrower, ['T0002', 'T0003'])
+        self.assertEqual(len(single), len(stack))
+
+    def test_no_double_loan(self):
+        """Test that media already on loan cannot be lent again until returned."""
+        checkout(self.borrower, ['T0001'])
+        result = checkout(self.other_borrower, ['T0001', 'T0002'])
+        self.assertEqual([loan.media.media_number for loan in result.loans], ['T0002'])
+        self.assertIn('T0001', result.unavailable)
+
+        return_media(['T0001'])
+        result = checkout(self.other_borrower, ['T0001'])
+        self.assertEqual(len(result.loans), 1)
+
+    def test_unique_open_loan_constraint(self):
+        """Test that the database rejects a second open loan for the same media."""
+        Loan.objects.create(media=self.media[0], borrower=self.borrower, due_date=date(2024, 9, 1))
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Loan.objects.create(media=self.media[0], borrower=self.other_borrower, due_date=date(2024, 9, 1))
+
+    def test_retired_media_and_inactive_borrower(self):
+        """Test that media which left the library and inactive borrowers are refused."""
+        Media.objects.filter(pk=self.media[0].pk).update(left_library_date=date(2024, 1, 1))
+        self.assertIn('T0001', checkout(self.borrower, ['T0001']).unavailable)
+        self.borrower.inactive = True
+        with self.assertRaises(ValidationError):
+            checkout(self.borrower, ['T0002'])
+
+    def test_return_media(self):
+        """Test that returning closes open loans and reports media that were not on loan."""
+        checkout(self.borrower, ['T0001'], user=self.user)
+        result = return_media(['T0001', 'T0002'], user=self.user)
+        self.assertEqual(result.returned, ['T0001'])
+        self.assertEqual(result.not_on_loan, ['T0002'])
+        self.assertIsNotNone(Loan.objects.get(media=self.media[0]).returned_at)
+
+    def test_checkout_endpoint(self):
+        """Test the batch checkout and return endpoints."""
+        self.client.force_login(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        response = self.client.post(
+            reverse('loan-checkout'),
+            {'borrower': self.borrower.pk, 'media_numbers': ['T0001', 'T0002']},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['loaned'], ['T0001', 'T0002'])
+
+        response = self.client.post(reverse('loan-return'), {'media_numbers': ['T0001']}, content_type='application/json')
+        self.assertEqual(response.json()['returned'], ['T0001'])
+
+    def test_checkout_endpoint_requires_permission(self):
+        """Test that users without the loan permission cannot check out media."""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('loan-checkout'),
+            {'borrower': self.borrower.pk, 'media_numbers': ['T0001']},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+    async def test_availability_endpoint(self):
+        """Test that the async availability endpoint reports available, lent and unknown media."""
+        await sync_to_async(checkout)(self.borrower, ['T0002'], due_date=date(2030, 1, 31))
+        response = await self.async_client.get(reverse('loan-availability'), {'media': ['T0001,t0002', 'X9999']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(entry['media_number'], entry['status'], entry.get('due_date')) for entry in response.json()['media']],
+            [('T0001', 'available', None), ('T0002', 'on_loan', '2030-01-31'), ('X9999', 'unknown', None)]
+        )
+        self.assertEqual((await self.async_client.get(reverse('loan-availability'))).status_code, 400)
+
+
+class ReminderDispatcherTest(TestCase):
+
+    def setUp(self):
+        category = MediaCategory.objects.create(code='T', name='Tiergeschichten')
+        media_type = MediaType.objects.create(name='Book')
+        site = LibrarySite.objects.create(name='Central Library')
+        self.media = [
+            Media.objects.create(title=f"Buch {i}", site=site, category=category, media_type=media_type)
+            for i in range(6)
+        ]
+        self.today = date(2026, 3, 10)
+        user = CustomUser.objects.create_user(email='ben@example.com', password=None)
+        self.anna = self.borrower("Anna", contact_email='eltern.a@example.com')
+        self.ben = self.borrower("Ben", user=user)
+        self.carla = self.borrower("Carla")
+        self.lend(self.anna, self.media[0], -3)
+        self.lend(self.anna, self.media[1], -1)
+        self.lend(self.anna, self.media[2], 1)
+        self.lend(self.anna, self.media[3], 10)
+        self.lend(self.ben, self.media[4], -5)
+        self.lend(self.carla, self.media[5], 0)
+
+    def borrower(self, given_name, **kwargs):
+        return Borrower.objects.create(
+            given_name=given_name, surname="S", entry_school_year="2024/2025", initial_grade=1, borrower_class="1a", **kwargs
+        )
+
+    def lend(self, borrower, media, due_in_days):
+        Loan.objects.create(media=media, borrower=borrower, due_date=self.today + timedelta(days=due_in_days))
+
+    def test_one_reminder_per_borrower(self):
+        """Test that each borrower gets one message listing overdue and soon due loans, but not later ones."""
+        result = send_reminders(today=self.today, retry_delay=0)
+        self.assertEqual((result.sent, result.failed, result.without_email), (2, 0, 1))
+        messages = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(set(messages), {'eltern.a@example.com', 'ben@example.com'})
+
+        body = messages['eltern.a@example.com'].body
+        self.assertIn("Hallo Anna S", body)
+        self.assertIn("T0001 Buch 0 (fällig am 07.03.2026)", body)
+        self.assertIn("T0003 Buch 2", body)
+        self.assertNotIn("T0004", body)
+        self.assertEqual(messages['eltern.a@example.com'].subject, "Erinnerung: 2 überfällige Medien")
+
+        log = ReminderLog.objects.get(borrower=self.anna)
+        self.assertEqual((log.status, log.overdue_count, log.due_soon_count, log.attempts), ('sent', 2, 1, 1))
+
+    def test_sent_reminders_not_repeated(self):
+        """Test that running the dispatcher again on the same day sends nothing."""
+        send_reminders(today=self.today, retry_delay=0)
+        mail.outbox.clear()
+        result = send_reminders(today=self.today, retry_delay=0)
+        self.assertEqual(result.sent, 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_failed_reminders_retried(self):
+        """Test that a broken mail connection is retried and the failure recorded for the next run."""
+        connection = mock.MagicMock()
+        connection.__enter__.return_value = connection
+        connection.send_messages.side_effect = smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        with mock.patch('loan.notifications.get_connection', return_value=connection):
+            result = send_reminders(today=self.today, max_attempts=2, retry_delay=0)
+        self.assertEqual((result.sent, result.failed), (0, 2))
+        self.assertEqual(connection.__enter__.call_count, 2)
+        log = ReminderLog.objects.get(borrower=self.ben)
+        self.assertEqual(log.status, 'failed')
+        self.assertIn("SMTPServerDisconnected", log.error)
+
+        result = send_reminders(today=self.today, retry_delay=0)
+        self.assertEqual((result.sent, result.failed), (2, 0))
+        log.refresh_from_db()
+        self.assertEqual((log.status, log.attempts, log.error), ('sent', 2, ''))
+
+    def test_query_count_independent_of_borrowers(self):
+        """Test that a batch costs the same number of queries however many borrowers it holds."""
+        with CaptureQueriesContext(connection) as few:
+            send_reminders(today=self.today, retry_delay=0)
+        ReminderLog.objects.all().delete()
+        for i in range(20):
+            media = Media.objects.create(title=f"Heft {i}", site=self.media[0].site, category=self.media[0].category, media_type=self.media[0].media_type)
+            self.lend(self.borrower(f"Kind {i}", contact_email=f"kind{i}@example.com"), media, -1)
+        with CaptureQueriesContext(connection) as many:
+            send_reminders(today=self.today, retry_delay=0)
+        self.assertEqual(len(few), len(many))
+
+
+class RolloverTest(TestCase):
+
+    def setUp(self):
+        self.first = self.borrower("Anna", "2024/2025", 1, "1a")
+        self.second = self.borrower("Ben", "2023/2024", 3, "4b")
+        self.leaver = self.borrower("Carla", "2024/2025", 13, "13")
+        self.course = self.borrower("Dora", "2024/2025", 5, "Kurs")
+        self.gone = self.borrower("Emil", "2020/2021", 1, "1c", inactive=True)
+
+    def borrower(self, given_name, entry_school_year, initial_grade, borrower_class, **kwargs):
+        return Borrower.objects.create(
+            given_name=given_name, surname="S", entry_school_year=entry_school_year,
+            initial_grade=initial_grade, borrower_class=borrower_class, **kwargs
+        )
+
+    def test_dry_run_report(self):
+        """Test that a dry run reports new classes and leavers without changing anything."""
+        plan = rollover(school_year="2025/2026", final_grade=13, dry_run=True)
+        self.assertEqual(plan.checked, 4)
+        self.assertEqual(plan.report()[:3], [
+            "Anna S: 1a -> 2a",
+            "Ben S: 4b -> 5b",
+            "Carla S: 13 -> leaves (grade 14), set inactive",
+        ])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.borrower_class, "1a")
+
+    def test_rollover_applied_once(self):
+        """Test that the rollover updates classes and inactive flags, and a second run changes nothing."""
+        rollover(school_year="2025/2026", final_grade=13)
+        classes = dict(Borrower.objects.values_list('given_name', 'borrower_class'))
+        self.assertEqual(classes, {"Anna": "2a", "Ben": "5b", "Carla": "13", "Dora": "Kurs", "Emil": "1c"})
+        self.assertEqual(set(Borrower.objects.filter(inactive=True).values_list('given_name', flat=True)), {"Carla", "Emil"})
+        self.assertEqual(rollover(school_year="2025/2026", final_grade=13).changes, [])
+
+    def test_query_count_independent_of_borrowers(self):
+        """Test that the rollover takes the same number of queries for few and many borrowers."""
+        with CaptureQueriesContext(connection) as few:
+            rollover(school_year="2025/2026", final_grade=13)
+        Borrower.objects.bulk_create([
+            Borrower(given_name=f"Kind {i}", surname="S", entry_school_year="2024/2025", initial_grade=i % 14, borrower_class=f"{i % 14}a")
+            for i in range(200)
+        ])
+        with CaptureQueriesContext(connection) as many:
+            rollover(school_year="2026/2027", final_grade=13)
+        self.assertEqual(len(few), len(many))
+
+    @freeze_time("2025-08-01")
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_admin_action(self):
+        """Test that the admin action shows the report first and applies it once confirmed."""
+        self.client.force_login(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        url = reverse('admin:loan_borrower_changelist')
+        data = {'action': 'rollover_school_year', '_selected_action': [self.first.pk, self.leaver.pk]}
+        response = self.client.post(url, data)
+        self.assertContains(response, "2a")
+        self.assertContains(response, "leaves, set inactive")
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.borrower_class, "1a")
+
+        response = self.client.post(url, {**data, 'confirm': 'yes'})
+        self.assertRedirects(response, url)
+        self.first.refresh_from_db()
+        self.leaver.refresh_from_db()
+        self.assertEqual((self.first.borrower_class, self.leaver.inactive), ("2a", True))
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.borrower_class, "4b")
+
+
+class RosterSyncTest(TestCase):
+
+    ROSTER = (
+        "given_name;surname;entry_school_year;initial_grade;borrower_class\n"
+        "  anna ; Schmidt ;2024/2025;1;2a\n"
+        "Carla;Weber;2023/2024;1;3b\n"
+        "Emil;Neu;2025/2026;1;1c\n"
+    )
+    INVALID_ROW = "Fehler;Ohne Jahr;;1;1c\n"
+
+    def setUp(self):
+        self.anna = self.borrower("Anna", "Schmidt", "2024/2025", "1a")
+        self.ben = self.borrower("Ben", "Becker", "2024/2025", "2a")
+        self.carla = self.borrower("Carla", "Weber", "2023/2024", "3b", inactive=True)
+
+    def borrower(self, given_name, surname, entry_school_year, borrower_class, **kwargs):
+        return Borrower.objects.create(
+            given_name=given_name, surname=surname, entry_school_year=entry_school_year,
+            initial_grade=1, borrower_class=borrower_class, **kwargs
+        )
+
+    def sync(self, roster, **kwargs):
+        return RosterSync().run(read_roster_rows(io.StringIO(roster)), **kwargs)
+
+    def test_sync_applies_differences(self):
+        """Test that the sync adds, updates, reactivates and deactivates borrowers matched by normalised names."""
+        result = self.sync(self.ROSTER)
+        self.assertEqual((result.created, result.updated, result.deactivated, result.unchanged), (1, 2, 1, 0))
+        self.assertEqual(result.errors, [])
+        self.anna.refresh_from_db()
+        self.assertEqual((self.anna.given_name, self.anna.borrower_class), ("Anna", "2a"))
+        self.assertEqual(
+            set(Borrower.objects.filter(inactive=True).values_list('given_name', flat=True)), {"Ben"}
+        )
+        self.assertTrue(Borrower.objects.filter(given_name="Emil", borrower_class="1c").exists())
+
+    def test_dry_run(self):
+        """Test that a dry run counts the changes without writing them."""
+        result = self.sync(self.ROSTER, dry_run=True)
+        self.assertEqual((result.created, result.updated, result.deactivated), (1, 2, 1))
+        self.assertEqual(Borrower.objects.count(), 3)
+        self.assertFalse(Borrower.objects.get(pk=self.ben.pk).inactive)
+
+    def test_unchanged_roster_writes_nothing(self):
+        """Test that re-syncing the same roster only reads the borrowers."""
+        self.sync(self.ROSTER)
+        with CaptureQueriesContext(connection) as queries:
+            result = self.sync(self.ROSTER)
+        self.assertEqual((result.created, result.updated, result.deactivated, result.unchanged), (0, 0, 0, 3))
+        self.assertEqual([query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']], ['SELECT'])
+
+    def test_invalid_rows_deactivate_nobody(self):
+        """Test that missing borrowers stay active if a row is invalid, as its pupil would count as missing."""
+        result = self.sync(self.ROSTER + self.INVALID_ROW)
+        self.assertEqual([row_number for row_number, _ in result.errors], [4])
+        self.assertEqual((result.created, result.updated, result.deactivated), (1, 2, 0))
+        self.assertTrue(result.deactivation_skipped)
+        self.assertFalse(Borrower.objects.get(pk=self.ben.pk).inactive)
+
+    def test_missing_columns_rejected(self):
+        """Test that a roster without the expected header is rejected before anything is read or written."""
+        roster = "Vorname;Nachname;Eintrittsjahr;Klassenstufe;Klasse\nAnna;Schmidt;2024/2025;1;2a\n"
+        with self.assertRaisesMessage(ValueError, "no column given_name, surname"):
+            self.sync(roster)
+        self.assertEqual(Borrower.objects.filter(inactive=False).count(), 2)
+
+    def test_command_reports_header_and_encoding_errors(self):
+        """Test that sync_roster fails with a clear message for a wrong header or encoding and reads cp1252 with --encoding."""
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as file:
+            file.write((self.ROSTER + "Jörg;Müller;2024/2025;1;2b\n").encode('cp1252'))
+        self.addCleanup(os.remove, file.name)
+        with self.assertRaisesMessage(CommandError, "is not encoded as utf-8-sig"):
+            call_command('sync_roster', file.name, stdout=io.StringIO())
+        call_command('sync_roster', file.name, '--encoding', 'cp1252', stdout=io.StringIO())
+        self.assertTrue(Borrower.objects.filter(given_name="Jörg").exists())
+
+        with open(file.name, 'w', encoding='utf-8') as stream:
+            stream.write("Vorname;Nachname\nAnna;Schmidt\n")
+        with self.assertRaisesMessage(CommandError, "The roster has no column given_name"):
+            call_command('sync_roster', file.name, stdout=io.StringIO())
+
+    def post_roster(self, content, **data):
+        upload = SimpleUploadedFile('roster.csv', content, content_type='text/csv')
+        return self.client.post(
+            reverse('admin:loan_borrower_roster'), {'file': upload, 'deactivate_missing': 'on', 'encoding': 'utf-8-sig', **data}, follow=True
+        )
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_admin_view(self):
+        """Test that the roster can be uploaded in the admin and invalid rows are reported."""
+        self.client.force_login(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        response = self.post_roster((self.ROSTER + self.INVALID_ROW).encode('utf-8'))
+        self.assertContains(response, "Added 1, updated 2 and deactivated 0 borrowers")
+        self.assertContains(response, "Row 4: Invalid entry school year")
+        self.assertContains(response, "Nobody was set inactive")
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_admin_view_encoding_and_header_errors(self):
+        """Test that a wrong encoding or header is shown as form error instead of failing, and cp1252 exports can be read."""
+        self.client.force_login(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        roster = (self.ROSTER + "Jörg;Müller;2024/2025;1;2b\n").encode('cp1252')
+        response = self.post_roster(roster)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "The file is not encoded as utf-8-sig")
+        response = self.post_roster(b"Vorname;Nachname\nAnna;Schmidt\n")
+        self.assertContains(response, "The roster has no column given_name")
+        self.assertEqual(Borrower.objects.count(), 3)
+
+        response = self.post_roster(roster, encoding='cp1252')
+        self.assertContains(response, "Added 2, updated 2 and deactivated 1 borrowers")
+        self.assertTrue(Borrower.objects.filter(given_name="Jörg", surname="Müller").exists())
+
+
+class MediaStatisticsTest(TestCase):
+
+    def setUp(self):
+        self.central = LibrarySite.objects.create(name='Central Library')
+        self.branch = LibrarySite.objects.create(name='Branch')
+        self.animals = MediaCategory.objects.create(code='T', name='Tiergeschichten')
+        self.novels = MediaCategory.objects.create(code='R', name='Romane')
+        media_type = MediaType.objects.create(name='Book')
+        for site, category, price, left in [
+            (self.central, self.animals, Decimal('10.00'), None),
+            (self.central, self.animals, Decimal('5.50'), date(2024, 1, 1)),
+            (self.central, self.novels, None, None),
+            (self.branch, self.animals, Decimal('3.00'), None),
+        ]:
+            Media.objects.create(title="Buch", site=site, category=category, media_type=media_type, price=price, left_library_date=left)
+        borrower = Borrower.objects.create(given_name="Anna", surname="A", entry_school_year="2024/2025", initial_grade=1, borrower_class="1a")
+        checkout(borrower, ['T0001', 'T0003'])
+        return_media(['T0003'])
+        checkout(borrower, ['T0003'])
+
+    def test_refresh(self):
+        """Test that the refresh aggregates counts, loans and prices per site and category."""
+        refresh_media_statistics()
+        rows = {
+            (row.site_id, row.category_id): (row.media_count, row.in_stock_count, row.left_library_count, row.on_loan_count, row.price_total)
+            for row in MediaStatistics.objects.all()
+        }
+        self.assertEqual(rows, {
+            (self.central.pk, self.animals.pk): (2, 1, 1, 1, Decimal('15.50')),
+            (self.central.pk, self.novels.pk): (1, 1, 0, 0, Decimal('0.00')),
+            (self.branch.pk, self.animals.pk): (1, 1, 0, 1, Decimal('3.00')),
+        })
+
+    def test_summary_single_query(self):
+        """Test that the dashboard totals are read with one query."""
+        refresh_media_statistics()
+        with self.assertNumQueries(1):
+            summary = media_statistics_summary()
+        self.assertEqual(summary.total.media_count, 4)
+        self.assertEqual(summary.total.on_loan_count, 2)
+        self.assertEqual([(row.label, row.media_count) for row in summary.sites], [('Branch', 1), ('Central Library', 3)])
+        self.assertEqual(summary.total.price_total, Decimal('18.50'))
+        self.assertIsNotNone(summary.refreshed_at)
+
+
+class LoanConcurrencyTest(TransactionTestCase):
+
+    def setUp(self):
+        category = MediaCategory.objects.create(code='T', name='Tiergeschichten')
+        media_type = MediaType.objects.create(name='Book')
+        site = LibrarySite.objects.create(name='Central Library')
+        Media.objects.create(title="Begehrtes Buch", site=site, category=category, media_type=media_type)
+        self.borrowers = [
+            Borrower.objects.create(given_name=f"Kind {i}", surname="K", entry_school_year="2024/2025", initial_grade=1, borrower_class="1a")
+            for i in range(8)
+        ]
+
+    def test_parallel_checkouts_lend_once(self):
+        """Test that desks checking out the same media in parallel create exactly one loan."""
+        barrier = threading.Barrier(len(self.borrowers))
+        successes = []
+
+        def desk(borrower):
+            barrier.wait()
+            try:
+                for attempt in range(50):
+                    try:
+                        result = checkout(borrower, ['T0001'])
+                    except DatabaseError:
+                        # SQLite reports lock contention instead of skipping locked rows: retry like a desk would
+                        time.sleep(0.01)
+                        continue
+                    if result.loans:
+                        successes.append(borrower.pk)
+                    break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=desk, args=(borrower,)) for borrower in self.borrowers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Loan.objects.filter(returned_at__isnull=True).count(), 1)
+        self.assertEqual(len(successes), 1)
@@ -3,4 +3,7 @@ from . import views
 
 urlpatterns = [
 #    path('', views.MainView.as_view(), name='auditing-main'),
-]
\ No newline at end of file
+    path('checkout/', views.CheckoutView.as_view(), name='loan-checkout'),
+    path('return/', views.ReturnView.as_view(), name='loan-return'),
+    path('availability/', views.AvailabilityView.as_view(), name='loan-availability'),
+]
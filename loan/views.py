@@ -1,3 +1,115 @@
-from django.shortcuts import render
+import json
 
-# Create your views here.
+from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.core.exceptions import ValidationError
+from django.db.models import OuterRef, Subquery
+from django.http import JsonResponse
+from django.views import View
+
+from EduBooker.views import AsyncReadOnlyView
+from inventory.models import Media
+from .models import Borrower, Loan
+from .services import _normalize_media_numbers, checkout, return_media
+
+AVAILABILITY_MAX_MEDIA = 100
+
+
+def _read_json(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _media_numbers(data):
+    media_numbers = data.get('media_numbers')
+    if not isinstance(media_numbers, list) or not all(isinstance(number, str) for number in media_numbers):
+        return None
+    return media_numbers
+
+
+class CheckoutView(PermissionRequiredMixin, View):
+    """Check out a stack of scanned media numbers for one borrower in one transaction."""
+    permission_required = 'loan.add_loan'
+    raise_exception = True
+
+    def post(self, request):
+        data = _read_json(request)
+        media_numbers = _media_numbers(data) if data is not None else None
+        if media_numbers is None:
+            return JsonResponse({'error': "Expected a JSON object with 'borrower' and a list of 'media_numbers'."}, status=400)
+        try:
+            borrower = Borrower.objects.get(pk=data.get('borrower'))
+        except (Borrower.DoesNotExist, ValueError, TypeError):
+            return JsonResponse({'error': "Unknown borrower."}, status=404)
+
+        try:
+            result = checkout(borrower, media_numbers, user=request.user)
+        except ValidationError as error:
+            return JsonResponse({'error': ' '.join(error.messages)}, status=409)
+
+        return JsonResponse({
+            'borrower': borrower.pk,
+            'loaned': [loan.media.media_number for loan in result.loans],
+            'due_date': result.loans[0].due_date.isoformat() if result.loans else None,
+            'unavailable': result.unavailable,
+        })
+
+
+class ReturnView(PermissionRequiredMixin, View):
+    """Return a stack of scanned media numbers."""
+    permission_required = 'loan.change_loan'
+    raise_exception = True
+
+    def post(self, request):
+        data = _read_json(request)
+        media_numbers = _media_numbers(data) if data is not None else None
+        if media_numbers is None:
+            return JsonResponse({'error': "Expected a JSON object with a list of 'media_numbers'."}, status=400)
+
+        result = return_media(media_numbers, user=request.user)
+        return JsonResponse({'returned': result.returned, 'not_on_loan': result.not_on_loan})
+
+
+class AvailabilityView(AsyncReadOnlyView):
+    """
+    Tell kiosks whether media can be borrowed, e.g. /loan/availability/?media=T0001&media=T0002.
+    Only the due date of open loans is exposed, never the borrower.
+    """
+
+    # noinspection PyMethodMayBeStatic
+    async def get(self, request):
+        media_numbers = _normalize_media_numbers(
+            number for value in request.GET.getlist('media') for number in value.split(',')
+        )
+        if not media_numbers or len(media_numbers) > AVAILABILITY_MAX_MEDIA:
+            return JsonResponse({'error': f"Expected 1 to {AVAILABILITY_MAX_MEDIA} 'media' numbers."}, status=400)
+
+        open_loans = Loan.objects.filter(media=OuterRef('pk'), returned_at__isnull=True)
+        rows = (
+            Media.objects
+            .filter(media_number__in=media_numbers)
+            .annotate(due_date=Subquery(open_loans.values('due_date')[:1]))
+            .values_list('media_number', 'title', 'left_library_date', 'due_date')
+        )
+        found = {}
+        async for media_number, title, left_library_date, due_date in rows:
+            if left_library_date is not None:
+                status = 'left_library'
+            elif due_date is not None:
+                status = 'on_loan'
+            else:
+                status = 'available'
+            found[media_number] = {
+                'media_number': media_number,
+                'title': title,
+                'status': status,
+                'available': status == 'available',
+                'due_date': due_date.isoformat() if due_date else None,
+            }
+
+        return JsonResponse({'media': [
+            found.get(number, {'media_number': number, 'status': 'unknown', 'available': False})
+            for number in media_numbers
+        ]})
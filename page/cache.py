@@ -0,0 +1,46 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.cache import cache_page
+
+PAGE_VERSION_KEY = 'page:version'
+
+
+def page_version():
+    """Return the current version of the public page cache, part of every cached page's key."""
+    version = cache.get(PAGE_VERSION_KEY)
+    if version is None:
+        cache.add(PAGE_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(PAGE_VERSION_KEY)
+    return version
+
+
+def invalidate_pages(**kwargs):
+    """
+    Start a new page cache version; pages cached under the old one are never read again and expire.
+    The version lives in the default cache, so this reaches other processes only if that cache is shared.
+    """
+    cache.set(PAGE_VERSION_KEY, time.time_ns(), None)
+
+
+def cache_public_page(view):
+    """
+    Cache the responses of a public page view for PAGE_CACHE_TIMEOUT seconds.
+
+    Like cache_page(), but the cache key includes the page cache version, so
+    invalidate_pages() (connected to the relevant model signals) drops all cached pages at once,
+    in every process if the default cache is shared (see PAGE_CACHE_TIMEOUT in the settings).
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        cached_view = cache_page(settings.PAGE_CACHE_TIMEOUT, key_prefix=f'page.{page_version()}')(view)
+        return cached_view(request, *args, **kwargs)
+    return wrapper
+
+
+def etag_for(*parts):
+    """Derive an ETag from the values a page's content depends on, e.g. its last modification time."""
+    return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from inventory.models import LibrarySite, MediaCategory
+from loan.statistics import statistics_refreshed
+from .cache import invalidate_pages
+
+
+@receiver([post_save, post_delete], sender=LibrarySite)
+@receiver([post_save, post_delete], sender=MediaCategory)
+@receiver(statistics_refreshed)
+def invalidate_public_pages(sender, **kwargs):
+    """The home page shows site and category names and the statistics: drop cached pages after the change is committed."""
+    transaction.on_commit(invalidate_pages)
@@ -1,3 +1,63 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from EduBooker.tests import TEST_STORAGES
+from inventory.models import LibrarySite, Media, MediaCategory, MediaType
+from loan.statistics import refresh_media_statistics
+from .cache import PAGE_VERSION_KEY
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class MainViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.site = LibrarySite.objects.create(name='Central Library')
+        self.category = MediaCategory.objects.create(code='T', name='Tiergeschichten')
+        self.media_type = MediaType.objects.create(name='Book')
+
+    def test_statistics_on_home_page(self):
+        """Test that the home page shows the precomputed statistics."""
+        Media.objects.create(title="Buch", site=self.site, category=self.category, media_type=self.media_type)
+        refresh_media_statistics()
+
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['statistics'].total.media_count, 1)
+        self.assertContains(response, 'Central Library')
+
+    def test_home_page_without_statistics(self):
+        """Test that the home page renders before the first refresh."""
+        response = self.client.get('/')
+        self.assertContains(response, 'Noch keine Statistik vorhanden.')
+
+    def test_conditional_request(self):
+        """Test that a repeat visit with the ETag or Last-Modified of the page gets a 304."""
+        response = self.client.get('/')
+        self.assertEqual(self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_cached_response_and_invalidation(self):
+        """Test that repeat requests are served from the cache until the shown data changes."""
+        Media.objects.create(title="Buch", site=self.site, category=self.category, media_type=self.media_type)
+        self.client.get('/')
+        with self.assertTemplateNotUsed('page/home.html'):
+            self.client.get('/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_media_statistics()
+        with self.assertTemplateUsed('page/home.html'):
+            self.client.get('/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.site.name = 'Hauptstelle'
+            self.site.save()
+        self.assertContains(self.client.get('/'), 'Hauptstelle')
+
+    def test_navigation_fragment_cached(self):
+        """Test that the navigation and footer are rendered once and then read from the fragment cache."""
+        self.client.get('/')
+        cache.delete(PAGE_VERSION_KEY)  # New page version, the fragments stay cached
+        with self.assertTemplateNotUsed('_navigation.html'), self.assertTemplateNotUsed('_footer.html'):
+            response = self.client.get('/')
+        self.assertTemplateUsed(response, 'page/home.html')
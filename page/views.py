@@ -1,13 +1,44 @@
+from django.db.models import Max
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.http import condition
+
+from inventory.models import LibrarySite, MediaCategory
+from loan.models import MediaStatistics
+from loan.statistics import media_statistics_summary
+from .cache import cache_public_page, etag_for
+
+
+def main_last_modified(request):
+    """
+    Latest change of anything the home page shows: the statistics refresh and the
+    site and category names (from the cached reference data, so this costs one tiny query).
+    """
+    if not hasattr(request, '_main_last_modified'):
+        timestamps = [
+            obj.updated_at
+            for model in (LibrarySite, MediaCategory)
+            for obj in model.objects.cached()
+        ]
+        timestamps.append(MediaStatistics.objects.aggregate(refreshed_at=Max('refreshed_at'))['refreshed_at'])
+        request._main_last_modified = max(filter(None, timestamps), default=None)
+    return request._main_last_modified
+
+
+def main_etag(request):
+    return etag_for('page-main', main_last_modified(request))
+
 
 # Create your views here.
+@method_decorator([condition(etag_func=main_etag, last_modified_func=main_last_modified), cache_public_page], name='get')
 class MainView(View):
     # noinspection PyMethodMayBeStatic
     def get(self, request):
 
         context = {
         #    'response': airesponse,
+            'statistics': media_statistics_summary(),
         }
 
         return render(request, 'page/home.html', context)
@@ -1,5 +1,6 @@
 #!/bin/bash
 set -e
 python manage.py migrate --noinput
-#python manage.py collectstatic --noinput
+python manage.py refresh_statistics
+# Static files are built into the image (scripts/build_static.sh), not at release time
 #python manage.py createsuperuser --noinput
\ No newline at end of file
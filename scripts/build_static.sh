@@ -0,0 +1,12 @@
+#!/bin/bash
+# Production static build, run at build time (the Dockerfile runs it for every image):
+# purged and minified Tailwind CSS, hashed files with gzip/Brotli variants, offline bundles.
+# Serve the result with STATIC_BUILD=True in the environment.
+# SKIP_TAILWIND=1 skips the CSS step, e.g. when static/src/output.css was built in another stage.
+set -e
+export STATIC_BUILD=True
+if [ "${SKIP_TAILWIND:-0}" != "1" ]; then
+    npx tailwindcss -i ./static/src/input.css -o ./static/src/output.css --minify
+fi
+python manage.py collectstatic --noinput
+python manage.py compress --force
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+Load test of the web server for a growing number of gunicorn workers.
+
+For each worker count a gunicorn server is started with gunicorn.conf.py, so SERVER_INTERFACE,
+DB_POOL, CONN_MAX_AGE etc. are taken from the environment as in production. The server is
+loaded by --concurrency client threads for --duration seconds and stopped again. Reported
+per worker count: throughput, latency percentiles, errors and, on PostgreSQL, the database
+connections opened during the run (churn) and the peak number of open connections.
+
+Compare persistent connections with the connection pool:
+
+    DB_POOL=False scripts/load_test.py --workers 1 2 4 8
+    DB_POOL=True DB_POOL_MAX_SIZE=4 scripts/load_test.py --workers 1 2 4 8
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import environ
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+class ConnectionMonitor:
+    """Sample the open connections of the PostgreSQL database and count the new ones."""
+
+    def __init__(self, database_url, interval=0.2):
+        import psycopg
+
+        config = environ.Env.db_url_config(database_url)
+        self.connection = psycopg.connect(
+            dbname=config['NAME'], user=config['USER'], password=config['PASSWORD'],
+            host=config['HOST'] or None, port=config['PORT'] or None, autocommit=True,
+        )
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _query(self, sql):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
+
+    def sessions(self):
+        """Number of sessions established to the database so far (PostgreSQL 14+)."""
+        # Stats are reported with a small delay after a backend exits
+        time.sleep(1)
+        return self._query("SELECT sessions FROM pg_stat_database WHERE datname = current_database()")
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._query(
+                "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() AND pid <> pg_backend_pid()"
+            ))
+
+    def start(self):
+        self.peak = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def start_server(workers, port):
+    env = {**os.environ, 'WEB_CONCURRENCY': str(workers), 'PORT': str(port)}
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"The server did not answer {url} within {timeout} seconds.")
+
+
+def run_load(url, concurrency, duration):
+    """Request `url` from `concurrency` threads for `duration` seconds; return latencies and error count."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        own_latencies, own_errors = [], 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                own_latencies.append(time.perf_counter() - start)
+            except (urllib.error.URLError, ConnectionError):
+                own_errors += 1
+        with lock:
+            latencies.extend(own_latencies)
+            errors[0] += own_errors
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[int(fraction * 100) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help="Worker counts to test.")
+    parser.add_argument('--concurrency', type=int, default=16, help="Number of concurrent clients.")
+    parser.add_argument('--duration', type=int, default=20, help="Seconds of load per worker count.")
+    parser.add_argument('--path', default='/inventory/search/?q=a', help="Path requested by the clients.")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    environ.Env.read_env(BASE_DIR / '.env')
+    database_url = os.environ.get('DATABASE_URL', '')
+    monitor = ConnectionMonitor(database_url) if database_url.startswith(('postgres', 'postgis')) else None
+    url = f"http://127.0.0.1:{args.port}{args.path}"
+
+    print(f"{'workers':>7} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>6} {'new conn':>8} {'peak conn':>9}")
+    for workers in args.workers:
+        sessions = monitor.sessions() if monitor else None
+        server = start_server(workers, args.port)
+        try:
+            wait_until_ready(url)
+            run_load(url, concurrency=min(args.concurrency, 4), duration=2)  # warm-up
+            if monitor:
+                monitor.start()
+            latencies, errors = run_load(url, args.concurrency, args.duration)
+            if monitor:
+                monitor.stop()
+        finally:
+            server.terminate()
+            server.wait()
+        new_connections = monitor.sessions() - sessions if monitor else '-'
+        peak = monitor.peak if monitor else '-'
+        print(f"{workers:>7} {len(latencies):>8} {len(latencies) / args.duration:>8.1f} "
+              f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+              f"{percentile(latencies, 0.99) * 1000:>8.1f} {errors:>6} {new_connections:>8} {peak:>9}")
+
+
+if __name__ == '__main__':
+    main()